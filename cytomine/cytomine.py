@@ -14,9 +14,10 @@
 # * See the License for the specific language governing permissions and
 # * limitations under the License.
 
-# pylint: disable=import-outside-toplevel
+# pylint: disable=import-outside-toplevel,too-many-lines
 
 import base64
+import copy
 import functools
 import hashlib
 import hmac
@@ -29,12 +30,14 @@ import time
 import warnings
 from argparse import ArgumentParser
 from json.decoder import JSONDecodeError
+from threading import Event, Lock
 from time import gmtime, strftime
 from typing import (
     TYPE_CHECKING,
     Any,
     Callable,
     Dict,
+    Iterable,
     List,
     Optional,
     Tuple,
@@ -200,6 +203,7 @@ class Cytomine:
         protocol: Optional[str] = None,
         working_path: str = "/tmp",
         configure_logging: bool = True,
+        timeout: Optional[Union[float, Tuple[float, float]]] = None,
         **kwargs: Any,
     ) -> None:
         """
@@ -226,6 +230,9 @@ class Cytomine:
             `basicConfig`) if the root logger has no handler already configured.
             Default value is True to mimic backwards compatibility.
             Starting v3.x, default value should be set to False.
+        timeout : float or tuple (optional)
+            Timeout (in seconds) of every HTTP request, as a single value or a
+            (connect, read) tuple. None (default) to wait indefinitely.
         kwargs : dict
             Deprecated arguments.
         """
@@ -234,9 +241,15 @@ class Cytomine:
         self._private_key = private_key
 
         self._use_cache = use_cache
+        self._timeout = timeout
         self._base_path = "/api/"
         self._current_user = None
 
+        # Models being fetched by fetch_many, shared with concurrent fetches of the same
+        # model: (model class, id) -> (event set once fetched, [result])
+        self._in_flight: Dict[Tuple[type, int], Tuple[Event, List[Any]]] = {}
+        self._in_flight_lock = Lock()
+
         if configure_logging:
             logging.basicConfig(
                 stream=sys.stdout,
@@ -284,6 +297,7 @@ class Cytomine:
         private_key: str,
         verbose: int = 0,
         use_cache: bool = True,
+        timeout: Optional[Union[float, Tuple[float, float]]] = None,
     ) -> "Cytomine":
         """
         Connect the client with the given host and the provided credentials.
@@ -300,13 +314,16 @@ class Cytomine:
             The verbosity level of the client.
         use_cache : bool
             True to use HTTP cache, False otherwise.
+        timeout : float or tuple (optional)
+            Timeout (in seconds) of every HTTP request, as a single value or a
+            (connect, read) tuple. None (default) to wait indefinitely.
 
         Returns
         -------
         client : Cytomine
             A connected Cytomine client.
         """
-        return cls(host, public_key, private_key, verbose, use_cache)
+        return cls(host, public_key, private_key, verbose, use_cache, timeout=timeout)
 
     @classmethod
     def connect_from_cli(cls, argv: List[str], use_cache: bool = True) -> "Cytomine":
@@ -472,6 +489,14 @@ class Cytomine:
     def host(self) -> str:
         return self._host
 
+    @property
+    def timeout(self) -> Optional[Union[float, Tuple[float, float]]]:
+        return self._timeout
+
+    @timeout.setter
+    def timeout(self, value: Optional[Union[float, Tuple[float, float]]]) -> None:
+        self._timeout = value
+
     @property
     def current_user(self) -> Optional["CurrentUser"]:
         return self._current_user
@@ -563,6 +588,7 @@ class Cytomine:
             ),
             headers=self._headers(),
             params=query_parameters,
+            timeout=self._timeout,
         )
 
     def get(
@@ -586,7 +612,7 @@ class Cytomine:
 
         if response.status_code == requests.codes.ok:
             response_json = response.json()
-            model = model.populate(response_json)
+            model = model.populate(response_json).mark_clean()
             self._log_response(response, model)
 
         if not response.status_code == requests.codes.ok:
@@ -595,6 +621,65 @@ class Cytomine:
 
         return model
 
+    def _fetch_coalesced(self, model_cls: type, id: int) -> Union[bool, "Model"]:
+        """Fetch a model, or wait for the result of an ongoing fetch of the same model."""
+        key = (model_cls, id)
+        with self._in_flight_lock:
+            in_flight = self._in_flight.get(key)
+            owner = in_flight is None
+            if in_flight is None:
+                in_flight = self._in_flight[key] = (Event(), [False])
+
+        done, result = in_flight
+        if not owner:
+            done.wait()
+            return copy.deepcopy(result[0])
+
+        try:
+            result[0] = model_cls().fetch(id)
+        finally:
+            with self._in_flight_lock:
+                del self._in_flight[key]
+            done.set()
+        return result[0]
+
+    def fetch_many(
+        self,
+        model_cls: type,
+        ids: Iterable[int],
+        n_workers: int = 0,
+    ) -> List[Union[bool, "Model"]]:
+        """Fetch the models of the given ids, in parallel on the session connection pool
+        (and its HTTP cache). Each distinct id is fetched once, even if it is already
+        being fetched concurrently by another call.
+
+        Parameters
+        ----------
+        model_cls: type
+            The model class (e.g. `ImageInstance`), constructible without arguments.
+        ids: iterable
+            The ids of the models to fetch.
+        n_workers: int
+            Number of threads to use. Value 0 for using as many threads as cpus on the machine.
+
+        Returns
+        -------
+        models: list
+            The fetched models, in the order of `ids`, with False for the ids that could
+            not be fetched.
+        """
+        from cytomine.models._utilities.parallel import generic_parallel
+
+        ids = list(ids)
+        results: Dict[int, Any] = dict(
+            generic_parallel(
+                list(dict.fromkeys(ids)),
+                lambda id_: self._fetch_coalesced(model_cls, id_),
+                n_workers=n_workers,
+            )
+        )
+        return [results[id_] for id_ in ids]
+
     def get_collection(
         self,
         collection: "Collection",
@@ -627,6 +712,7 @@ class Cytomine:
             ),
             headers=self._headers(content_type="application/json"),
             params=query_parameters,
+            timeout=self._timeout,
             data=data,
         )
 
@@ -658,6 +744,7 @@ class Cytomine:
                 model = model.populate(
                     response.json()[model.__class__.__name__.lower()]
                 )  # remove when REST URL are normalized
+            model.mark_clean()
 
         self._log_response(response, model)
         if not response.status_code == requests.codes.ok:
@@ -680,6 +767,7 @@ class Cytomine:
             ),
             headers=self._headers(content_type="application/json"),
             params=query_parameters,
+            timeout=self._timeout,
         )
 
     def delete(
@@ -723,6 +811,7 @@ class Cytomine:
             ),
             headers=self._headers(content_type="application/json"),
             params=query_parameters,
+            timeout=self._timeout,
             data=data,
         )
 
@@ -756,6 +845,7 @@ class Cytomine:
                     model = model.populate(
                         response.json()[model.__class__.__name__.lower()]
                     )  # remove when REST URL are normalized
+                model.mark_clean()
             except KeyError:
                 self._logger.warning(response.json())
 
@@ -777,7 +867,22 @@ class Cytomine:
             query_parameters,
         )
         self._log_response(response, read_response_message(response, key="message"))
-        return response.status_code == requests.codes.ok
+        if not response.status_code == requests.codes.ok:
+            return False
+
+        # The objects are created even if their ids cannot be read: reporting a failure
+        # would lead to uploading them again
+        try:
+            count = collection.populate_created(response.json())
+        except JSONDecodeError:
+            count = 0
+        if count < len(collection):
+            self._logger.warning(
+                "Could not read the ids of %d of the %d created objects.",
+                len(collection) - count,
+                len(collection),
+            )
+        return True
 
     def open_admin_session(self) -> bool:
         uri = "/session/admin/open.json"
@@ -844,6 +949,7 @@ class Cytomine:
                 ),
                 headers=self._headers(content_type=m.content_type),
                 params=query_parameters,
+                timeout=self._timeout,
                 data=m,
             )
 
@@ -877,6 +983,7 @@ class Cytomine:
                 ),
                 headers=self._headers(content_type="application/json"),
                 params=payload,
+                timeout=self._timeout,
                 stream=True,
             )
 
@@ -934,6 +1041,7 @@ class Cytomine:
                 auth=CytomineAuth(self._public_key, self._private_key, upload_host, ""),
                 headers=self._headers(content_type=m.content_type),
                 params=query_parameters,
+                timeout=self._timeout,
                 data=m,
             )
 
@@ -24,6 +24,7 @@ from .annotation import (
     AnnotationLinkCollection,
     AnnotationTerm,
 )
+from .batch import BatchSession
 from .collection import Collection, DomainCollection
 from .image import (
     AbstractImage,
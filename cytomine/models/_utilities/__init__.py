@@ -15,5 +15,15 @@
 # * limitations under the License.
 
 from .dump import DumpError, generic_image_dump
-from .parallel import generic_download, is_false, makedirs
+from .parallel import (
+    JobInterruptedError,
+    generic_download,
+    generic_parallel,
+    is_false,
+    iter_parallel,
+    makedirs,
+    robust_worker,
+)
+from .progress import Progress, ProgressLogger, make_progress
 from .pattern_matching import is_iterable, resolve_pattern
+from .spill import SpillList
@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+
+# * Copyright (c) 2009-2024. Authors: see NOTICE file.
+# *
+# * Licensed under the Apache License, Version 2.0 (the "License");
+# * you may not use this file except in compliance with the License.
+# * You may obtain a copy of the License at
+# *
+# *      http://www.apache.org/licenses/LICENSE-2.0
+# *
+# * Unless required by applicable law or agreed to in writing, software
+# * distributed under the License is distributed on an "AS IS" BASIS,
+# * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# * See the License for the specific language governing permissions and
+# * limitations under the License.
+
+from threading import Lock
+from typing import Callable, Iterator, List, Tuple
+
+
+class AdaptiveChunker:
+    """Split a sequence of items into chunks (start, end) whose payload size tends
+    towards a target number of bytes. The target grows while the server answers
+    quickly and shrinks when it becomes slow or rejects a chunk.
+
+    Chunks are generated lazily so that the target used for a chunk takes into account
+    the latencies recorded for the previous ones. The size of an item is only computed
+    when its chunk is formed.
+    """
+
+    def __init__(
+        self,
+        n_items: int,
+        size_fn: Callable[[int], int],
+        target_bytes: int = 1_000_000,
+        target_latency: float = 2.0,
+        min_bytes: int = 64_000,
+        max_bytes: int = 32_000_000,
+        max_splits: int = 2,
+    ) -> None:
+        """
+        Parameters
+        ----------
+        n_items: int
+            The number of items.
+        size_fn: callable
+            A function returning the payload size (in bytes) of an item given its index.
+        target_bytes: int
+            Initial target payload size (in bytes) of a chunk.
+        target_latency: float
+            Expected server response time (in seconds) for a chunk.
+        min_bytes: int
+            Lower bound of the target payload size (lowered to `target_bytes` if greater).
+        max_bytes: int
+            Upper bound of the target payload size.
+        max_splits: int
+            Maximum number of times a failed chunk is split, which bounds the number of
+            requests sent for a chunk when the server keeps failing.
+        """
+        self._n_items = n_items
+        self._size_fn = size_fn
+        self._sizes: List[int] = []
+        self.target_latency = target_latency
+        self.min_bytes = min(min_bytes, target_bytes)
+        self.max_bytes = max_bytes
+        self.max_splits = max_splits
+        self._target = float(min(max(target_bytes, self.min_bytes), max_bytes))
+        self._lock = Lock()
+
+    @property
+    def target_bytes(self) -> int:
+        return int(self._target)
+
+    def _size(self, index: int) -> int:
+        # items are sized in order, when the chunks are formed
+        with self._lock:
+            while len(self._sizes) <= index:
+                self._sizes.append(self._size_fn(len(self._sizes)))
+            return self._sizes[index]
+
+    def payload_size(self, start: int, end: int) -> int:
+        return sum(self._size(i) for i in range(start, end))
+
+    def __iter__(self) -> Iterator[Tuple[int, int]]:
+        start, n_items = 0, self._n_items
+        while start < n_items:
+            target = self.target_bytes
+            end, size = start + 1, self._size(start)
+            while end < n_items and size + self._size(end) <= target:
+                size += self._size(end)
+                end += 1
+            yield start, end
+            start = end
+
+    def record(self, n_bytes: int, latency: float, success: bool) -> None:
+        """Adapt the target size given the outcome of a chunk upload."""
+        with self._lock:
+            if not success:
+                self._target = min(self._target, n_bytes / 2)
+            elif latency < self.target_latency / 2 and n_bytes >= self._target / 2:
+                self._target *= 1.5
+            elif latency > self.target_latency:
+                self._target *= self.target_latency / latency
+            self._target = min(max(self._target, self.min_bytes), self.max_bytes)
+
+    def should_split(self, start: int, end: int, depth: int = 0) -> bool:
+        """Whether a failed chunk, obtained after `depth` splits, is worth retrying as two
+        smaller chunks, which isolates the items rejected by the server"""
+        return end - start > 1 and depth < self.max_splits
+
+    @staticmethod
+    def split(start: int, end: int) -> List[Tuple[int, int]]:
+        middle = (start + end) // 2
+        return [(start, middle), (middle, end)]
@@ -0,0 +1,503 @@
+# -*- coding: utf-8 -*-
+
+# * Copyright (c) 2009-2024. Authors: see NOTICE file.
+# *
+# * Licensed under the Apache License, Version 2.0 (the "License");
+# * you may not use this file except in compliance with the License.
+# * You may obtain a copy of the License at
+# *
+# *      http://www.apache.org/licenses/LICENSE-2.0
+# *
+# * Unless required by applicable law or agreed to in writing, software
+# * distributed under the License is distributed on an "AS IS" BASIS,
+# * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# * See the License for the specific language governing permissions and
+# * limitations under the License.
+
+# pylint: disable=import-outside-toplevel
+
+# Operations on arrays of geometries, using the vectorized functions of Shapely 2 when
+# available, with a (slower) fallback on Shapely 1.
+
+from typing import Any, List, Optional, Sequence, Tuple
+
+import shapely
+from shapely import wkt
+
+VECTORIZED = hasattr(shapely, "from_wkt")
+
+
+def _numpy() -> Any:
+    try:
+        import numpy
+    except ImportError as e:
+        raise ImportError("Geometry arrays require numpy (pip install numpy).") from e
+    return numpy
+
+
+def parse_wkt(locations: Sequence[Optional[str]]) -> Any:
+    """Parse WKT strings into an array of geometries (None for missing locations)."""
+    np = _numpy()
+    if VECTORIZED:
+        return shapely.from_wkt(np.asarray(locations, dtype=object))
+
+    geometries = np.empty(len(locations), dtype=object)
+    for i, location in enumerate(locations):
+        geometries[i] = wkt.loads(location) if location is not None else None
+    return geometries
+
+
+def bounds(geometries: Any) -> Any:
+    """Array (n, 4) of the (minx, miny, maxx, maxy) bounds (NaN for missing geometries)."""
+    np = _numpy()
+    if VECTORIZED:
+        return shapely.bounds(geometries)
+    return np.array(
+        [g.bounds if g is not None else (np.nan,) * 4 for g in geometries],
+        dtype=float,
+    ).reshape(-1, 4)
+
+
+def areas(geometries: Any) -> Any:
+    """Array (n,) of the geometry areas (NaN for missing geometries)."""
+    np = _numpy()
+    if VECTORIZED:
+        return shapely.area(geometries)
+    return np.array([g.area if g is not None else np.nan for g in geometries], dtype=float)
+
+
+def centroids(geometries: Any) -> Any:
+    """Array (n, 2) of the (x, y) centroid coordinates (NaN for missing geometries)."""
+    np = _numpy()
+    if VECTORIZED:
+        points = shapely.centroid(geometries)
+        return np.stack([shapely.get_x(points), shapely.get_y(points)], axis=-1)
+    return np.array(
+        [
+            (g.centroid.x, g.centroid.y) if g is not None and not g.is_empty else (np.nan,) * 2
+            for g in geometries
+        ],
+        dtype=float,
+    ).reshape(-1, 2)
+
+
+def is_missing(geometries: Any) -> Any:
+    """Array (n,) of booleans, True for missing geometries (None)."""
+    np = _numpy()
+    if VECTORIZED:
+        return shapely.is_missing(geometries)
+    return np.array([g is None for g in geometries], dtype=bool)
+
+
+def is_valid(geometries: Any) -> Any:
+    """Array (n,) of booleans, True for valid geometries (False for missing ones)."""
+    np = _numpy()
+    if VECTORIZED:
+        return shapely.is_valid(geometries)
+    return np.array([g is not None and g.is_valid for g in geometries], dtype=bool)
+
+
+def equal(geometries: Any, others: Any) -> Any:
+    """Array (n,) of booleans, True where two arrays of geometries have exactly the same
+    coordinates (or are both missing)."""
+    np = _numpy()
+    if VECTORIZED:
+        same = shapely.equals_exact(geometries, others, tolerance=0)
+        return same | (is_missing(geometries) & is_missing(others))
+    return np.array(
+        [
+            g is o or (g is not None and o is not None and g.equals_exact(o, 0))
+            for g, o in zip(geometries, others)
+        ],
+        dtype=bool,
+    )
+
+
+def invalidity_reasons(geometries: Any) -> Any:
+    """Array (n,) of the reasons why the geometries are invalid ("Valid Geometry"
+    for valid ones, None for missing ones)."""
+    np = _numpy()
+    if VECTORIZED:
+        return shapely.is_valid_reason(geometries)
+    from shapely.validation import explain_validity
+
+    return np.array(
+        [explain_validity(g) if g is not None else None for g in geometries], dtype=object
+    )
+
+
+def _repair(g: Any) -> Any:
+    if g is None or g.is_valid:
+        return g
+    from shapely import validation
+
+    if hasattr(validation, "make_valid"):  # Shapely >= 1.8
+        return validation.make_valid(g)
+    return g.buffer(0)
+
+
+def make_valid(geometries: Any) -> Any:
+    """Repair the invalid geometries (e.g. a bowtie polygon becomes a multipolygon)."""
+    np = _numpy()
+    if VECTORIZED:
+        return shapely.make_valid(geometries)
+    return np.array([_repair(g) for g in geometries], dtype=object)
+
+
+_DIMENSIONS = {
+    "Point": 0,
+    "MultiPoint": 0,
+    "LineString": 1,
+    "LinearRing": 1,
+    "MultiLineString": 1,
+    "Polygon": 2,
+    "MultiPolygon": 2,
+}
+
+
+def _dimension(g: Any) -> int:
+    if g is None or g.is_empty:
+        return -1
+    if g.geom_type == "GeometryCollection":
+        return max(_dimension(part) for part in g.geoms)
+    return _DIMENSIONS[g.geom_type]
+
+
+def dimensions(geometries: Any) -> Any:
+    """Array (n,) of the geometry dimensions (0 for points, 1 for lines, 2 for polygons,
+    -1 for missing or empty geometries)."""
+    np = _numpy()
+    if VECTORIZED:
+        return np.where(shapely.is_empty(geometries), -1, shapely.get_dimensions(geometries))
+    return np.array([_dimension(g) for g in geometries], dtype=int)
+
+
+def is_collection(geometries: Any) -> Any:
+    """Array (n,) of booleans, True for (heterogeneous) geometry collections."""
+    np = _numpy()
+    if VECTORIZED:
+        return shapely.get_type_id(geometries) == 7
+    return np.array(
+        [g is not None and g.geom_type == "GeometryCollection" for g in geometries],
+        dtype=bool,
+    )
+
+
+def preprocess(
+    geometries: Any,
+    tolerance: Optional[float] = None,
+    decimals: Optional[int] = None,
+    repair: bool = False,
+) -> Any:
+    """Simplify, round and repair an array of geometries (missing geometries are kept).
+
+    Parameters
+    ----------
+    geometries: numpy.ndarray
+        Array (n,) of Shapely geometries (or None).
+    tolerance: float|None
+        Maximum distance between the original and the simplified geometries (topology
+        is preserved). None for no simplification.
+    decimals: int|None
+        Number of decimals the coordinates are rounded to. None for no rounding.
+    repair: bool
+        True for repairing invalid geometries (e.g. self-intersecting polygons).
+    """
+    if VECTORIZED:
+        if repair:
+            geometries = make_valid(geometries)
+        if tolerance is not None:
+            geometries = shapely.simplify(geometries, tolerance, preserve_topology=True)
+        if decimals is not None:
+            # only valid geometries can be rounded while keeping them valid
+            mode = "valid_output" if repair else "pointwise"
+            geometries = shapely.set_precision(geometries, 10.0**-decimals, mode=mode)
+        return geometries
+
+    np = _numpy()
+    processed = np.empty(len(geometries), dtype=object)
+    for i, g in enumerate(geometries):
+        if g is not None:
+            if repair:
+                g = _repair(g)
+            if tolerance is not None:
+                g = g.simplify(tolerance, preserve_topology=True)
+            if decimals is not None:
+                g = wkt.loads(wkt.dumps(g, rounding_precision=decimals))
+                if repair:
+                    g = _repair(g)
+        processed[i] = g
+    return processed
+
+
+def to_wkt(geometries: Any, decimals: Optional[int] = None) -> Any:
+    """Array (n,) of the WKT strings of the geometries (None for missing geometries),
+    with at most `decimals` decimals (None for full precision)."""
+    # 17 significant digits are needed for the coordinates to be read back unchanged
+    precision = 17 if decimals is None else decimals
+    if VECTORIZED:
+        return shapely.to_wkt(geometries, rounding_precision=precision, trim=True)
+    np = _numpy()
+    return np.array(
+        [
+            wkt.dumps(g, rounding_precision=precision, trim=True) if g is not None else None
+            for g in geometries
+        ],
+        dtype=object,
+    )
+
+
+class SpatialIndex:
+    """A spatial index (STR-tree) over an array of geometries. Queries return the
+    positions of the matching geometries in the array (missing geometries never match).
+
+    Parameters
+    ----------
+    geometries: numpy.ndarray
+        Array (n,) of Shapely geometries (or None).
+    """
+
+    def __init__(self, geometries: Any) -> None:
+        if not VECTORIZED:
+            raise ImportError("The spatial index requires Shapely >= 2.0.")
+        self._geometries = geometries
+        self._tree = shapely.STRtree(geometries)
+
+    @property
+    def geometries(self) -> Any:
+        return self._geometries
+
+    def query_geometry(self, geometry: Any, predicate: Optional[str] = "intersects") -> Any:
+        """Positions (sorted) of the geometries matching the predicate with the given
+        geometry (e.g. "intersects", "contains", "within"). None for only comparing
+        the bounding boxes."""
+        return _numpy().sort(self._tree.query(geometry, predicate=predicate))
+
+    def query_bbox(
+        self,
+        minx: float,
+        miny: float,
+        maxx: float,
+        maxy: float,
+        predicate: Optional[str] = "intersects",
+    ) -> Any:
+        """Positions (sorted) of the geometries matching the predicate with a box."""
+        return self.query_geometry(shapely.box(minx, miny, maxx, maxy), predicate)
+
+    def nearest(self, geometry: Any, max_distance: Optional[float] = None) -> Any:
+        """Positions of the geometries nearest to the given geometry (several in case of
+        ties), optionally within `max_distance`."""
+        return _numpy().sort(
+            self._tree.query_nearest(geometry, max_distance=max_distance, all_matches=True)
+        )
+
+    def join(
+        self,
+        other: Optional["SpatialIndex"] = None,
+        predicate: Optional[str] = "intersects",
+    ) -> Any:
+        """Pairs of geometries matching the predicate.
+
+        Parameters
+        ----------
+        other: SpatialIndex|None
+            The index to join with. None for a self-join, where each pair (i, j) is
+            reported once, with i < j.
+        predicate: str|None
+            The predicate applied to (geometry of this index, geometry of other).
+
+        Returns
+        -------
+        pairs: numpy.ndarray
+            Array (m, 2) of (position in this index, position in other), sorted.
+        """
+        target = self if other is None else other
+        # Tree query returns (positions in the queried array, positions in the tree)
+        pairs = target._tree.query(  # pylint: disable=protected-access
+            self._geometries, predicate=predicate
+        ).T
+        if other is None:
+            pairs = pairs[pairs[:, 0] < pairs[:, 1]]
+        return pairs[_numpy().lexsort((pairs[:, 1], pairs[:, 0]))]
+
+
+def _edges(geometries: Any) -> Tuple[Any, Any]:
+    """The edges of the polygon rings, as an array (m, 4) of (x0, y0, x1, y1) and the
+    array (m,) of the positions of the geometries they belong to."""
+    np = _numpy()
+    if VECTORIZED:
+        parts, part_owners = shapely.get_parts(geometries, return_index=True)
+        polygons = shapely.get_type_id(parts) == 3
+        rings, ring_parts = shapely.get_rings(parts[polygons], return_index=True)
+        ring_owners = part_owners[polygons][ring_parts]
+        coords, coord_rings = shapely.get_coordinates(rings, return_index=True)
+    else:
+        coords_list: List[Any] = []
+        coord_rings_list: List[Any] = []
+        owners: List[int] = []
+        for i, g in enumerate(geometries):
+            for part in getattr(g, "geoms", [g] if g is not None else []):
+                if part.geom_type != "Polygon":
+                    continue
+                for ring in [part.exterior, *part.interiors]:
+                    ring_coords = np.asarray(ring.coords, dtype=float)[:, :2].reshape(-1, 2)
+                    coords_list.append(ring_coords)
+                    coord_rings_list.append(np.full(len(ring_coords), len(owners)))
+                    owners.append(i)
+        coords = np.concatenate(coords_list) if owners else np.empty((0, 2))
+        coord_rings = np.concatenate(coord_rings_list) if owners else np.empty(0, dtype=int)
+        ring_owners = np.array(owners, dtype=int)
+
+    # rings are closed: an edge joins two consecutive coordinates of the same ring
+    same_ring = coord_rings[:-1] == coord_rings[1:]
+    edges = np.concatenate([coords[:-1][same_ring], coords[1:][same_ring]], axis=1)
+    return edges, ring_owners[coord_rings[:-1][same_ring]]
+
+
+def _spans(starts: Any, lengths: Any) -> Tuple[Any, Any]:
+    """For spans of integers [start, start + length), the span of each integer and the
+    integers themselves, concatenated."""
+    np = _numpy()
+    span = np.repeat(np.arange(len(lengths)), lengths)
+    offsets = np.arange(len(span)) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    return span, starts[span] + offsets
+
+
+def rasterize(
+    geometries: Any,
+    values: Any,
+    window: Tuple[float, float, float, float],
+    image_height: float,
+    scale: float = 1.0,
+    dtype: Any = "uint8",
+) -> Any:
+    """Rasterize polygonal geometries in a window of an image, with a scanline algorithm
+    vectorized over all the polygons (even-odd rule, so that holes are preserved).
+
+    The geometries are in the Cytomine coordinate system (origin at the image
+    bottom-left corner, y axis pointing up) while the mask rows go from the top of the
+    window to its bottom. A pixel is filled when its center is inside a polygon, and
+    overlapping polygons are drawn in order (the last one is on top). Points and lines
+    are ignored.
+
+    Parameters
+    ----------
+    geometries: numpy.ndarray
+        Array (n,) of Shapely geometries (or None).
+    values: numpy.ndarray
+        Array (n,) of the values drawn for each geometry (0 for not drawing it).
+    window: tuple
+        The (x, y, width, height) of the window, in image pixels, (x, y) being its
+        top-left corner (0 is the image left and top).
+    image_height: float
+        The height of the image, in pixels.
+    scale: float
+        Ratio between the mask size and the window size (e.g. 0.5 for zoom level 1).
+    dtype:
+        The mask data type.
+
+    Returns
+    -------
+    mask: numpy.ndarray
+        Array (round(height * scale), round(width * scale)) of the drawn values.
+    """
+    np = _numpy()
+    x, y, width, height = window
+    n_rows, n_cols = int(round(height * scale)), int(round(width * scale))
+    mask = np.zeros((n_rows, n_cols), dtype=dtype)
+
+    values = np.asarray(values)
+    edges, owners = _edges(geometries)
+    drawn = values[owners] != 0
+    edges, owners = edges[drawn], owners[drawn]
+
+    # Window pixel coordinates (the y axis is flipped)
+    px = (edges[:, [0, 2]] - x) * scale
+    py = (image_height - y - edges[:, [1, 3]]) * scale
+
+    # Crossings of the edges with the horizontal lines through the pixel centers
+    first = np.clip(np.ceil(py.min(axis=1) - 0.5), 0, n_rows).astype(int)
+    last = np.clip(np.ceil(py.max(axis=1) - 0.5), 0, n_rows).astype(int)
+    edge, rows = _spans(first, last - first)
+    (x0, x1), (y0, y1) = px[edge].T, py[edge].T
+    xs = x0 + (rows + 0.5 - y0) * (x1 - x0) / (y1 - y0)
+    owners = owners[edge]
+
+    # Consecutive crossings of a polygon on a row delimit its inside (even-odd rule)
+    order = np.lexsort((xs, rows, owners))
+    xs, rows, owners = xs[order], rows[order], owners[order]
+    starts = np.clip(np.ceil(xs[0::2] - 0.5), 0, n_cols).astype(int)
+    ends = np.clip(np.ceil(xs[1::2] - 0.5), 0, n_cols).astype(int)
+    span, cols = _spans(starts, np.maximum(ends - starts, 0))
+
+    top = np.full((n_rows, n_cols), -1)
+    np.maximum.at(top, (rows[0::2][span], cols), owners[0::2][span])
+    painted = top >= 0
+    mask[painted] = values[top[painted]]
+    return mask
+
+
+def polygonize(
+    mask: Any,
+    origin: Tuple[float, float],
+    image_height: float,
+    scale: float = 1.0,
+    background: int = 0,
+) -> Tuple[Any, Any]:
+    """Extract the (multi)polygon covered by each label of a mask, in the Cytomine
+    coordinate system. The runs of equal labels of each row are merged into polygons
+    (the union of non-overlapping boxes), vectorized over the whole mask.
+
+    Parameters
+    ----------
+    mask: numpy.ndarray
+        Array (height, width) of integer labels, rows going from top to bottom.
+    origin: tuple
+        The (x, y) position of the mask top-left corner in the image, in mask pixels
+        (0 is the image left and top).
+    image_height: float
+        The height of the image, in image pixels.
+    scale: float
+        Size of a mask pixel, in image pixels (e.g. 2 for zoom level 1).
+    background: int
+        The label of the pixels that are not covered by any polygon.
+
+    Returns
+    -------
+    labels: numpy.ndarray
+        Array (k,) of the labels found in the mask (sorted).
+    geometries: numpy.ndarray
+        Array (k,) of the geometries of the labels.
+    """
+    np = _numpy()
+    mask = np.asarray(mask)
+    x, y = origin
+
+    # Runs of equal labels: start and end (exclusive) columns of each run, per row
+    changes = mask[:, 1:] != mask[:, :-1]
+    starts = np.concatenate([np.ones((mask.shape[0], 1), dtype=bool), changes], axis=1)
+    ends = np.concatenate([changes, np.ones((mask.shape[0], 1), dtype=bool)], axis=1)
+    rows, first = np.nonzero(starts)
+    last = np.nonzero(ends)[1] + 1
+    labels = mask[rows, first]
+    runs = labels != background
+    rows, first, last, labels = rows[runs], first[runs], last[runs], labels[runs]
+
+    # Runs as boxes in image coordinates (the y axis points up from the image bottom)
+    minx, maxx = (x + first) * scale, (x + last) * scale
+    miny, maxy = image_height - (y + rows + 1) * scale, image_height - (y + rows) * scale
+
+    order = np.argsort(labels, kind="stable")
+    found, groups = np.unique(labels[order], return_index=True)
+    geometries = np.empty(len(found), dtype=object)
+    for i, group in enumerate(np.split(order, groups[1:]) if len(order) > 0 else []):
+        coords = (minx[group], miny[group], maxx[group], maxy[group])
+        if VECTORIZED:
+            union = shapely.union_all(shapely.box(*coords))
+            geometries[i] = shapely.simplify(union, 0)  # drops the collinear vertices
+        else:
+            from shapely.geometry import box
+            from shapely.ops import unary_union
+
+            geometries[i] = unary_union([box(*b) for b in zip(*coords)]).simplify(0)
+    return found, geometries
@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+
+# * Copyright (c) 2009-2024. Authors: see NOTICE file.
+# *
+# * Licensed under the Apache License, Version 2.0 (the "License");
+# * you may not use this file except in compliance with the License.
+# * You may obtain a copy of the License at
+# *
+# *      http://www.apache.org/licenses/LICENSE-2.0
+# *
+# * Unless required by applicable law or agreed to in writing, software
+# * distributed under the License is distributed on an "AS IS" BASIS,
+# * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# * See the License for the specific language governing permissions and
+# * limitations under the License.
+
+import hashlib
+import json
+import os
+from collections import defaultdict, deque
+from threading import Lock
+from typing import Any, Deque, Dict, Iterable, Optional, Tuple
+
+
+class UploadJournal:
+    """A local journal of the objects created by a bulk upload.
+
+    Each line of the journal file records the content key of an uploaded object and
+    the id the server assigned to it. When an upload is run again with the same journal,
+    objects found in the journal are not uploaded again, which makes an interrupted
+    upload resumable without creating duplicates.
+    """
+
+    def __init__(self, path: str) -> None:
+        self._path = path
+        self._lock = Lock()
+        self._entries: Dict[str, Deque[Optional[int]]] = defaultdict(deque)
+
+        if os.path.isfile(path):
+            with open(path, "r", encoding="utf-8") as file:
+                for line in file:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue  # truncated line of an interrupted run
+                    self._entries[record["key"]].append(record.get("id"))
+
+    @property
+    def path(self) -> str:
+        return self._path
+
+    @staticmethod
+    def key(item: Any) -> str:
+        """Content key of an object to upload"""
+        return hashlib.sha1(item.to_json(sort_keys=True).encode("utf-8")).hexdigest()
+
+    def lookup(self, key: str) -> Tuple[bool, Optional[int]]:
+        """Check whether an object with the given key was already created.
+        Each journal entry matches a single object, so that identical objects
+        are all uploaded once.
+
+        Returns
+        -------
+        (found, id): tuple
+            Whether the object was found in the journal, and its id if known.
+        """
+        with self._lock:
+            entries = self._entries.get(key)
+            if not entries:
+                return False, None
+            return True, entries.popleft()
+
+    def record(self, created: Iterable[Tuple[str, Optional[int]]]) -> None:
+        """Persist the (key, id) of created objects."""
+        lines = "".join(
+            json.dumps({"key": key, "id": id_}) + "\n" for key, id_ in created
+        )
+        with self._lock:
+            with open(self._path, "a", encoding="utf-8") as file:
+                file.write(lines)
+                file.flush()
+                os.fsync(file.fileno())
@@ -15,25 +15,274 @@
 # * limitations under the License.
 
 import errno
+import logging
+import math
 import os
 import queue
+import time
+from itertools import count
 from multiprocessing import cpu_count
-from threading import Thread
-from typing import Any, Callable, Iterable, List, Optional, Tuple, TypeVar
+from threading import Event, Lock, Thread
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Set,
+    Sized,
+    Tuple,
+    TypeVar,
+)
+
+from .progress import Progress, track_progress
 
 T = TypeVar("T")  # Type of elements in data
 R = TypeVar("R")  # Return type of worker_fn
 
+# Maximum time (in seconds) the job waits for a result before checking its
+# cancellation token and deadline again
+_POLL_INTERVAL = 0.1
+
+
+class JobInterruptedError(Exception):
+    """To be thrown when a parallel job is cancelled or exceeds its deadline
+    before all the items could be processed.
+    """
+
+    def __init__(
+        self,
+        desc: str,
+        results: Optional[List[Tuple[Any, Any]]] = None,
+        pending: Optional[List[Any]] = None,
+        running: Optional[List[Any]] = None,
+    ) -> None:
+        """
+        Parameters
+        ----------
+        desc: str
+            Description of the exception
+        results: list
+            The (item, result) tuples of the items processed before the interruption.
+        pending: list
+            The items that were never started.
+        running: list
+            The items that were being processed when the job was interrupted.
+        """
+        super().__init__(desc)
+        self._results = results if results is not None else []
+        self._pending = pending if pending is not None else []
+        self._running = running if running is not None else []
+
+    @property
+    def results(self) -> List[Tuple[Any, Any]]:
+        return self._results
+
+    @property
+    def pending(self) -> List[Any]:
+        return self._pending
+
+    @property
+    def running(self) -> List[Any]:
+        return self._running
+
+    @property
+    def unprocessed(self) -> List[Any]:
+        """All the items for which no result is available"""
+        return self._running + self._pending
+
 
 def is_false(v: Any) -> bool:
     """Check if v is 'False'"""
     return isinstance(v, bool) and not v
 
 
+class _WorkerPool:
+    """A pool of daemon threads processing (index, item) tasks with a given function."""
+
+    def __init__(
+        self,
+        worker_fn: Callable[[Any], Any],
+        n_workers: int,
+        cancel: Optional[Event] = None,
+    ) -> None:
+        self._worker_fn = worker_fn
+        self._cancel = cancel
+        self._stop = Event()
+        self._in: queue.Queue = queue.Queue()
+        self._out: queue.Queue = queue.Queue()
+        # indexes of the tasks taken by a worker
+        self.started: Set[int] = set()
+        self._threads = [Thread(target=self._work) for _ in range(n_workers)]
+
+        for t in self._threads:
+            t.daemon = True
+            t.start()
+
+    def _must_stop(self) -> bool:
+        return self._stop.is_set() or (
+            self._cancel is not None and self._cancel.is_set()
+        )
+
+    def _work(self) -> None:
+        while True:
+            task = self._in.get()
+            if task is None:
+                break
+            index, item = task
+            if self._must_stop():
+                continue
+            self.started.add(index)
+            try:
+                result = self._worker_fn(item)
+            except Exception:  # pylint: disable=broad-except
+                logging.getLogger("cytomine.client").exception(
+                    "Parallel job failed to process an item."
+                )
+                result = False
+            self._out.put((index, result))
+
+    def submit(self, index: int, item: Any) -> None:
+        self._in.put((index, item))
+
+    def get(self, timeout: float) -> Optional[Tuple[int, Any]]:
+        try:
+            return self._out.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def get_available(self) -> List[Tuple[int, Any]]:
+        results = []
+        while not self._out.empty():
+            results.append(self._out.get_nowait())
+        return results
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Stop the workers. Tasks that are not started yet are dropped.
+        With `wait`, block until the running tasks are finished."""
+        self._stop.set()
+        while True:
+            try:
+                self._in.get_nowait()
+            except queue.Empty:
+                break
+        for _ in self._threads:
+            self._in.put(None)
+
+        if wait:
+            for t in self._threads:
+                t.join()
+
+
+def iter_parallel(
+    data: Iterable[T],
+    worker_fn: Callable[[T], Optional[R]],
+    n_workers: int = 0,
+    timeout: Optional[float] = None,
+    cancel: Optional[Event] = None,
+) -> Iterator[Tuple[T, Optional[R]]]:
+    """Run a function on a batch of data in parallel and yield the results
+    as soon as they are available. Items of `data` are consumed lazily.
+
+    Parameters
+    ----------
+    data: iterable
+        The data to be processed with `worker_fn`
+    worker_fn: callable
+        A functions that execute the operation on the given output.
+        It has one parameter which must be the same type
+        as the items of `data`. If needed it can return a value.
+        If it raises an exception, the item is reported with the value False.
+    n_workers: int
+        Number of workers to use (default: uses all the available processors)
+    timeout: float|None
+        Maximum duration (in seconds) of the whole job. None for no deadline.
+    cancel: Event|None
+        An event that, once set, stops the job: items that are not started yet
+        are not processed anymore.
+
+    Yields
+    ------
+    result: tuple
+        Processed item as a tuple. First element of the tuple is the item itself,
+        the second element of the tuple is the value returned by `worker_fn` for this item.
+
+    Raises
+    ------
+    JobInterruptedError:
+        When the job is cancelled or its deadline is exceeded. The exception
+        reports the items that were never started or still running.
+    """
+    if n_workers <= 0:
+        n_workers = cpu_count()
+
+    deadline = None if timeout is None else time.monotonic() + timeout
+    pool = _WorkerPool(worker_fn, n_workers, cancel)
+
+    # items sent to the workers and whose result is not received yet
+    in_flight: Dict[int, T] = {}
+    items = (item for item in data if item is not None)
+    indexes = count()
+    exhausted = False
+    reason = None
+    try:
+        while True:
+            # items are fed lazily so that an interruption leaves the remaining
+            # ones untouched
+            while not exhausted and len(in_flight) < 2 * n_workers:
+                item = next(items, None)
+                if item is None:
+                    exhausted = True
+                else:
+                    index = next(indexes)
+                    in_flight[index] = item
+                    pool.submit(index, item)
+
+            if len(in_flight) == 0:
+                break
+
+            wait = _POLL_INTERVAL
+            if deadline is not None:
+                wait = min(wait, deadline - time.monotonic())
+            if cancel is not None and cancel.is_set():
+                reason = "cancelled"
+                break
+            if wait <= 0:
+                reason = "deadline exceeded"
+                break
+
+            task = pool.get(wait)
+            if task is not None:
+                yield in_flight.pop(task[0]), task[1]
+    finally:
+        pool.shutdown(wait=reason is None and len(in_flight) == 0)
+
+    if reason is None:
+        return
+
+    late_results = [(in_flight.pop(index), r) for index, r in pool.get_available()]
+    pending = [item for index, item in in_flight.items() if index not in pool.started]
+    running = [item for index, item in in_flight.items() if index in pool.started]
+    pending.extend(items)
+    raise JobInterruptedError(
+        f"Parallel job interrupted ({reason}): {len(pending)} item(s) not started, "
+        f"{len(running)} item(s) not finished.",
+        results=late_results,
+        pending=pending,
+        running=running,
+    )
+
+
 def generic_parallel(
     data: Iterable[T],
     worker_fn: Callable[[T], Optional[R]],
     n_workers: int = 0,
+    timeout: Optional[float] = None,
+    cancel: Optional[Event] = None,
+    progress: Optional[Progress] = None,
+    size_fn: Optional[Callable[[T, Optional[R]], int]] = None,
 ) -> List[Tuple[T, Optional[R]]]:
     """Run a function on a batch of data in parallel using a given processing function.
 
@@ -47,53 +296,113 @@ def generic_parallel(
         as the items of `data`. If needed it can return a value.
     n_workers: int
         Number of workers to use (default: uses all the available processors)
+    timeout: float|None
+        Maximum duration (in seconds) of the whole job. None for no deadline.
+    cancel: Event|None
+        An event that, once set, stops the job: items that are not started yet
+        are not processed anymore.
+    progress: Progress|None
+        A progress object updated after each processed item.
+    size_fn: callable|None
+        A function returning the number of bytes transferred for an item
+        given the item and its result (used to report progress).
 
     Returns
     -------
     results: iterable
         List processed items as tuples. First element of the tuple is the item itself,
         the second element of the tuple is the value returned by `worker_fn` for this item.
+
+    Raises
+    ------
+    JobInterruptedError:
+        When the job is cancelled or its deadline is exceeded. The exception
+        contains the results obtained so far and the unprocessed items.
     """
+    if progress is not None:
+        if progress.total is None and isinstance(data, Sized):
+            progress.total = len(data)
+        worker_fn = track_progress(worker_fn, progress, size_fn)
 
-    def worker(_in: Any, _out: Any) -> None:
-        while True:
-            item = _in.get()
-            if item is None:
-                break
-            _out.put((item, worker_fn(item)))
+    results: List[Tuple[T, Optional[R]]] = []
+    try:
+        for result in iter_parallel(data, worker_fn, n_workers, timeout, cancel):
+            results.append(result)
+    except JobInterruptedError as e:
+        raise JobInterruptedError(
+            str(e),
+            results=results + e.results,
+            pending=e.pending,
+            running=e.running,
+        ) from e
 
-    if n_workers <= 0:
-        n_workers = cpu_count()
+    return results
 
-    # instantiate multiprocessing objects
-    in_queue: queue.Queue = queue.Queue()
-    out_queue: queue.Queue = queue.Queue()
-    threads = [
-        Thread(target=worker, args=[in_queue, out_queue]) for _ in range(n_workers)
-    ]
 
-    for t in threads:
-        t.daemon = True
-        t.start()
+class RateLimiter:
+    """Thread-safe limiter spacing out calls to at most `rate` calls per second."""
 
-    for item in data:
-        if item is None:
-            continue
-        in_queue.put(item)
+    def __init__(self, rate: float) -> None:
+        if rate <= 0:
+            raise ValueError("The rate must be strictly positive.")
+        self._interval = 1.0 / rate
+        self._next = time.monotonic()
+        self._lock = Lock()
 
-    # feed `n_workers` None values in the queue to stop the workers
-    for _ in range(n_workers):
-        in_queue.put(None)
+    def wait(self) -> None:
+        """Block until the next call is allowed."""
+        with self._lock:
+            now = time.monotonic()
+            slot = max(self._next, now)
+            self._next = slot + self._interval
+        if slot > now:
+            time.sleep(slot - now)
 
-    # wait for the jobs to finish
-    for t in threads:
-        t.join()
 
-    results = []
-    while not out_queue.empty():
-        results.append(out_queue.get_nowait())
+def robust_worker(
+    worker_fn: Callable[[T], R],
+    retries: int = 0,
+    backoff: float = 1.0,
+    rate: Optional[float] = None,
+) -> Callable[[T], Optional[R]]:
+    """Wrap a worker function to retry failed items and limit the call rate.
 
-    return results
+    Parameters
+    ----------
+    worker_fn: callable
+        The worker function. A returned value False (or an exception) is a failure.
+    retries: int
+        Number of times a failed item is processed again.
+    backoff: float
+        Delay (in seconds) before the first retry, doubled for each subsequent one.
+    rate: float|None
+        Maximum number of calls to `worker_fn` per second (shared by all the workers).
+        None for no limit.
+    """
+    limiter = RateLimiter(rate) if rate is not None else None
+    logger = logging.getLogger("cytomine.client")
+
+    def wrapped(item: T) -> Optional[R]:
+        result: Optional[R] = None
+        for attempt in range(retries + 1):
+            if attempt > 0:
+                time.sleep(backoff * 2 ** (attempt - 1))
+            if limiter is not None:
+                limiter.wait()
+
+            try:
+                result = worker_fn(item)
+            except Exception:  # pylint: disable=broad-except
+                if attempt == retries:
+                    raise
+                logger.debug("Attempt %d failed for %s.", attempt + 1, item, exc_info=True)
+                continue
+
+            if not is_false(result):
+                break
+        return result
+
+    return wrapped
 
 
 def generic_chunk_parallel(
@@ -101,6 +410,10 @@ def generic_chunk_parallel(
     worker_fn: Callable[[List[T]], R],
     chunk_size: int = 1,
     n_workers: int = 0,
+    timeout: Optional[float] = None,
+    cancel: Optional[Event] = None,
+    progress: Optional[Progress] = None,
+    size_fn: Optional[Callable[[List[T], R], int]] = None,
 ) -> List[Tuple[Tuple[int, int], R]]:
     """Execute a worker function on all elements of a data list.
     Items are processed by batch of size 'chunk_size'.
@@ -116,6 +429,15 @@ def generic_chunk_parallel(
         Size of the chunk
     n_workers: int
         Number of workers to use (default: uses all the available processors)
+    timeout: float|None
+        Maximum duration (in seconds) of the whole job. None for no deadline.
+    cancel: Event|None
+        An event that, once set, stops the job (see `generic_parallel`).
+    progress: Progress|None
+        A progress object updated after each processed chunk (counting its items).
+    size_fn: callable|None
+        A function returning the number of bytes transferred for a chunk
+        given the chunk and its result (used to report progress).
 
     Returns
     -------
@@ -123,8 +445,14 @@ def generic_chunk_parallel(
         List processed items as tuples. First element of the tuple is the slice
         (start,end) of the chunk (end excluded),
         the second element of the tuple is the value returned by `worker_fn` for this slice.
+
+    Raises
+    ------
+    JobInterruptedError:
+        When the job is cancelled or its deadline is exceeded. Unprocessed items
+        are reported as (start,end) slices.
     """
-    nb_chunks = (len(data) + chunk_size) // chunk_size
+    nb_chunks = math.ceil(len(data) / chunk_size)
     chunk_limits = []
 
     for i in range(nb_chunks):
@@ -136,13 +464,44 @@ def generic_chunk_parallel(
         _start, _end = startend
         return worker_fn(data[_start:_end])
 
-    return generic_parallel(chunk_limits, worker_wrapper, n_workers=n_workers)  # type: ignore
+    if progress is not None:
+        if progress.total is None:
+            progress.total = len(data)
+
+        def chunk_size_fn(startend: Tuple[int, int], result: R) -> int:
+            if size_fn is None:
+                return 0
+            return size_fn(data[startend[0] : startend[1]], result)
+
+        def chunk_count_fn(startend: Tuple[int, int]) -> int:
+            return max(0, min(startend[1], len(data)) - startend[0])
+
+        process_fn = track_progress(
+            worker_wrapper,
+            progress,
+            chunk_size_fn,
+            chunk_count_fn,
+        )
+    else:
+        process_fn = worker_wrapper
+
+    return generic_parallel(  # type: ignore
+        chunk_limits,  # type: ignore
+        process_fn,
+        n_workers=n_workers,
+        timeout=timeout,
+        cancel=cancel,
+    )
 
 
 def generic_download(
     data: Iterable[T],
     download_instance_fn: Callable[[T], Optional[R]],
     n_workers: int = 0,
+    timeout: Optional[float] = None,
+    cancel: Optional[Event] = None,
+    progress: Optional[Progress] = None,
+    size_fn: Optional[Callable[[T, Optional[R]], int]] = None,
 ) -> List[Tuple[T, Optional[R]]]:
     """Download a set of data in parallel using a given download function.
 
@@ -156,6 +515,15 @@ def generic_download(
         items of `data`. If needed it can return a value.
     n_workers: int
         Number of workers to use (default: uses all the available processors)
+    timeout: float|None
+        Maximum duration (in seconds) of the whole job. None for no deadline.
+    cancel: Event|None
+        An event that, once set, stops the job (see `generic_parallel`).
+    progress: Progress|None
+        A progress object updated after each downloaded item.
+    size_fn: callable|None
+        A function returning the number of downloaded bytes for an item
+        given the item and its result (used to report progress).
 
     Returns
     -------
@@ -163,8 +531,21 @@ def generic_download(
         List processed items as tuples. First element of the tuple is the item itself,
         the second element of the tuple
         is the value returned by `download_instance_fn` for this item.
+
+    Raises
+    ------
+    JobInterruptedError:
+        When the job is cancelled or its deadline is exceeded.
     """
-    return generic_parallel(data, download_instance_fn, n_workers=n_workers)
+    return generic_parallel(
+        data,
+        download_instance_fn,
+        n_workers=n_workers,
+        timeout=timeout,
+        cancel=cancel,
+        progress=progress,
+        size_fn=size_fn,
+    )
 
 
 def makedirs(path: str, exist_ok: bool = True) -> None:
@@ -0,0 +1,219 @@
+# -*- coding: utf-8 -*-
+
+# * Copyright (c) 2009-2024. Authors: see NOTICE file.
+# *
+# * Licensed under the Apache License, Version 2.0 (the "License");
+# * you may not use this file except in compliance with the License.
+# * You may obtain a copy of the License at
+# *
+# *      http://www.apache.org/licenses/LICENSE-2.0
+# *
+# * Unless required by applicable law or agreed to in writing, software
+# * distributed under the License is distributed on an "AS IS" BASIS,
+# * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# * See the License for the specific language governing permissions and
+# * limitations under the License.
+
+import copy
+import logging
+import time
+from collections import deque
+from datetime import timedelta
+from threading import Lock
+from typing import Callable, Deque, Optional, Tuple, TypeVar, Union
+
+T = TypeVar("T")  # Type of elements in data
+R = TypeVar("R")  # Return type of worker_fn
+
+
+class Progress:
+    """Thread-safe progress of a job processing items (e.g. a parallel download).
+    Updates are cheap enough to be done for every processed item.
+    """
+
+    def __init__(
+        self,
+        total: Optional[int] = None,
+        callback: Optional[Callable[["Progress"], None]] = None,
+        window: float = 30.0,
+    ) -> None:
+        """
+        Parameters
+        ----------
+        total: int|None
+            Total number of items to process, if known.
+        callback: callable|None
+            A function called after each update with a snapshot of the progress
+            (a copy, taken when the update is recorded). It is called without holding
+            the lock of the progress, possibly from several threads at once.
+        window: float
+            Duration (in seconds) of the window used to compute the rolling throughput.
+        """
+        self.total = total
+        self.done = 0
+        self.failed = 0
+        self.bytes = 0
+        self._callback = callback
+        self._window = window
+        self._start = time.monotonic()
+        self._samples: Deque[Tuple[float, int, int]] = deque([(self._start, 0, 0)])
+        self._lock = Lock()
+
+    def update(self, n_items: int = 1, success: bool = True, n_bytes: int = 0) -> None:
+        """Record that `n_items` items were processed, transferring `n_bytes` bytes."""
+        with self._lock:
+            if success:
+                self.done += n_items
+            else:
+                self.failed += n_items
+            self.bytes += n_bytes
+
+            now = time.monotonic()
+            self._samples.append((now, self.processed, self.bytes))
+            while len(self._samples) > 2 and self._samples[0][0] < now - self._window:
+                self._samples.popleft()
+
+            callback = self._callback
+            snapshot = self._snapshot() if callback is not None else None
+
+        # a slow callback does not block the other workers updating the progress
+        if callback is not None and snapshot is not None:
+            callback(snapshot)
+
+    def _snapshot(self) -> "Progress":
+        # pylint: disable=protected-access
+        snapshot = copy.copy(self)
+        snapshot._callback = None
+        snapshot._lock = Lock()
+        # only the oldest and newest samples are used to compute the throughput
+        snapshot._samples = deque([self._samples[0], self._samples[-1]])
+        return snapshot
+
+    @property
+    def processed(self) -> int:
+        """Number of processed items (successful or not)"""
+        return self.done + self.failed
+
+    @property
+    def elapsed(self) -> float:
+        """Time elapsed (in seconds) since the beginning of the job"""
+        return time.monotonic() - self._start
+
+    @property
+    def is_finished(self) -> bool:
+        return self.total is not None and self.processed >= self.total
+
+    def _rate(self, index: int) -> float:
+        (t0, *first), (t1, *last) = self._samples[0], self._samples[-1]
+        if t1 <= t0:
+            return 0.0
+        return (last[index] - first[index]) / (t1 - t0)
+
+    @property
+    def throughput(self) -> float:
+        """Rolling throughput (in items per second)"""
+        return self._rate(0)
+
+    @property
+    def bytes_throughput(self) -> float:
+        """Rolling throughput (in bytes per second)"""
+        return self._rate(1)
+
+    @property
+    def eta(self) -> Optional[float]:
+        """Estimated remaining time (in seconds), None if it cannot be estimated"""
+        throughput = self.throughput
+        if self.total is None or throughput <= 0:
+            return None
+        return max(0.0, (self.total - self.processed) / throughput)
+
+    def __str__(self) -> str:
+        total = "?" if self.total is None else self.total
+        eta = "?" if self.eta is None else str(timedelta(seconds=round(self.eta)))
+        return (
+            f"{self.processed}/{total} items processed ({self.failed} failed), "
+            f"{self.bytes / 1e6:.1f} MB transferred, {self.throughput:.1f} items/s, "
+            f"{self.bytes_throughput / 1e6:.2f} MB/s, ETA {eta}"
+        )
+
+
+class ProgressLogger:
+    """Default progress reporter: logs the progress at most every `interval` seconds,
+    and when the job is finished."""
+
+    def __init__(
+        self,
+        interval: float = 5.0,
+        logger: Optional[logging.Logger] = None,
+        level: int = logging.INFO,
+    ) -> None:
+        self._interval = interval
+        self._logger = logger if logger is not None else logging.getLogger("cytomine.client")
+        self._level = level
+        self._last: Optional[float] = None
+        self._lock = Lock()
+
+    def __call__(self, progress: Progress) -> None:
+        now = time.monotonic()
+        with self._lock:
+            report = (
+                progress.is_finished
+                or self._last is None
+                or now - self._last >= self._interval
+            )
+            if report:
+                self._last = now
+        if report:
+            self._logger.log(self._level, "%s", progress)
+
+
+def make_progress(
+    progress: Optional[Union[bool, Callable[[Progress], None]]],
+    total: Optional[int] = None,
+) -> Optional[Progress]:
+    """Build a progress object from a user `progress` parameter: True for the default
+    reporter (ProgressLogger), a callable for a custom reporter, None/False for none."""
+    if progress is None or progress is False:
+        return None
+    if progress is True:
+        return Progress(total, ProgressLogger())
+    return Progress(total, progress)  # type: ignore
+
+
+def track_progress(
+    worker_fn: Callable[[T], R],
+    progress: Progress,
+    size_fn: Optional[Callable[[T, R], int]] = None,
+    count_fn: Optional[Callable[[T], int]] = None,
+) -> Callable[[T], R]:
+    """Wrap a worker function so that `progress` is updated after each processed item.
+
+    Parameters
+    ----------
+    worker_fn: callable
+        The worker function to wrap. A returned value False (or an exception)
+        is considered as a failure.
+    progress: Progress
+        The progress to update
+    size_fn: callable|None
+        A function returning the number of bytes transferred for the given item
+        and result. None for not counting bytes.
+    count_fn: callable|None
+        A function returning the number of items represented by the given item
+        (e.g. for a chunk of items). None for counting 1 per item.
+    """
+
+    def wrapped(item: T) -> R:
+        n_items = 1 if count_fn is None else count_fn(item)
+        try:
+            result = worker_fn(item)
+        except Exception:
+            progress.update(n_items, success=False)
+            raise
+
+        success = result is not False
+        n_bytes = size_fn(item, result) if size_fn is not None and success else 0
+        progress.update(n_items, success=success, n_bytes=n_bytes)
+        return result
+
+    return wrapped
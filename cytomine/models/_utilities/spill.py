@@ -0,0 +1,223 @@
+# -*- coding: utf-8 -*-
+
+# * Copyright (c) 2009-2024. Authors: see NOTICE file.
+# *
+# * Licensed under the Apache License, Version 2.0 (the "License");
+# * you may not use this file except in compliance with the License.
+# * You may obtain a copy of the License at
+# *
+# *      http://www.apache.org/licenses/LICENSE-2.0
+# *
+# * Unless required by applicable law or agreed to in writing, software
+# * distributed under the License is distributed on an "AS IS" BASIS,
+# * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# * See the License for the specific language governing permissions and
+# * limitations under the License.
+
+import hashlib
+import pickle
+import tempfile
+import zlib
+from bisect import bisect_right
+from collections import OrderedDict
+from collections.abc import MutableSequence
+from itertools import accumulate
+from threading import RLock
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+
+class SpillList(MutableSequence):  # type: ignore
+    """A list keeping at most `max_items` items in memory.
+
+    The items are stored by pages of `page_size` items. When too many pages are loaded,
+    the least recently used ones are written (pickled and compressed) to a temporary
+    file and loaded back on access. Evicted pages are written back when their content
+    changed, so that the items changed in place while their page was loaded are kept;
+    an item reference kept after its page is evicted is a copy, whose later changes are
+    lost. The space of the rewritten pages is reused, so that the file does not grow
+    when the list is only read.
+
+    Parameters
+    ----------
+    items: iterable
+        Initial items (consumed lazily).
+    max_items: int
+        Maximum number of items kept in memory (rounded to a whole number of pages,
+        with at least one page).
+    page_size: int
+        Number of items per page.
+    directory: str|None
+        Directory of the temporary file (defaults to the system temporary directory).
+    """
+
+    def __init__(
+        self,
+        items: Iterable[Any] = (),
+        max_items: int = 100_000,
+        page_size: int = 1000,
+        directory: Optional[str] = None,
+    ) -> None:
+        if max_items <= 0 or page_size <= 0:
+            raise ValueError("max_items and page_size must be strictly positive.")
+        self._page_size = page_size
+        self._max_pages = max(1, max_items // page_size)
+        self._directory = directory
+        self._file: Any = None
+        self._lock = RLock()
+
+        self._length = 0
+        self._sizes: List[int] = []  # number of items in each page
+        self._ends: Optional[List[int]] = []  # cumulated page sizes (None if outdated)
+        # (offset, length, capacity) of each page on disk
+        self._spilled: List[Optional[Tuple[int, int, int]]] = []
+        self._free: List[Tuple[int, int]] = []  # (offset, capacity) of unused space
+        self._digests: Dict[int, bytes] = {}  # on disk digest of the loaded pages
+        self._loaded: "OrderedDict[int, List[Any]]" = OrderedDict()
+
+        self.extend(items)
+
+    @property
+    def max_items(self) -> int:
+        return self._max_pages * self._page_size
+
+    @property
+    def n_spilled(self) -> int:
+        """Number of pages not loaded in memory."""
+        return len(self._sizes) - len(self._loaded)
+
+    def _page(self, page: int) -> List[Any]:
+        items = self._loaded.get(page)
+        if items is not None:
+            self._loaded.move_to_end(page)
+            return items
+
+        offset, length, _ = self._spilled[page]  # type: ignore
+        self._file.seek(offset)
+        data = self._file.read(length)
+        items = pickle.loads(zlib.decompress(data))
+        self._digests[page] = hashlib.sha1(data).digest()
+        self._loaded[page] = items
+        self._evict()
+        return items
+
+    def _allocate(self, length: int) -> Tuple[int, int]:
+        """The (offset, capacity) of a free space of the file fitting `length` bytes."""
+        for i, (offset, capacity) in enumerate(self._free):
+            if capacity >= length:
+                del self._free[i]
+                return offset, capacity
+        return self._file.seek(0, 2), length
+
+    def _evict(self) -> None:
+        while len(self._loaded) > self._max_pages:
+            page, items = self._loaded.popitem(last=False)
+            # The items of a loaded page may have been modified in place (e.g. an
+            # attribute of a model), so that the page is written back if it changed
+            data = zlib.compress(pickle.dumps(items, pickle.HIGHEST_PROTOCOL), 1)
+            digest = self._digests.pop(page, None)
+            slot = self._spilled[page]
+            if slot is not None and digest == hashlib.sha1(data).digest():
+                continue
+
+            if self._file is None:
+                self._file = tempfile.TemporaryFile(dir=self._directory)
+            if slot is not None and slot[2] >= len(data):
+                offset, capacity = slot[0], slot[2]
+            else:
+                if slot is not None:
+                    self._free.append((slot[0], slot[2]))
+                offset, capacity = self._allocate(len(data))
+            self._file.seek(offset)
+            self._file.write(data)
+            self._spilled[page] = (offset, len(data), capacity)
+
+    def _locate(self, index: int) -> Tuple[int, int]:
+        """The page of an item and its position in the page."""
+        length = len(self)
+        if index < 0:
+            index += length
+        if not 0 <= index < length:
+            raise IndexError("SpillList index out of range")
+        if self._ends is None:
+            self._ends = list(accumulate(self._sizes))
+        page = bisect_right(self._ends, index)
+        return page, index - (self._ends[page] - self._sizes[page])
+
+    def _resize(self, page: int, delta: int) -> None:
+        self._length += delta
+        self._sizes[page] += delta
+        self._ends = None
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __getitem__(self, index: Union[int, slice]) -> Any:
+        with self._lock:
+            if isinstance(index, slice):
+                return [self[i] for i in range(*index.indices(len(self)))]
+            page, position = self._locate(index)
+            return self._page(page)[position]
+
+    def __setitem__(self, index: Union[int, slice], value: Any) -> None:
+        with self._lock:
+            if isinstance(index, slice):
+                indices = range(*index.indices(len(self)))
+                values = list(value)
+                if len(values) != len(indices):
+                    raise ValueError("Slice assignment cannot change the SpillList size.")
+                for i, v in zip(indices, values):
+                    self[i] = v
+                return
+            page, position = self._locate(index)
+            self._page(page)[position] = value
+
+    def __delitem__(self, index: Union[int, slice]) -> None:
+        with self._lock:
+            if isinstance(index, slice):
+                for i in sorted(range(*index.indices(len(self))), reverse=True):
+                    del self[i]
+                return
+            page, position = self._locate(index)
+            del self._page(page)[position]
+            self._resize(page, -1)
+
+    def insert(self, index: int, value: Any) -> None:
+        with self._lock:
+            if index >= len(self) or len(self) == 0:
+                self.append(value)
+                return
+            page, position = self._locate(max(index, -len(self)))
+            self._page(page).insert(position, value)
+            self._resize(page, 1)
+
+    def append(self, value: Any) -> None:
+        with self._lock:
+            if len(self._sizes) == 0 or self._sizes[-1] >= self._page_size:
+                self._sizes.append(0)
+                self._spilled.append(None)
+                self._loaded[len(self._sizes) - 1] = []
+                self._evict()
+            page = len(self._sizes) - 1
+            self._page(page).append(value)
+            self._resize(page, 1)
+
+    def extend(self, values: Iterable[Any]) -> None:
+        for value in values:
+            self.append(value)
+
+    def __iter__(self) -> Iterator[Any]:
+        for page in range(len(self._sizes)):
+            with self._lock:
+                items = list(self._page(page))
+            yield from items
+
+    def __repr__(self) -> str:
+        return (
+            f"SpillList({len(self)} items, {self.n_spilled}/{len(self._sizes)} "
+            f"pages on disk)"
+        )
+
+    def close(self) -> None:
+        """Release the temporary file (the spilled items are lost)."""
+        if self._file is not None:
+            self._file.close()
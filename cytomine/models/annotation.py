@@ -14,16 +14,101 @@
 # * See the License for the specific language governing permissions and
 # * limitations under the License.
 
-# pylint: disable=invalid-name
+# pylint: disable=invalid-name,too-many-lines
 
+import copy
+import logging
 import os
-from typing import Any, Dict, List, Optional, Union
+from threading import Event, Lock
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
 
 from cytomine.cytomine import Cytomine
 from cytomine.models.collection import Collection
+from cytomine.models.image import ImageInstance
 from cytomine.models.model import Model
 
-from ._utilities import generic_download, generic_image_dump, is_false
+from ._utilities import (
+    JobInterruptedError,
+    Progress,
+    generic_download,
+    generic_image_dump,
+    is_false,
+    iter_parallel,
+    make_progress,
+)
+from ._utilities import geometry
+
+
+# Annotation attributes that can be loaded lazily, with the collection parameter
+# making the server include them
+_LAZY_FIELDS = {
+    "location": "showWKT",
+    "area": "showGIS",
+    "areaUnit": "showGIS",
+    "perimeter": "showGIS",
+    "perimeterUnit": "showGIS",
+    "centroid": "showGIS",
+    "term": "showTerm",
+    "userByTerm": "showTerm",
+    "track": "showTrack",
+    "annotationTrack": "showTrack",
+}
+
+
+class _LazyPage:
+    """A page of annotations fetched in lazy mode. The first access to a missing
+    attribute fetches the page again with the parameter providing it, and the fetched
+    values are kept (by annotation id) for the other annotations of the page.
+
+    The page only refers to the query (not to the annotations nor to the collection),
+    so that lazy annotations can be pickled (e.g. by a collection with a memory limit).
+    """
+
+    def __init__(self, query: "AnnotationCollection", ids: Iterable[int]) -> None:
+        # pylint: disable=protected-access
+        self._query = (query.__class__, dict(query._filters), query.parameters)
+        self._ids = list(ids)
+        self._values: Dict[str, Dict[int, Dict[str, Any]]] = {}
+        self._lock = Lock()
+
+    def __getstate__(self) -> Dict[str, Any]:
+        state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        self._lock = Lock()
+
+    def load(self, parameter: str, id_: int) -> Dict[str, Any]:
+        """The attributes provided by the given show* parameter for an annotation of
+        the page."""
+        fields = [field for field, p in _LAZY_FIELDS.items() if p == parameter]
+        with self._lock:
+            if parameter not in self._values:
+                self._values[parameter] = self._fetch(parameter, fields)
+        return self._values[parameter][id_]
+
+    def _fetch(self, parameter: str, fields: List[str]) -> Dict[int, Dict[str, Any]]:
+        cls, filters, parameters = self._query
+        query = cls(filters=dict(filters), **parameters)
+        query._lazy = False  # pylint: disable=protected-access
+        setattr(query, parameter, True)
+        if query.fetch() is False:
+            raise ConnectionError(f"Failed to load the attributes {fields}.")
+        values = {a.id: {f: getattr(a, f, None) for f in fields} for a in query}
+
+        # The page may have changed on the server since it was fetched
+        missing = [id_ for id_ in self._ids if id_ not in values]
+        if len(missing) > 0:
+            annotations = Cytomine.get_instance().fetch_many(Annotation, missing)
+            if any(a is False for a in annotations):
+                raise ConnectionError(
+                    f"Failed to load the attributes {fields} of annotations {missing}."
+                )
+            for id_, annotation in zip(missing, annotations):
+                values[id_] = {f: getattr(annotation, f, None) for f in fields}
+        return values
 
 
 class Annotation(Model):
@@ -58,6 +143,27 @@ class Annotation(Model):
     def __str__(self) -> str:
         return f"[{self.callback_identifier}] {self.id}"
 
+    def __getattr__(self, name: str) -> Any:
+        # Only called for missing attributes, i.e. not fetched yet in lazy mode (or not
+        # copied from the server state yet, see `Model.populate`)
+        page = self.__dict__.get("_lazy_page")
+        state = self.__dict__.get("_state")
+        if page is not None and name in _LAZY_FIELDS and name not in (state or {}):
+            for field, value in page.load(_LAZY_FIELDS[name], self.id).items():
+                if field in self.__dict__ or state is not None and field in state:
+                    continue
+                self.__dict__[field] = value
+                if state is not None:
+                    state[field] = copy.copy(value)
+            return self.__dict__[name]
+        return super().__getattr__(name)
+
+    def to_json(self, **dump_parameters: Any) -> str:
+        if "_lazy_page" in self.__dict__:
+            for name in _LAZY_FIELDS:
+                getattr(self, name, None)
+        return super().to_json(**dump_parameters)
+
     def review(
         self,
         id_terms: Optional[List[int]] = None,
@@ -245,8 +351,439 @@ class AnnotationCollection(Collection):
         self.included = False
         self.annotation = None
 
+        self._lazy = False
+        # Parsed geometries, with the locations they were parsed from
+        self._geometries: Optional[Tuple[List[Optional[str]], Any]] = None
+        self._index: Optional[geometry.SpatialIndex] = None
+        self._quarantined: List[Tuple[Any, str]] = []
+
         self.set_parameters(parameters)
 
+    def lazy(self, eager: Iterable[str] = ()) -> "AnnotationCollection":
+        """Fetch the annotations with a minimal set of attributes. The other attributes
+        (location, area, perimeter, term, track...) are loaded on first access, at once
+        for all the annotations of the page fetched together.
+
+        Parameters
+        ----------
+        eager: iterable
+            Attributes to fetch immediately nevertheless (e.g. ["term"]).
+
+        Returns
+        -------
+        self: AnnotationCollection
+        """
+        unknown = set(eager) - set(_LAZY_FIELDS)
+        if len(unknown) > 0:
+            raise ValueError(f"Attributes {unknown} cannot be loaded lazily.")
+
+        eager_parameters = {_LAZY_FIELDS[field] for field in eager}
+        for parameter in set(_LAZY_FIELDS.values()):
+            setattr(self, parameter, parameter in eager_parameters)
+        self._lazy = True
+        return self
+
+    def populate(
+        self,
+        attributes: Dict[str, Any],
+        append_mode: bool = False,
+    ) -> "AnnotationCollection":
+        start = len(self._data) if append_mode else 0
+        super().populate(attributes, append_mode)
+        if not self._lazy or self._hydration is not None:
+            return self
+
+        lazy_fields = [f for f, p in _LAZY_FIELDS.items() if not getattr(self, p)]
+        instances = attributes["collection"]
+        page = _LazyPage(self, (instance.get("id") for instance in instances))
+        for position, instance in enumerate(instances, start):
+            # each annotation is changed right after its access, while it is in memory
+            # (see `set_memory_limit`)
+            annotation = self._data[position]
+            for field in lazy_fields:
+                if field not in instance:
+                    annotation.__dict__.pop(field, None)
+            annotation._lazy_page = page  # pylint: disable=protected-access
+        return self
+
+    def _values(self, attribute: str) -> List[Any]:
+        return [
+            item.get(attribute) if isinstance(item, dict) else getattr(item, attribute, None)
+            for item in self
+        ]
+
+    def _locations(self) -> List[Optional[str]]:
+        return self._values("location")
+
+    @staticmethod
+    def _set_location(item: Any, location: str) -> None:
+        if isinstance(item, dict):
+            item["location"] = location
+        else:
+            item.location = location
+
+    def geometries(self) -> Any:
+        """The geometries of the annotations, parsed from their `location` (WKT) at once.
+        The result is cached until a location changes.
+
+        Returns
+        -------
+        geometries: numpy.ndarray
+            Array (n,) of Shapely geometries, in the order of the collection
+            (None for annotations without location).
+        """
+        locations = self._locations()
+        if self._geometries is None or self._geometries[0] != locations:
+            self._geometries = (locations, geometry.parse_wkt(locations))
+        return self._geometries[1]
+
+    def bounds(self) -> Any:
+        """Array (n, 4) of the annotation bounds (minx, miny, maxx, maxy)."""
+        return geometry.bounds(self.geometries())
+
+    def areas(self) -> Any:
+        """Array (n,) of the annotation areas, computed from their geometry."""
+        return geometry.areas(self.geometries())
+
+    def centroids(self) -> Any:
+        """Array (n, 2) of the (x, y) coordinates of the annotation centroids."""
+        return geometry.centroids(self.geometries())
+
+    def rasterize(
+        self,
+        image: ImageInstance,
+        window: Optional[Tuple[int, int, int, int]] = None,
+        zoom: int = 0,
+        mode: str = "binary",
+        term_labels: Optional[Dict[int, int]] = None,
+    ) -> Any:
+        """Draw the annotations into a mask locally, instead of requesting masks
+        rendered by the server (e.g. `ImageInstance.window(mask=True)`).
+
+        Parameters
+        ----------
+        image: ImageInstance
+            The image of the annotations (its height is needed to flip the y axis).
+        window: tuple|None
+            The (x, y, width, height) of the window to draw, (x, y) being its top-left
+            corner as in `ImageInstance.window`. None for the whole image.
+        zoom: int
+            The zoom level: the mask is 2^zoom times smaller than the window.
+        mode: str
+            "binary" for a boolean mask, "instance" for a mask where each annotation is
+            drawn with its position in the collection plus one, "label" for a mask where
+            each annotation is drawn with the label of its term.
+        term_labels: dict|None
+            Mapping of term id to (non-zero) label, required in "label" mode. Annotations
+            without a mapped term are not drawn (the first mapped term is used).
+
+        Returns
+        -------
+        mask: numpy.ndarray
+            Array (height, width), 0 (or False) for the background. Annotations drawn
+            later are on top of the previous ones.
+        """
+        values: List[Any]
+        if mode == "binary":
+            values, dtype = [True] * len(self), "bool"
+        elif mode == "instance":
+            values, dtype = list(range(1, len(self) + 1)), "int32"
+        elif mode == "label":
+            if term_labels is None:
+                raise ValueError("The label mode requires term labels.")
+            values = [
+                next((term_labels[t] for t in terms or [] if t in term_labels), 0)
+                for terms in self._values("term")
+            ]
+            dtype = "uint8" if max(values, default=0) < 256 else "int32"
+        else:
+            raise ValueError(f"Unknown rasterization mode '{mode}'.")
+
+        if window is None:
+            window = (0, 0, image.width, image.height)  # type: ignore
+        return geometry.rasterize(
+            self.geometries(), values, window, image.height, 2.0**-zoom, dtype  # type: ignore
+        )
+
+    def spatial_index(self) -> geometry.SpatialIndex:
+        """A spatial index (STR-tree) over the annotation geometries, built on first use
+        and rebuilt when a location changes. Its queries return positions in the
+        collection (requires Shapely >= 2.0)."""
+        geometries = self.geometries()
+        if self._index is None or self._index.geometries is not geometries:
+            self._index = geometry.SpatialIndex(geometries)
+        return self._index
+
+    def _subset(self, positions: Iterable[int]) -> "AnnotationCollection":
+        collection = copy.copy(self)
+        collection._data = [self[int(i)] for i in positions]  # pylint: disable=protected-access
+        collection._geometries = None  # pylint: disable=protected-access
+        collection._index = None  # pylint: disable=protected-access
+        return collection
+
+    def query_bbox(
+        self,
+        minx: float,
+        miny: float,
+        maxx: float,
+        maxy: float,
+        predicate: Optional[str] = "intersects",
+    ) -> "AnnotationCollection":
+        """The annotations matching the predicate (by default, intersecting) with a box,
+        found locally using the spatial index.
+
+        Parameters
+        ----------
+        minx, miny, maxx, maxy: float
+            The box coordinates, in the coordinate system of the annotation locations.
+        predicate: str|None
+            Shapely predicate (e.g. "intersects", "within", "contains"). None for
+            comparing bounding boxes only.
+        """
+        return self._subset(self.spatial_index().query_bbox(minx, miny, maxx, maxy, predicate))
+
+    def query_geometry(
+        self,
+        geom: Any,
+        predicate: Optional[str] = "intersects",
+    ) -> "AnnotationCollection":
+        """The annotations matching the predicate (by default, intersecting) with a
+        Shapely geometry, found locally using the spatial index."""
+        return self._subset(self.spatial_index().query_geometry(geom, predicate))
+
+    def nearest(
+        self,
+        geom: Any,
+        max_distance: Optional[float] = None,
+    ) -> "AnnotationCollection":
+        """The annotations nearest to a Shapely geometry (several in case of ties),
+        optionally within `max_distance`."""
+        return self._subset(self.spatial_index().nearest(geom, max_distance))
+
+    def join(
+        self,
+        other: Optional["AnnotationCollection"] = None,
+        predicate: Optional[str] = "intersects",
+    ) -> List[Tuple[Any, Any]]:
+        """Pairs of annotations matching the predicate (by default, intersecting),
+        e.g. for overlap checks or deduplication.
+
+        Parameters
+        ----------
+        other: AnnotationCollection|None
+            The annotations to join with. None for a self-join, where each pair of
+            distinct annotations is reported once.
+        predicate: str|None
+            The predicate applied to (annotation of this collection, annotation of
+            other).
+
+        Returns
+        -------
+        pairs: list
+            List of (annotation of this collection, annotation of other) tuples.
+        """
+        index = self.spatial_index()
+        target = self if other is None else other
+        pairs = index.join(None if other is None else other.spatial_index(), predicate)
+        return [(self[int(i)], target[int(j)]) for i, j in pairs]
+
+    def preprocess_geometries(
+        self,
+        tolerance: Optional[float] = None,
+        decimals: Optional[int] = None,
+        repair: bool = False,
+    ) -> int:
+        """Simplify, round and repair the annotation locations at once (e.g. polygons
+        produced by segmentation models, with thousands of sub-pixel vertices).
+
+        Parameters
+        ----------
+        tolerance: float|None
+            Maximum distance (in pixels) between the original and the simplified
+            locations. None for no simplification.
+        decimals: int|None
+            Number of decimals the coordinates are rounded to. None for no rounding.
+        repair: bool
+            True for repairing invalid locations (e.g. self-intersecting polygons).
+
+        Returns
+        -------
+        saved: int
+            The number of bytes saved on the WKT of the locations (whose geometry
+            changed, the others are left untouched).
+        """
+        locations = self._locations()
+        geometries = self.geometries()
+        processed = geometry.preprocess(geometries, tolerance, decimals, repair)
+        changed = (~geometry.equal(geometries, processed)).nonzero()[0]
+
+        saved = 0
+        for position, after in zip(changed, geometry.to_wkt(processed[changed], decimals)):
+            before = locations[position]
+            if before is not None:
+                self._set_location(self[int(position)], after)
+                saved += len(before) - len(after)
+        return saved
+
+    @property
+    def quarantined(self) -> List[Tuple[Any, str]]:
+        """The annotations removed by the last validation, with the reason."""
+        return self._quarantined
+
+    def validate(self, repair: bool = True) -> List[Tuple[Any, str]]:
+        """Check the validity of all the annotation locations at once, repair the invalid
+        ones and move those that cannot be repaired to a quarantine, so that they do not
+        make the server reject whole chunks of a bulk save.
+
+        A repaired location must keep the dimension of the original one (e.g. a
+        self-intersecting polygon can become a multipolygon, but not a line) and must not
+        be a heterogeneous geometry collection.
+
+        Parameters
+        ----------
+        repair: bool
+            True for repairing the invalid locations, False for quarantining them all.
+
+        Returns
+        -------
+        quarantined: list
+            The (annotation, reason) tuples of the annotations removed from the
+            collection (also available as `quarantined`).
+        """
+        geometries = self.geometries()
+        valid = geometry.is_valid(geometries)
+        reasons = geometry.invalidity_reasons(geometries)
+
+        rejected = ~valid
+        if repair and not valid.all():
+            invalid = (~valid & ~geometry.is_missing(geometries)).nonzero()[0]
+            repaired = geometry.make_valid(geometries[invalid])
+            fixed = (
+                geometry.is_valid(repaired)
+                & ~geometry.is_collection(repaired)
+                & (geometry.dimensions(repaired) == geometry.dimensions(geometries[invalid]))
+            )
+            locations = geometry.to_wkt(repaired[fixed])
+            for position, location in zip(invalid[fixed], locations):
+                self._set_location(self[int(position)], location)
+            rejected[invalid[fixed]] = False
+
+        self._quarantined = [
+            (self[int(i)], reasons[i] or "Missing location") for i in rejected.nonzero()[0]
+        ]
+        if rejected.any():
+            self._data = [item for item, reject in zip(self, rejected) if not reject]
+        return self._quarantined
+
+    def save(
+        self,
+        *args: Any,
+        simplify: Optional[float] = None,
+        decimals: Optional[int] = None,
+        repair: bool = False,
+        validate: bool = False,
+        **kwargs: Any,
+    ) -> Union[bool, Collection]:
+        """Save the annotations (see `Collection.save`), optionally pre-processing
+        their locations to reduce the payload size.
+
+        Parameters
+        ----------
+        simplify: float|None
+            Tolerance (in pixels) of the location simplification. None for none.
+        decimals: int|None
+            Number of decimals the coordinates are rounded to. None for no rounding.
+        repair: bool
+            True for repairing invalid locations.
+        validate: bool
+            True for validating the locations before the upload (see `validate`).
+            The annotations that cannot be repaired are not uploaded and are reported
+            in `quarantined`.
+        """
+        if simplify is not None or decimals is not None or repair:
+            saved = self.preprocess_geometries(simplify, decimals, repair)
+            Cytomine.get_instance().log(
+                f"Geometry pre-processing saved {saved} bytes of payload."
+            )
+        if validate:
+            for annotation, reason in self.validate():
+                Cytomine.get_instance().log(
+                    f"Annotation {annotation} quarantined: {reason}", logging.WARNING
+                )
+        return super().save(*args, **kwargs)
+
+    def iter_tiles(
+        self,
+        tile_size: int = 8192,
+        image: Optional[ImageInstance] = None,
+        n_workers: int = 0,
+        timeout: Optional[float] = None,
+        cancel: Optional[Event] = None,
+    ) -> Iterator[Any]:
+        """Fetch the annotations of an image by tiles, concurrently, and yield them as
+        soon as their tile is received. Each tile is fetched with the `bbox` filter and
+        the other parameters of this collection (e.g. showWKT, term). Annotations
+        straddling tile borders are yielded only once.
+
+        The collection itself is not populated, so that large images (e.g. millions of
+        detections on a whole-slide image) can be processed in bounded memory.
+
+        Parameters
+        ----------
+        tile_size: int
+            Size (in pixels) of the square tiles.
+        image: ImageInstance|None
+            The image (with its width and height), to avoid fetching it again.
+            None for fetching the image of the `image` filter.
+        n_workers: int
+            Number of threads fetching the tiles concurrently. Value 0 for using as
+            many threads as cpus on the machine.
+        timeout: float|None
+            Maximum duration (in seconds) of the whole fetch. None for no deadline.
+        cancel: Event|None
+            An event that, once set, stops fetching the remaining tiles.
+
+        Yields
+        ------
+        annotation: Annotation
+            The annotations of the image (dicts or records if raw hydration is set).
+
+        Raises
+        ------
+        ConnectionError:
+            When a tile cannot be fetched.
+        """
+        if image is None:
+            if self.image is None:
+                raise ValueError("The tiled fetch requires an image.")
+            image = ImageInstance().fetch(self.image)
+            if image is False:
+                raise ConnectionError(f"Failed to fetch the image {self.image}.")
+
+        width, height = int(image.width), int(image.height)  # type: ignore
+        tiles = [
+            (x, y, min(x + tile_size, width), min(y + tile_size, height))
+            for y in range(0, height, tile_size)
+            for x in range(0, width, tile_size)
+        ]
+
+        def fetch(tile: Tuple[int, int, int, int]) -> Any:
+            query: Any = copy.copy(self)
+            query._data = []  # pylint: disable=protected-access
+            query.image = image.id
+            query.bbox = ",".join(str(v) for v in tile)
+            return query.fetch()
+
+        seen = set()
+        for tile, result in iter_parallel(tiles, fetch, n_workers, timeout, cancel):
+            if is_false(result):
+                raise ConnectionError(f"Failed to fetch the annotations of the tile {tile}.")
+            for annotation in result or ():
+                id_ = annotation["id"] if isinstance(annotation, dict) else annotation.id
+                if id_ not in seen:
+                    seen.add(id_)
+                    yield annotation
+
     def uri(self, without_filters: bool = False) -> str:
         if self.included:
             self.add_filter("imageinstance", self.image)
@@ -261,6 +798,9 @@ class AnnotationCollection(Collection):
         dest_pattern: str,
         n_workers: int = 0,
         override: bool = True,
+        timeout: Optional[float] = None,
+        cancel: Optional[Event] = None,
+        progress: Optional[Union[bool, Callable[[Progress], None]]] = None,
         **dump_params: Any,
     ) -> "AnnotationCollection":
         """Download the crops of the annotations
@@ -274,6 +814,15 @@ class AnnotationCollection(Collection):
             True if a file with same name can be overrided by the new file.
         n_workers: int
             Number of workers to use (default: uses all the available processors)
+        timeout: float|None
+            Maximum duration (in seconds) of the whole download. Crops that could not be
+            downloaded before the deadline are considered as failed.
+        cancel: Event|None
+            An event that, once set, stops the download. Crops that were not downloaded
+            yet are considered as failed.
+        progress: bool|callable|None
+            True for logging the download progress, or a function called with a `Progress`
+            object after each crop. None for no reporting.
         dump_params: dict
             Parameters for dumping the annotations (see Annotation.dump)
 
@@ -291,11 +840,23 @@ class AnnotationCollection(Collection):
 
             return an
 
-        results = generic_download(
-            self,
-            download_instance_fn=dump_crop,
-            n_workers=n_workers,
-        )
+        def crop_size(_: Annotation, an: Any) -> int:
+            if isinstance(an, bool) or not an.filenames:
+                return 0
+            return sum(os.path.getsize(f) for f in an.filenames if os.path.isfile(f))
+
+        try:
+            results = generic_download(
+                self,
+                download_instance_fn=dump_crop,
+                n_workers=n_workers,
+                timeout=timeout,
+                cancel=cancel,
+                progress=make_progress(progress, len(self)),
+                size_fn=crop_size,
+            )
+        except JobInterruptedError as e:
+            results = e.results + [(an, False) for an in e.unprocessed]
 
         # check errors
         count_fail = 0
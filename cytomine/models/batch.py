@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+
+# * Copyright (c) 2009-2024. Authors: see NOTICE file.
+# *
+# * Licensed under the Apache License, Version 2.0 (the "License");
+# * you may not use this file except in compliance with the License.
+# * You may obtain a copy of the License at
+# *
+# *      http://www.apache.org/licenses/LICENSE-2.0
+# *
+# * Unless required by applicable law or agreed to in writing, software
+# * distributed under the License is distributed on an "AS IS" BASIS,
+# * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# * See the License for the specific language governing permissions and
+# * limitations under the License.
+
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from cytomine.cytomine import Cytomine
+from cytomine.models.collection import Collection, CollectionPartialUploadException
+from cytomine.models.model import Model, _batch_sessions, current_batch_session
+
+
+class BatchSession:
+    """A write-behind buffer for the creation of models.
+
+    Within the context of a batch session (in the same thread), saving a new model does
+    not send a request: the model is buffered and created later with other buffered
+    models of the same type, in a single collection request. Buffered models are sent
+    by a background thread as soon as `max_size` models are waiting or the oldest one
+    waits for more than `max_delay` seconds, and when the session ends.
+    Created models get their id as soon as their batch is committed.
+
+    Examples
+    --------
+    >>> with BatchSession(max_size=100):
+    ...     for location in locations:
+    ...         Annotation(location, id_image).save()
+    """
+
+    def __init__(self, max_size: int = 100, max_delay: float = 1.0) -> None:
+        """
+        Parameters
+        ----------
+        max_size: int
+            Maximum number of models sent in a single request.
+        max_delay: float
+            Maximum time (in seconds) a model waits in the buffer.
+        """
+        self.max_size = max_size
+        self.max_delay = max_delay
+        self._buffer: List[Tuple[float, Model]] = []
+        self._created: List[Model] = []
+        self._failed: List[Model] = []
+        self._condition = threading.Condition()
+        self._closed = True
+        self._flusher: Optional[threading.Thread] = None
+
+    @staticmethod
+    def current() -> Optional["BatchSession"]:
+        """The innermost batch session active in the current thread, if any"""
+        return current_batch_session()
+
+    @property
+    def created(self) -> List[Model]:
+        return self._created
+
+    @property
+    def failed(self) -> List[Model]:
+        return self._failed
+
+    @staticmethod
+    def accepts(model: Model) -> bool:
+        """Whether the model can be created through a collection request"""
+        collection = Collection(model.__class__)
+        return model.is_new() and model.uri() == collection.uri(without_filters=True)
+
+    def add(self, model: Model) -> bool:
+        """Buffer a new model. Return False if it cannot be buffered."""
+        if not self.accepts(model):
+            return False
+
+        with self._condition:
+            if self._closed:
+                return False
+            self._buffer.append((time.monotonic(), model))
+            # wake up the flusher to start the delay of a new batch, or to send a full one
+            if len(self._buffer) == 1 or len(self._buffer) >= self.max_size:
+                self._condition.notify()
+        return True
+
+    def __enter__(self) -> "BatchSession":
+        if not hasattr(_batch_sessions, "sessions"):
+            _batch_sessions.sessions = []
+        _batch_sessions.sessions.append(self)
+
+        self._closed = False
+        self._flusher = threading.Thread(target=self._flush_loop, daemon=True)
+        self._flusher.start()
+        return self
+
+    def __exit__(self, type: Any, value: Any, traceback: Any) -> None:
+        _batch_sessions.sessions.remove(self)
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+        if self._flusher is not None:
+            self._flusher.join()
+        self.flush()
+
+        if type is None and len(self._failed) > 0:
+            raise CollectionPartialUploadException(
+                f"{len(self._failed)} buffered models could not be created",
+                created=self._created,  # type: ignore
+                failed=self._failed,  # type: ignore
+            )
+
+    def _next_batch(self) -> List[Model]:
+        """Wait until a batch must be sent and remove it from the buffer.
+        Return an empty list when the session is closed."""
+        with self._condition:
+            while not self._closed:
+                if len(self._buffer) >= self.max_size:
+                    break
+                if self._buffer:
+                    wait = self._buffer[0][0] + self.max_delay - time.monotonic()
+                    if wait <= 0:
+                        break
+                    self._condition.wait(wait)
+                else:
+                    self._condition.wait()
+
+            if self._closed:
+                return []
+            return self._pop(self.max_size)
+
+    def _pop(self, n: int) -> List[Model]:
+        batch = [model for _, model in self._buffer[:n]]
+        del self._buffer[:n]
+        return batch
+
+    def _flush_loop(self) -> None:
+        while True:
+            batch = self._next_batch()
+            if not batch:
+                break
+            self._send(batch)
+
+    def flush(self) -> None:
+        """Send all the buffered models now."""
+        while True:
+            with self._condition:
+                batch = self._pop(self.max_size)
+            if not batch:
+                break
+            self._send(batch)
+
+    def _send(self, batch: List[Model]) -> None:
+        # one request per model type, preserving the creation order within a type
+        by_type: Dict[type, List[Model]] = {}
+        for model in batch:
+            by_type.setdefault(model.__class__, []).append(model)
+
+        for model_class, models in by_type.items():
+            collection = Collection(model_class)
+            collection.extend(models)
+            try:
+                success = Cytomine.get_instance().post_collection(collection)
+            except Exception:  # pylint: disable=broad-except
+                Cytomine.get_instance().logger.exception(
+                    "Failed to create a batch of buffered models."
+                )
+                success = False
+            (self._created if success else self._failed).extend(models)
@@ -14,16 +14,44 @@
 # * See the License for the specific language governing permissions and
 # * limitations under the License.
 
-# pylint: disable=invalid-name
+# pylint: disable=invalid-name,too-many-lines
 
 import copy
+import importlib
+import itertools
+import time
 from collections.abc import MutableSequence
-from typing import Any, Callable, Dict, Iterable, List, Optional, TypeVar, Union
+from threading import Event
+from types import SimpleNamespace
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    TypeVar,
+    Union,
+)
+
+from requests.exceptions import RequestException
 
 from cytomine.cytomine import Cytomine
-from cytomine.models.model import Model
-
-from ._utilities.parallel import generic_chunk_parallel
+from cytomine.models.model import Model, attribute_name
+
+from ._utilities.chunking import AdaptiveChunker
+from ._utilities.journal import UploadJournal
+from ._utilities.parallel import (
+    JobInterruptedError,
+    generic_chunk_parallel,
+    generic_parallel,
+    is_false,
+    robust_worker,
+)
+from ._utilities.progress import Progress, make_progress
+from ._utilities.spill import SpillList
 
 T = TypeVar("T")
 
@@ -64,6 +92,37 @@ class CollectionPartialUploadException(Exception):
         return self._failed
 
 
+def item_id(item: Any) -> Any:
+    """The id of a collection item: a model, a record or a dictionary (see `as_raw`)."""
+    return item.get("id") if isinstance(item, dict) else item.id
+
+
+def _find_created(entry: Any, key: str, depth: int = 3) -> Optional[Dict[str, Any]]:
+    """Find the attributes of a created object in an entry of a collection creation
+    response, which can be wrapped in a command response (e.g. {"data": {key: {...}}})."""
+    if not isinstance(entry, dict) or depth < 0:
+        return None
+    if isinstance(entry.get(key), dict) and "id" in entry[key]:
+        return entry[key]
+    for wrapper in ("data", key):
+        found = _find_created(entry.get(wrapper), key, depth - 1)
+        if found is not None:
+            return found
+    return entry if "id" in entry else None
+
+
+# Model class referenced by an attribute, and collection class able to fetch all the
+# models of a project in a single request (if any)
+_RELATED_MODELS = {
+    "image": ("ImageInstance", "ImageInstanceCollection"),
+    "slice": ("SliceInstance", None),
+    "project": ("Project", None),
+    "term": ("Term", "TermCollection"),
+    "track": ("Track", "TrackCollection"),
+    "user": ("User", "UserCollection"),
+}
+
+
 class Collection(MutableSequence):
     def __init__(
         self,
@@ -73,7 +132,8 @@ class Collection(MutableSequence):
         offset: int = 0,
     ) -> None:
         self._model: Any = model
-        self._data: List[Any] = []
+        self._spill: Optional[Dict[str, Any]] = None  # options of the disk backing store
+        self._data = []
 
         self._allowed_filters: List[Optional[str]] = []
         self._filters = filters if filters is not None else {}
@@ -81,9 +141,57 @@ class Collection(MutableSequence):
         self._total: int = 0  # total number of resources
         self._total_pages: Optional[int] = None  # total number of pages
 
+        # Type of the items built from the fetched attributes (None for models)
+        self._hydration: Optional[str] = None
+
         self.max: int = max
         self.offset: int = offset
 
+    @property
+    def _data(self) -> List[Any]:
+        return self.__data
+
+    @_data.setter
+    def _data(self, items: Iterable[Any]) -> None:
+        if self._spill is not None and not isinstance(items, SpillList):
+            items = SpillList(items, **self._spill)
+        self.__data: Any = items
+
+    def set_memory_limit(
+        self,
+        max_items: Optional[int],
+        page_size: int = 1000,
+        directory: Optional[str] = None,
+    ) -> "Collection":
+        """Keep at most `max_items` objects of the collection in memory. The other ones
+        are paged to a temporary file (see `SpillList`) and loaded back on access, so
+        that very large collections can be fetched on a machine with little memory.
+
+        Parameters
+        ----------
+        max_items: int|None
+            Maximum number of objects kept in memory. None for no limit.
+        page_size: int
+            Number of objects per page written to or read from the disk.
+        directory: str|None
+            Directory of the temporary file (defaults to the system temporary directory).
+
+        Returns
+        -------
+        self: Collection
+        """
+        if max_items is None:
+            self._spill = None
+            self._data = list(self._data)
+        else:
+            self._spill = {
+                "max_items": max_items,
+                "page_size": page_size,
+                "directory": directory,
+            }
+            self._data = SpillList(self._data, **self._spill)
+        return self
+
     def _fetch(self, append_mode: bool = False) -> Union[bool, "Collection"]:
         if len(self._filters) == 0 and None not in self._allowed_filters:
             raise ValueError("This collection cannot be fetched without a filter.")
@@ -126,6 +234,121 @@ class Collection(MutableSequence):
         self._filters[key] = value
         return self.fetch(max)
 
+    def _value_groups(self, key: str, value: Any, max_values: int) -> List[Tuple[str, Any]]:
+        """Split the values of a query parameter between requests. A list is sent in
+        chunks of `max_values` values when the server accepts several values for the
+        parameter (i.e. it has a plural form), and one value per request otherwise."""
+        if not isinstance(value, (list, tuple, set)):
+            return [(key, value)]
+
+        values = list(dict.fromkeys(value))
+        if hasattr(self, f"{key}s"):
+            key = f"{key}s"
+        elif not (key.endswith("s") and hasattr(self, key[:-1])):
+            return [(key, v) for v in values]
+        return [
+            (key, values[i : i + max_values]) for i in range(0, len(values), max_values)
+        ]
+
+    def fetch_with_filters(
+        self,
+        filters: Optional[Dict[str, Any]] = None,
+        max_values: int = 100,
+        n_workers: int = 0,
+        **parameters: Any,
+    ) -> Union[bool, "Collection"]:
+        """Fetch the objects matching several filters and/or several values per filter
+        or parameter, which a single request cannot express.
+
+        The query is split into the minimal set of requests, sent in parallel:
+        list parameters having a plural form on the server (e.g. `images`, `users`) are
+        sent in chunks of `max_values` values, other list parameters are sent one value
+        per request, and each filter is sent separately (the server accepts only one
+        filter per request). The results of the requests of a same filter are merged
+        (union, deduplicated by id) and the results of different filters are intersected.
+
+        Parameters
+        ----------
+        filters: dict|None
+            Filters (e.g. {"project": [1, 2], "imageinstance": 3}), each with one value or
+            a list of values. Filters set on the collection are also applied.
+        max_values: int
+            Maximum number of values of a list parameter sent in a single request.
+        n_workers: int
+            Number of threads to use for sending the requests.
+            Value 0 for using as many threads as cpus on the machine.
+        parameters: dict
+            Query parameters (e.g. images=[1, 2, 3], user=[4, 5]), each with one value
+            or a list of values.
+
+        Returns
+        -------
+        self: Collection|bool
+            The fetched collection, or False if a request failed.
+
+        Examples
+        --------
+        >>> AnnotationCollection(project=42, showWKT=True).fetch_with_filters(
+        >>>     image=image_ids, user=user_ids
+        >>> )
+        """
+        all_filters = {**self._filters, **(filters or {})}
+        for key in all_filters:
+            if key not in self._allowed_filters:
+                raise ValueError(f"Filter '{key}' is not allowed for this collection.")
+
+        combinations = list(
+            itertools.product(
+                *[self._value_groups(k, v, max_values) for k, v in parameters.items()]
+            )
+        )
+        filter_groups: List[List[Optional[Tuple[str, Any]]]] = [
+            [
+                (key, value)
+                for value in (
+                    dict.fromkeys(values)
+                    if isinstance(values, (list, tuple, set))
+                    else [values]
+                )
+            ]
+            for key, values in all_filters.items()
+        ] or [[None]]
+        requests = [
+            (group, filter_, params)
+            for group, filter_values in enumerate(filter_groups)
+            for filter_ in filter_values
+            for params in combinations
+        ]
+
+        def fetch(request: Tuple[int, Optional[Tuple[str, Any]], Tuple[Any, ...]]) -> Any:
+            _, filter_, params = request
+            query = copy.copy(self)
+            # pylint: disable=protected-access
+            query._filters = dict([filter_]) if filter_ is not None else {}
+            query._data = []
+            try:
+                query.set_parameters(dict(params))
+                return query.fetch()
+            except Exception as e:  # pylint: disable=broad-except
+                return e  # re-raised below, instead of being reported as a failure
+
+        results = generic_parallel(requests, fetch, n_workers=n_workers)
+        for _, result in results:
+            if isinstance(result, Exception):
+                raise result
+        if any(is_false(result) for _, result in results):
+            return False
+
+        groups: List[Dict[Any, Any]] = [{} for _ in filter_groups]
+        for (group, _, _), result in results:
+            groups[group].update((item_id(item), item) for item in result or [])
+
+        ids = set.intersection(*[set(group) for group in groups])
+        self._data = [item for id_, item in groups[0].items() if id_ in ids]
+        self._total = len(self._data)
+        self._total_pages = 1
+        return self
+
     def fetch_next_page(self, append_mode: bool = False) -> Union[bool, "Collection"]:
         self.offset = min(self._total, self.offset + self.max)
         return self._fetch(append_mode)
@@ -134,49 +357,454 @@ class Collection(MutableSequence):
         self.offset = max(0, self.offset - self.max)
         return self._fetch()
 
-    def _upload_fn(self, collection: "Collection") -> Union[bool, "Collection"]:
+    def prefetch_related(
+        self,
+        *attributes: str,
+        n_workers: int = 0,
+        bulk_threshold: int = 10,
+    ) -> "Collection":
+        """Resolve the models referenced by attributes of the items (e.g. the image,
+        terms or user of annotations) with a minimal number of requests, and attach
+        them to the items, where they are accessible with `item.related(attribute)`.
+
+        Each distinct referenced model is fetched once, in parallel. When all the items
+        belong to the same project and reference at least `bulk_threshold` distinct
+        models, the models of the project are fetched with a single collection request
+        instead (if the server offers one).
+
+        Parameters
+        ----------
+        attributes: str
+            The attributes to resolve, among image, slice, project, term, track and user.
+        n_workers: int
+            Number of threads to use. Value 0 for using as many threads as cpus on the machine.
+        bulk_threshold: int
+            Minimum number of distinct referenced models for a collection request.
+
+        Returns
+        -------
+        self: Collection
+        """
+        if self._hydration is not None:
+            raise ValueError("Related models cannot be attached to raw items.")
+
+        models = importlib.import_module("cytomine.models")
+        for attribute in attributes:
+            if attribute not in _RELATED_MODELS:
+                raise ValueError(f"Unknown related attribute '{attribute}'.")
+            model, bulk_collection = (
+                getattr(models, name) if name is not None else None
+                for name in _RELATED_MODELS[attribute]
+            )
+
+            values = [getattr(item, attribute, None) for item in self._data]
+            ids = list(
+                dict.fromkeys(
+                    id_
+                    for value in values
+                    for id_ in (value if isinstance(value, list) else [value])
+                    if id_ is not None
+                )
+            )
+            found = self._fetch_related(
+                ids, model, bulk_collection, n_workers, bulk_threshold
+            )
+
+            for item, value in zip(self._data, values):
+                # pylint: disable=protected-access
+                if isinstance(value, list):
+                    item._related[attribute] = [found.get(id_) for id_ in value]
+                else:
+                    item._related[attribute] = found.get(value)
+        return self
+
+    def _fetch_related(
+        self,
+        ids: List[Any],
+        model: Any,
+        bulk_collection: Any,
+        n_workers: int,
+        bulk_threshold: int,
+    ) -> Dict[Any, Any]:
+        found: Dict[Any, Any] = {}
+        projects = {getattr(item, "project", None) for item in self._data}
+        if bulk_collection is not None and len(ids) >= bulk_threshold and len(projects) == 1:
+            (project,) = projects
+            if project is not None:
+                bulk = bulk_collection(filters={"project": project}).fetch()
+                wanted = set(ids)
+                found.update((m.id, m) for m in (bulk or []) if m.id in wanted)
+
+        missing = [id_ for id_ in ids if id_ not in found]
+        results = Cytomine.get_instance().fetch_many(model, missing, n_workers)
+        found.update((id_, m) for id_, m in zip(missing, results) if not is_false(m))
+        return found
+
+    def _upload_fn(
+        self,
+        collection: Union["Collection", List[Any]],
+    ) -> Union[bool, "Collection"]:
         if not isinstance(collection, Collection):
             _tmp = self.__class__(model=self._model)
             _tmp.extend(collection)
             collection = _tmp
         return Cytomine.get_instance().post_collection(collection)
 
-    def save(self, chunk: int = 15, n_workers: int = 0) -> Union[bool, "Collection"]:
+    @staticmethod
+    def _payload_size(items: List[Any], _: Any = None) -> int:
+        return sum(len(item.to_json()) for item in items)
+
+    def _item_size(self, index: int) -> int:
+        return len(self._data[index].to_json())
+
+    def _save_chunks(
+        self,
+        upload_fn: Callable[[List[Any]], Any],
+        chunk: int,
+        n_workers: int,
+        timeout: Optional[float],
+        cancel: Optional[Event],
+        progress: Optional[Progress],
+    ) -> List[Tuple[Tuple[int, int], bool]]:
+        try:
+            results = generic_chunk_parallel(
+                self,  # type: ignore
+                worker_fn=upload_fn,
+                chunk_size=chunk,
+                n_workers=n_workers,
+                timeout=timeout,
+                cancel=cancel,
+                progress=progress,
+                size_fn=self._payload_size,
+            )
+        except JobInterruptedError as e:
+            results = e.results + [(limits, False) for limits in e.unprocessed]
+        return [(limits, bool(success)) for limits, success in results]
+
+    def _save_adaptive(
+        self,
+        upload_fn: Callable[[List[Any]], Any],
+        chunker: AdaptiveChunker,
+        n_workers: int,
+        timeout: Optional[float],
+        cancel: Optional[Event],
+        progress: Optional[Progress],
+    ) -> List[Tuple[Tuple[int, int], bool]]:
+        logger = Cytomine.get_instance().logger
+
+        def upload(
+            limits: Tuple[int, int],
+            depth: int = 0,
+        ) -> List[Tuple[Tuple[int, int], bool]]:
+            start, end = limits
+            n_bytes = chunker.payload_size(start, end)
+            began = time.monotonic()
+            try:
+                success = bool(upload_fn(self[start:end]))
+            except RequestException as e:
+                logger.debug("Upload of %d items failed: %s", end - start, e)
+                success = False
+            chunker.record(n_bytes, time.monotonic() - began, success)
+
+            if not success and chunker.should_split(start, end, depth):
+                logger.debug(
+                    "Upload of %d items (%d bytes) failed, retrying as smaller chunks.",
+                    end - start,
+                    n_bytes,
+                )
+                # the halves fail independently, so that the items created by one of
+                # them are never reported as failed (and uploaded again)
+                results = []
+                for half in chunker.split(start, end):
+                    try:
+                        results.extend(upload(half, depth + 1))
+                    except Exception as e:  # pylint: disable=broad-except
+                        logger.error("Upload of %d items failed: %s", half[1] - half[0], e)
+                        results.append((half, False))
+                        if progress is not None:
+                            progress.update(half[1] - half[0], False, 0)
+                return results
+
+            if progress is not None:
+                progress.update(end - start, success, n_bytes if success else 0)
+            return [(limits, success)]
+
+        try:
+            results = generic_parallel(
+                chunker,
+                upload,
+                n_workers=n_workers,
+                timeout=timeout,
+                cancel=cancel,
+            )
+        except JobInterruptedError as e:
+            results = e.results + [(limits, False) for limits in e.unprocessed]
+
+        return [
+            r
+            for limits, chunk_results in results
+            for r in (chunk_results or [(limits, False)])
+        ]
+
+    def save(
+        self,
+        chunk: Optional[Union[int, str]] = 15,
+        n_workers: int = 0,
+        timeout: Optional[float] = None,
+        cancel: Optional[Event] = None,
+        progress: Optional[Union[bool, Callable[[Progress], None]]] = None,
+        chunk_bytes: int = 1_000_000,
+        chunk_latency: float = 2.0,
+        journal: Optional[str] = None,
+        retries: int = 0,
+    ) -> Union[bool, "Collection"]:
         """
-        chunk: int|None
+        chunk: int|str|None
             Maximum number of object to send at once in a single HTTP request.
             None for sending them all at once.
+            "auto" for adapting the chunks to the payload size of the objects and to the
+            server latency: chunks are sized towards `chunk_bytes` bytes, grow while the
+            server answers faster than `chunk_latency` and are split (at most twice) when they
+            fail (e.g. payload too large or timeout).
         n_workers: int
             Number of threads to use for sending chunked requests (ignored if chunk is None).
             Value 0 for using as many threads as cpus on the machine.
+        timeout: float|None
+            Maximum duration (in seconds) of the whole upload (ignored if chunk is None).
+            Chunks that could not be sent before the deadline are reported as failed.
+        cancel: Event|None
+            An event that, once set, stops the upload (ignored if chunk is None).
+            Chunks that were not sent yet are reported as failed.
+        progress: bool|callable|None
+            True for logging the upload progress, or a function called with a `Progress`
+            object after each chunk (ignored if chunk is None). None for no reporting.
+        chunk_bytes: int
+            Initial payload size (in bytes) of a chunk (only if chunk is "auto").
+        chunk_latency: float
+            Expected server response time (in seconds) for a chunk (only if chunk is "auto").
+        journal: str|None
+            Path of a journal file recording the created objects (ignored if chunk is None).
+            Objects recorded in the journal by a previous (interrupted) call are not
+            uploaded again and get back their id, so that the upload can be resumed.
+        retries: int
+            Number of times the objects of failed chunks are uploaded again
+            (ignored if chunk is None).
+
+        Raises
+        ------
+        CollectionPartialUploadException:
+            When some objects could not be uploaded.
         """
         if chunk is None:
             return Cytomine.get_instance().post_collection(self)
 
-        if isinstance(chunk, int):
-            upload_fn = self._upload_fn
-            results = generic_chunk_parallel(
-                self,  # type: ignore
-                worker_fn=upload_fn,  # type: ignore
-                chunk_size=chunk,
+        if chunk != "auto" and not isinstance(chunk, int):
+            raise ValueError(f"Invalid value '{chunk}' for chunk parameter.")
+
+        created: List[Any] = []
+        todo: List[Any] = self._data
+        upload_fn: Callable[[List[Any]], Any] = self._upload_fn
+        if journal is not None:
+            todo, created, upload_fn = self._journaled_upload(UploadJournal(journal))
+
+        tracker = make_progress(progress, len(todo))
+        for attempt in range(retries + 1):
+            if attempt > 0:
+                Cytomine.get_instance().log(
+                    f"Retrying the upload of {len(todo)} items "
+                    f"(attempt {attempt}/{retries})."
+                )
+                if tracker is not None and tracker.total is not None:
+                    tracker.total += len(todo)
+
+            pending = copy.copy(self)
+            pending._data = todo  # pylint: disable=protected-access
+            if isinstance(chunk, int):
+                results = pending._save_chunks(  # pylint: disable=protected-access
+                    upload_fn, chunk, n_workers, timeout, cancel, tracker
+                )
+            else:
+                chunker = AdaptiveChunker(
+                    len(todo),
+                    pending._item_size,  # pylint: disable=protected-access
+                    target_bytes=chunk_bytes,
+                    target_latency=chunk_latency,
+                )
+                results = pending._save_adaptive(  # pylint: disable=protected-access
+                    upload_fn, chunker, n_workers, timeout, cancel, tracker
+                )
+
+            todo = []
+            for (start, end), success in results:
+                (created if success else todo).extend(pending[start:end])
+            if len(todo) == 0:
+                return True
+
+        raise CollectionPartialUploadException(
+            "Some items could not be uploaded",
+            created=created,  # type: ignore
+            failed=todo,  # type: ignore
+        )
+
+    def _apply_all(
+        self,
+        worker_fn: Callable[[Any], Any],
+        items: List[Any],
+        n_workers: int,
+        rate: Optional[float],
+        retries: int,
+        timeout: Optional[float],
+        cancel: Optional[Event],
+        progress: Optional[Union[bool, Callable[[Progress], None]]],
+    ) -> Tuple["Collection", "Collection"]:
+        """Apply `worker_fn` to the items in parallel and split them between those
+        that succeeded and those that failed."""
+        try:
+            results = generic_parallel(
+                items,
+                robust_worker(worker_fn, retries=retries, rate=rate),
                 n_workers=n_workers,
+                timeout=timeout,
+                cancel=cancel,
+                progress=make_progress(progress, len(items)),
             )
+        except JobInterruptedError as e:
+            results = e.results + [(item, False) for item in e.unprocessed]
 
-            added: List[Any] = []
-            failed: List[Any] = []
-            for (start, end), success in results:
-                (added if success else failed).extend(self[start:end])
+        succeeded, failed = copy.copy(self), copy.copy(self)
+        # pylint: disable=protected-access
+        succeeded._data = [item for item, r in results if not is_false(r)]
+        failed._data = [item for item, r in results if is_false(r)]
+        return succeeded, failed
 
-            if len(added) != len(self):
-                raise CollectionPartialUploadException(
-                    "Some items could not be uploaded",
-                    created=added,  # type: ignore
-                    failed=failed,  # type: ignore
-                )
+    def delete_all(
+        self,
+        n_workers: int = 0,
+        rate: Optional[float] = None,
+        retries: int = 0,
+        timeout: Optional[float] = None,
+        cancel: Optional[Event] = None,
+        progress: Optional[Union[bool, Callable[[Progress], None]]] = None,
+    ) -> Tuple["Collection", "Collection"]:
+        """Delete all the objects of the collection on the server, in parallel.
+
+        Parameters
+        ----------
+        n_workers: int
+            Number of threads to use. Value 0 for using as many threads as cpus on the machine.
+        rate: float|None
+            Maximum number of requests per second (to spare the server). None for no limit.
+        retries: int
+            Number of times the deletion of an object is attempted again after a failure.
+        timeout: float|None
+            Maximum duration (in seconds) of the whole job. Objects that could not be
+            deleted before the deadline are reported as failed.
+        cancel: Event|None
+            An event that, once set, stops the job. Remaining objects are reported as failed.
+        progress: bool|callable|None
+            True for logging the progress, or a function called with a `Progress` object
+            after each object. None for no reporting.
+
+        Returns
+        -------
+        deleted: Collection
+            The objects that were deleted.
+        failed: Collection
+            The objects that could not be deleted.
+        """
+        return self._apply_all(
+            lambda model: model.delete(),
+            self._data,
+            n_workers,
+            rate,
+            retries,
+            timeout,
+            cancel,
+            progress,
+        )
+
+    def update_all(
+        self,
+        n_workers: int = 0,
+        rate: Optional[float] = None,
+        retries: int = 0,
+        timeout: Optional[float] = None,
+        cancel: Optional[Event] = None,
+        progress: Optional[Union[bool, Callable[[Progress], None]]] = None,
+        **attributes: Any,
+    ) -> Tuple["Collection", "Collection"]:
+        """Update all the objects of the collection on the server, in parallel.
+        Objects known to be unchanged since they were last synchronized with the
+        server are skipped (and reported as updated).
+
+        Parameters
+        ----------
+        n_workers, rate, retries, timeout, cancel, progress:
+            See `delete_all`.
+        attributes: dict
+            Attributes to set on every object before the update.
+
+        Returns
+        -------
+        updated: Collection
+            The objects that were updated (or did not need to be).
+        failed: Collection
+            The objects that could not be updated.
+        """
+        todo: List[Any] = []
+        unchanged: List[Any] = []
+        for model in self._data:
+            if attributes:
+                model.populate(attributes)
+            (todo if model.is_dirty() else unchanged).append(model)
+
+        updated, failed = self._apply_all(
+            lambda model: model.update(),
+            todo,
+            n_workers,
+            rate,
+            retries,
+            timeout,
+            cancel,
+            progress,
+        )
+        updated._data = unchanged + updated._data  # pylint: disable=protected-access
+        return updated, failed
 
-            return True
+    def _journaled_upload(
+        self,
+        journal: UploadJournal,
+    ) -> Tuple[List[Any], List[Any], Callable[[List[Any]], Any]]:
+        """Split the items between those to upload and those already created according
+        to the journal (which get back their id), and return an upload function
+        recording the created items in the journal."""
+        keys: Dict[int, str] = {}
+        todo, created = [], []
+        for item in self._data:
+            key = journal.key(item)
+            found, id_ = journal.lookup(key)
+            if not found:
+                keys[id(item)] = key
+                todo.append(item)
+                continue
+            if item.id is None:
+                item.id = id_
+            created.append(item)
+
+        if len(created) > 0:
+            Cytomine.get_instance().log(
+                f"{len(created)} items already uploaded according to {journal.path}."
+            )
 
-        raise ValueError(f"Invalid value '{chunk}' for chunk parameter.")
+        def upload_fn(items: List[Any]) -> Any:
+            success = self._upload_fn(items)
+            if success:
+                # items whose id could not be read are recorded too (with a None id), as
+                # they were created and must not be uploaded again
+                journal.record((keys[id(item)], item.id) for item in items)
+            return success
+
+        return todo, created, upload_fn
 
     def to_json(self, **dump_parameters: Dict[str, Any]) -> str:
         return f"[{','.join([d.to_json(**dump_parameters) for d in self._data])}]"
@@ -186,9 +814,7 @@ class Collection(MutableSequence):
         attributes: Dict[str, Any],
         append_mode: bool = False,
     ) -> "Collection":
-        data = [
-            self._model().populate(instance) for instance in attributes["collection"]
-        ]
+        data = self._hydrate(attributes["collection"], self._model)
         if append_mode:
             self._data += data
         else:
@@ -200,6 +826,72 @@ class Collection(MutableSequence):
             self._total_pages = self._total // self.max
         return self
 
+    def as_raw(self, mode: Optional[str] = "dict") -> "Collection":
+        """Build lightweight read-only items instead of models when the collection is
+        fetched, which is much faster for large collections. The attribute names are
+        normalized as for models (e.g. `id_project` becomes `project`).
+
+        Parameters
+        ----------
+        mode: str|None
+            "dict" for plain dictionaries, "record" for records with attribute access
+            (`types.SimpleNamespace`), None for models (default behaviour).
+
+        Returns
+        -------
+        self: Collection
+        """
+        if mode not in {None, "dict", "record"}:
+            raise ValueError(f"Invalid value '{mode}' for mode parameter.")
+        self._hydration = mode
+        return self
+
+    def _hydrate(
+        self,
+        instances: List[Dict[str, Any]],
+        build: Callable[[], Model],
+    ) -> List[Any]:
+        if self._hydration is None:
+            return [build().populate(instance, clean=True) for instance in instances]
+
+        names: Dict[str, Optional[str]] = {}
+        rows = []
+        for instance in instances:
+            row = {}
+            for key, value in instance.items():
+                if key not in names:
+                    names[key] = attribute_name(key)
+                name = names[key]
+                if name is not None:
+                    row[name] = value
+            rows.append(row)
+
+        if self._hydration == "record":
+            return [SimpleNamespace(**row) for row in rows]
+        return rows
+
+    def populate_created(self, response: Any) -> int:
+        """Back-fill the attributes (including the id) assigned by the server to the
+        items of this collection, from the response of a collection creation.
+        The server answers with one entry per item, in the same order.
+
+        Returns
+        -------
+        count: int
+            The number of items that received an id.
+        """
+        entries = response.get("data") if isinstance(response, dict) else response
+        if not isinstance(entries, list) or len(entries) != len(self._data):
+            return 0
+
+        count = 0
+        for item, entry in zip(self._data, entries):
+            created = _find_created(entry, item.callback_identifier.lower())
+            if created is not None:
+                item.populate(created).mark_clean()
+                count += 1
+        return count
+
     @property
     def filters(self) -> Dict[str, Any]:
         return self._filters
@@ -275,6 +967,9 @@ class Collection(MutableSequence):
     def __len__(self) -> int:
         return len(self._data)
 
+    def __iter__(self) -> Iterator[Any]:
+        return iter(self._data)
+
     def __getitem__(self, item: Union[int, slice]) -> Any:
         return self._data[item]
 
@@ -324,7 +1019,8 @@ class Collection(MutableSequence):
         the current collection that the function evaluates to true.
         """
         collection = copy.copy(self)
-        collection._data = list(filter(fn, self))  # pylint: disable=protected-access
+        collection._data = []  # pylint: disable=protected-access
+        collection._data.extend(filter(fn, self))  # pylint: disable=protected-access
         return collection
 
 
@@ -357,10 +1053,10 @@ class DomainCollection(Collection):
         attributes: Any,
         append_mode: bool = False,
     ) -> "DomainCollection":
-        data = [
-            self._model(self._object).populate(instance)
-            for instance in attributes["collection"]
-        ]
+        data = self._hydrate(
+            attributes["collection"],
+            lambda: self._model(self._object),
+        )
         if append_mode:
             self._data += data
         else:
@@ -377,7 +1073,7 @@ class DomainCollection(Collection):
         self._domainClassName = value.class_
         self._domainIdent = value.id
 
-    def _upload_fn(self, collection: "Collection") -> bool:
+    def _upload_fn(self, collection: Union["Collection", List[Any]]) -> bool:
         if not isinstance(collection, Collection):
             _tmp = self.__class__(model=self._model, object=self._obj)
             _tmp.extend(collection)
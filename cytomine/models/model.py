@@ -17,16 +17,61 @@
 # pylint: disable=invalid-name,unused-argument
 
 import json
-from typing import Any, Dict, Optional, Union
+import threading
+from typing import Any, Dict, Optional, Tuple, Union
 
 from cytomine.cytomine import Cytomine
 
+# The batch sessions active in each thread, innermost last (see `BatchSession`)
+_batch_sessions = threading.local()
+
+
+def current_batch_session() -> Any:
+    """The innermost batch session active in the current thread, if any."""
+    sessions = getattr(_batch_sessions, "sessions", None)
+    return sessions[-1] if sessions else None
+
+
+def attribute_name(key: str) -> Optional[str]:
+    """Name of the model attribute receiving a server attribute, None if it is ignored."""
+    if key.startswith("id_"):
+        key = key[3:]
+    if key == "uri":
+        key = "uri_"
+    if key.startswith("_"):
+        return None
+    if key == "class":
+        key += "_"
+    return key
+
+
+# Per model class, the attribute name (or None if ignored) receiving each server attribute
+# key and whether it can be set directly in the instance dictionary (i.e. it is not a
+# data descriptor of the class, such as a property with a setter)
+_SCHEMAS: Dict[type, Dict[str, Tuple[Optional[str], bool]]] = {}
+
+# Attribute types copied from the synchronized state of a model (mutable in place)
+_CONTAINERS = (list, dict)
+
+
+def _learn_field(cls: type, key: str) -> Tuple[Optional[str], bool]:
+    name = attribute_name(key)
+    direct = name is not None and not hasattr(getattr(cls, name, None), "__set__")
+    _SCHEMAS[cls][key] = (name, direct)
+    return name, direct
+
 
 class Model:
     def __init__(self, **attributes: Any) -> None:
         # In some cases, a model can have some request parameters.
         self._query_parameters: Dict[str, Any] = {}
 
+        # Attribute values when the model was last synchronized with the server
+        self._state: Optional[Dict[str, Any]] = None
+
+        # Models referenced by attributes, resolved by Collection.prefetch_related
+        self._related: Dict[str, Any] = {}
+
         # Attributes common to all models
         self.id: Optional[int] = None
         self.created = None
@@ -44,6 +89,11 @@ class Model:
 
     def save(self) -> Union[bool, "Model"]:
         if self.id is None:
+            # within a batch session, the creation is buffered and the id set later
+            session = current_batch_session()
+            if session is not None and session.add(self):
+                return self
+
             return Cytomine.get_instance().post_model(self)
 
         return self.update()
@@ -56,11 +106,17 @@ class Model:
 
         return Cytomine.get_instance().delete_model(self)
 
-    def update(
-        self,
-        id: Optional[int] = None,
-        **attributes: Any,
-    ) -> Union[bool, "Model"]:
+    def update(self, id: Optional[int] = None, **attributes: Any) -> Union[bool, "Model"]:
+        """Update the model on the server. No request is sent if the model is known
+        to be unchanged since it was last synchronized with the server.
+
+        Parameters
+        ----------
+        id: int|None
+            The model ID (defaults to the current one).
+        attributes: dict
+            Attributes to set before the update.
+        """
         if self.id is None and id is None:
             raise ValueError("Cannot update a model with no ID.")
         if id is not None:
@@ -68,28 +124,108 @@ class Model:
 
         if attributes:
             self.populate(attributes)
+
+        if self._state is not None and not self.changes():
+            Cytomine.get_instance().logger.debug("%s is unchanged, no update.", self)
+            return self
+
         return Cytomine.get_instance().put_model(self)
 
+    def mark_clean(self) -> "Model":
+        """Record the current attribute values as the state of the model on the server.
+        Subsequent modifications are reported by `changes()`.
+
+        The state refers to the current values (without copying them), except for the
+        lists and dictionaries, which can be modified in place and are copied."""
+        if self._state is not None:
+            # the lists and dictionaries of the state not accessed yet (see `populate`)
+            for k, v in self._state.items():
+                if k not in self.__dict__ and v.__class__ in _CONTAINERS:
+                    self.__dict__[k] = v.copy()
+        self._state = {
+            k: v.copy() if v.__class__ in _CONTAINERS else v
+            for k, v in self.__dict__.items()
+            if not k.startswith("_")
+        }
+        return self
+
+    def changes(self) -> Dict[str, Any]:
+        """The attributes modified since the model was last synchronized with the server
+        (all the attributes if it never was). An attribute missing from the server state
+        (e.g. left to its default value) is modified if it is not None."""
+        public = {k: v for k, v in self.__dict__.items() if not k.startswith("_")}
+        if self._state is None:
+            return public
+
+        state = self._state
+        return {k: v for k, v in public.items() if state.get(k) is not v and state.get(k) != v}
+
+    def is_dirty(self) -> bool:
+        return self._state is None or len(self.changes()) > 0
+
+    def related(self, attribute: str) -> Any:
+        """The model (or list of models) referenced by an attribute (e.g. "image"),
+        resolved by `Collection.prefetch_related`. None for an unresolved reference."""
+        if attribute not in self._related:
+            raise ValueError(f"The related '{attribute}' was not prefetched.")
+        return self._related[attribute]
+
     def is_new(self) -> bool:
         return self.id is None
 
-    def populate(self, attributes: Dict[Any, Any]) -> "Model":
-        if attributes:
-            for key, value in attributes.items():
-                if key.startswith("id_"):
-                    key = key[3:]
-                if key == "uri":
-                    key = "uri_"
-                if not key.startswith("_"):
-                    if key == "class":
-                        key += "_"
-                    setattr(self, key, value)
+    def populate(self, attributes: Dict[Any, Any], clean: bool = False) -> "Model":
+        """Set the attributes of the model from a dictionary of the server.
+
+        Parameters
+        ----------
+        attributes: dict
+            The attributes, by name in the server representation (e.g. `id_project`).
+        clean: bool
+            True if the attributes are the whole state on the server of a new model,
+            which is marked as clean (see `mark_clean`). The state is not copied: the
+            lists and dictionaries are copied in the model when first accessed.
+        """
+        schema = _SCHEMAS.setdefault(self.__class__, {})
+        plain: Dict[Any, Any] = {}
+        descriptors = []
+        for key, value in (attributes or {}).items():
+            name, direct = schema.get(key) or _learn_field(self.__class__, key)
+            if direct:
+                plain[name] = value
+            elif name is not None:
+                descriptors.append((name, value))
+
+        self.__dict__.update(plain)
+        for name, value in descriptors:
+            setattr(self, name, value)
+
+        if clean and len(descriptors) > 0:
+            return self.mark_clean()
+        if clean:
+            for name, value in plain.items():
+                if value.__class__ in _CONTAINERS:
+                    del self.__dict__[name]
+            self._state = plain
         return self
 
+    def __getattr__(self, name: str) -> Any:
+        # Only called for missing attributes, i.e. a list or dictionary of the server
+        # state not accessed yet (see `populate`)
+        state = self.__dict__.get("_state")
+        if state is not None and state.get(name).__class__ in _CONTAINERS:
+            value = self.__dict__[name] = state[name].copy()
+            return value
+        raise AttributeError(
+            f"'{self.__class__.__name__}' object has no attribute '{name}'"
+        )
+
     def to_json(self, **dump_parameters: Any) -> str:
+        attributes = self.__dict__
+        if self._state is not None:
+            attributes = {**self._state, **attributes}
         d = dict(
             (k, v)
-            for k, v in self.__dict__.items()
+            for k, v in attributes.items()
             if v is not None and not k.startswith("_")
         )
         if "uri_" in d:
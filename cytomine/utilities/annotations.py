@@ -1,9 +1,13 @@
 # type: ignore
 
 from collections.abc import Iterable
-from typing import Any, Dict, List, Optional
+from threading import Lock
+from typing import Any, Callable, Dict, List, Optional
 
 from cytomine.models import AnnotationCollection
+from cytomine.models._utilities import generic_parallel, is_false
+from cytomine.models._utilities.geometry import SpatialIndex
+from cytomine.models.collection import item_id
 
 REVIEWED_INCLUDE = 1
 REVIEWED_ONLY = 2
@@ -16,6 +20,9 @@ def get_annotations(
     terms: Optional[Iterable[int]] = None,
     users: Optional[Iterable[int]] = None,
     reviewed: int = REVIEWED_EXCLUDE,
+    n_workers: int = 0,
+    page_size: Optional[int] = None,
+    callback: Optional[Callable[[AnnotationCollection], None]] = None,
     **collection_params: Dict[Any, Any],
 ) -> AnnotationCollection:
     """Returns a list annotations filtered with the following criterion.
@@ -39,6 +46,15 @@ def get_annotations(
            * REVIEWED_EXCLUDE: only get non-reviewed annotations
            * REVIEWED_INCLUDE: get both non-reviwed and reviewed annotations
            * REVIEWED_ONLY: only get reviwed annotations
+    n_workers: int
+        Number of threads fetching the annotations of the different projects and review
+        states concurrently. Value 0 for using as many threads as cpus on the machine.
+    page_size: int|None
+        Number of annotations fetched per request. None for fetching all the annotations
+        of a project (and review state) in a single request.
+    callback: callable|None
+        A function called with each fetched page, restricted to the annotations not
+        received before (calls are serialized).
     collection_params: dict
         Additional Annotation parametes such as showTerm, showWKT,...
 
@@ -58,26 +74,129 @@ def get_annotations(
             f"INCLUDE ({REVIEWED_INCLUDE}) or ONLY ({REVIEWED_ONLY})."
         )
 
+    states = []
+    if reviewed != REVIEWED_ONLY:
+        states.append(False)
+    if reviewed != REVIEWED_EXCLUDE:
+        states.append(True)
+
     annotations = AnnotationCollection()
-    for id_project in projects:
-        if reviewed != REVIEWED_ONLY:
-            annotations += AnnotationCollection(
-                project=id_project,
-                images=images,
-                term=terms,
-                users=users,
-                reviewed=False,
-                **collection_params,
-            ).fetch()
+    seen = set()
+    lock = Lock()
+
+    def receive(page: AnnotationCollection) -> None:
+        with lock:
+            new = page.filter(lambda a: item_id(a) not in seen)
+            seen.update(item_id(a) for a in new)
+            annotations.extend(new)
+            if callback is not None and len(new) > 0:
+                callback(new)
 
-        if reviewed != REVIEWED_EXCLUDE:
-            annotations += AnnotationCollection(
+    def fetch(query: tuple) -> bool:
+        id_project, is_reviewed = query
+        offset = 0
+        while True:
+            page = AnnotationCollection(
                 project=id_project,
                 images=images,
                 term=terms,
                 users=users,
-                reviewed=True,
+                reviewed=is_reviewed,
+                max=page_size or 0,
+                offset=offset,
                 **collection_params,
             ).fetch()
+            if page is False:
+                return False
+            receive(page)
+
+            offset += len(page)
+            total = page._total  # pylint: disable=protected-access
+            if page_size is None or len(page) < page_size or offset >= total:
+                return True
+
+    queries = [(id_project, state) for id_project in projects for state in states]
+    results = generic_parallel(queries, fetch, n_workers=n_workers)
+    failed = [query for query, result in results if is_false(result)]
+    if len(failed) > 0:
+        raise ConnectionError(
+            f"Failed to fetch the annotations for (project, reviewed): {failed}."
+        )
 
     return annotations
+
+
+def get_included_annotations(
+    references: AnnotationCollection,
+    terms: Optional[Iterable[int]] = None,
+    users: Optional[Iterable[int]] = None,
+    predicate: str = "contains",
+    n_workers: int = 0,
+    **collection_params: Dict[Any, Any],
+) -> Dict[int, AnnotationCollection]:
+    """Returns the annotations included in each reference annotation, computed locally.
+
+    Instead of one `AnnotationCollection(included=True, annotation=...)` request per
+    reference annotation, the candidate annotations are fetched once per image of the
+    references and matched against all the reference geometries using a spatial index.
+
+    Parameters
+    ----------
+    references: AnnotationCollection
+        The reference annotations (e.g. regions of interest), with their location
+        (fetched with showWKT) and image.
+    terms: iterable|None
+        Identifiers of terms. If present, only candidate annotations that have at
+        least one of the listed terms are considered.
+    users: iterable|None
+        Identifiers of users. If present, only candidate annotations created by one of
+        the given users are considered.
+    predicate: str
+        The Shapely predicate a reference geometry must satisfy with an annotation
+        geometry: "contains" for included annotations, "intersects" for annotations
+        overlapping the reference.
+    n_workers: int
+        Number of threads fetching the annotations of the different images concurrently.
+        Value 0 for using as many threads as cpus on the machine.
+    collection_params: dict
+        Additional Annotation parameters such as showTerm, reviewed,...
+
+    Returns
+    -------
+    included: dict
+        Mapping of reference annotation id to the collection of annotations matching
+        it (a reference never matches itself).
+    """
+    if any(getattr(reference, "location", None) is None for reference in references):
+        raise ValueError("The reference annotations must be fetched with their location.")
+
+    by_image: Dict[int, List[int]] = {}
+    for position, reference in enumerate(references):
+        by_image.setdefault(reference.image, []).append(position)
+
+    def fetch(id_image: int) -> AnnotationCollection:
+        return AnnotationCollection(
+            image=id_image,
+            terms=list(terms) if terms is not None else None,
+            users=users,
+            showWKT=True,
+            **collection_params,
+        ).fetch()
+
+    results = generic_parallel(list(by_image), fetch, n_workers=n_workers)
+    failed = [id_image for id_image, result in results if is_false(result)]
+    if len(failed) > 0:
+        raise ConnectionError(f"Failed to fetch the annotations of images: {failed}.")
+
+    geometries = references.geometries()
+    included = {}
+    for id_image, candidates in results:
+        positions = by_image[id_image]
+        index = SpatialIndex(geometries[positions])
+        for position in positions:
+            included[references[position].id] = AnnotationCollection()
+        for i, j in index.join(candidates.spatial_index(), predicate):
+            reference, candidate = references[positions[i]], candidates[int(j)]
+            if candidate.id != reference.id:
+                included[reference.id].append(candidate)
+    return included
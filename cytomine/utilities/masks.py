@@ -0,0 +1,194 @@
+# -*- coding: utf-8 -*-
+
+# * Copyright (c) 2009-2024. Authors: see NOTICE file.
+# *
+# * Licensed under the Apache License, Version 2.0 (the "License");
+# * you may not use this file except in compliance with the License.
+# * You may obtain a copy of the License at
+# *
+# *      http://www.apache.org/licenses/LICENSE-2.0
+# *
+# * Unless required by applicable law or agreed to in writing, software
+# * distributed under the License is distributed on an "AS IS" BASIS,
+# * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# * See the License for the specific language governing permissions and
+# * limitations under the License.
+
+import math
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from shapely import wkt
+from shapely.ops import unary_union
+
+from cytomine.models import Annotation, AnnotationCollection, ImageInstance
+from cytomine.models._utilities.geometry import polygonize
+
+# A tile of a mask: the (x, y) position of its top-left corner in the (zoomed) image,
+# in pixels, and its array of labels
+MaskTile = Tuple[Tuple[int, int], Any]
+
+
+def _parts(geometry: Any) -> List[Any]:
+    return list(getattr(geometry, "geoms", [geometry]))
+
+
+def split_mask(mask: Any, tile_size: int = 1024) -> Iterator[MaskTile]:
+    """Split a mask into square tiles (views of the mask, without copy)."""
+    height, width = mask.shape[:2]
+    for y in range(0, height, tile_size):
+        for x in range(0, width, tile_size):
+            yield (x, y), mask[y : y + tile_size, x : x + tile_size]
+
+
+def iter_mask_polygons(
+    tiles: Iterable[MaskTile],
+    image_height: int,
+    zoom: int = 0,
+    background: int = 0,
+    split: bool = True,
+    image_width: Optional[int] = None,
+) -> Iterator[Tuple[int, Any]]:
+    """Extract the polygons of label masks given tile by tile, in the Cytomine coordinate
+    system (origin at the image bottom-left corner, while mask rows go from top to
+    bottom).
+
+    Polygons that do not reach a border of their tile shared with another tile (a seam)
+    are yielded as soon as their tile is processed. The others may continue in a
+    neighbouring tile: they are kept until all the tiles are processed, then merged
+    across the seams (by label).
+    Only these polygons are kept in memory, so that large masks can be processed tile
+    by tile.
+
+    Parameters
+    ----------
+    tiles: iterable
+        The ((x, y), mask) tiles, (x, y) being the position of the tile top-left
+        corner in the image at the given zoom level (consumed lazily).
+    image_height: int
+        The height of the image (at full resolution), in pixels.
+    zoom: int
+        The zoom level of the masks: a mask pixel covers 2^zoom image pixels.
+    background: int
+        The label of the pixels that are not covered by any polygon.
+    split: bool
+        True for yielding each connected component of a label separately (semantic
+        masks), False for yielding the whole (multi)polygon of each label (instance
+        masks), which are all kept until the end.
+    image_width: int|None
+        The width of the image (at full resolution), in pixels. None if unknown, in
+        which case the right border of the tiles is always considered as a seam.
+
+    Yields
+    ------
+    polygon: tuple
+        The (label, geometry) of each polygon.
+    """
+    scale = 2.0**zoom
+    pending: Dict[int, List[Any]] = {}
+    for (x, y), mask in tiles:
+        height, width = mask.shape[:2]
+        minx, maxx = x * scale, (x + width) * scale
+        miny, maxy = image_height - (y + height) * scale, image_height - y * scale
+        # the borders of the tile on the image border are not seams
+        seams = (
+            minx if x > 0 else -math.inf,
+            miny if miny > 0 else -math.inf,
+            maxx if image_width is None or maxx < image_width else math.inf,
+            maxy if y > 0 else math.inf,
+        )
+
+        labels, geometries = polygonize(mask, (x, y), image_height, scale, background)
+        for label, geometry in zip(labels, geometries):
+            for part in _parts(geometry) if split else [geometry]:
+                left, bottom, right, top = part.bounds
+                if (
+                    not split
+                    or left <= seams[0]
+                    or bottom <= seams[1]
+                    or right >= seams[2]
+                    or top >= seams[3]
+                ):
+                    pending.setdefault(int(label), []).append(part)
+                else:
+                    yield int(label), part
+
+    for label, parts in pending.items():
+        merged = unary_union(parts).simplify(0)  # drops the vertices along the seams
+        for part in _parts(merged) if split else [merged]:
+            yield label, part
+
+
+def upload_mask_annotations(
+    tiles: Iterable[MaskTile],
+    image: ImageInstance,
+    terms: Optional[Dict[int, int]] = None,
+    zoom: int = 0,
+    background: int = 0,
+    split: bool = True,
+    batch_size: int = 1000,
+    **save_parameters: Any,
+) -> int:
+    """Convert label masks into annotations of an image and upload them, batch by batch,
+    while the masks are processed (see `iter_mask_polygons`).
+
+    Parameters
+    ----------
+    tiles: iterable
+        The ((x, y), mask) tiles, (x, y) being the position of the tile top-left
+        corner in the image at the given zoom level (consumed lazily).
+    image: ImageInstance
+        The image of the annotations.
+    terms: dict|None
+        Mapping of label to the term id of its annotations. Labels without a term are
+        not uploaded. None for uploading all the labels, without term.
+    zoom: int
+        The zoom level of the masks: a mask pixel covers 2^zoom image pixels.
+    background: int
+        The label of the pixels that are not covered by any annotation.
+    split: bool
+        True for uploading each connected component of a label as an annotation,
+        False for one annotation per label.
+    batch_size: int
+        Number of annotations kept in memory before being uploaded.
+    save_parameters: dict
+        Parameters of `AnnotationCollection.save` (e.g. chunk, n_workers, retries).
+
+    Returns
+    -------
+    count: int
+        The number of uploaded annotations.
+
+    Raises
+    ------
+    CollectionPartialUploadException:
+        When some annotations of a batch could not be uploaded.
+    """
+
+    def upload(batch: AnnotationCollection) -> int:
+        if batch.save(**save_parameters) is False:
+            raise ConnectionError(f"Failed to upload {len(batch)} annotations.")
+        return len(batch)
+
+    count = 0
+    batch = AnnotationCollection()
+    polygons = iter_mask_polygons(
+        tiles, image.height, zoom, background, split, image.width  # type: ignore
+    )
+    for label, geometry in polygons:
+        if terms is not None and label not in terms:
+            continue
+        batch.append(
+            Annotation(
+                location=wkt.dumps(geometry, trim=True),
+                id_image=image.id,
+                id_project=image.project,
+                id_terms=[terms[label]] if terms is not None else None,
+            )
+        )
+        if len(batch) >= batch_size:
+            count += upload(batch)
+            batch = AnnotationCollection()
+
+    if len(batch) > 0:
+        count += upload(batch)
+    return count
@@ -0,0 +1,207 @@
+# -*- coding: utf-8 -*-
+
+# * Copyright (c) 2009-2024. Authors: see NOTICE file.
+# *
+# * Licensed under the Apache License, Version 2.0 (the "License");
+# * you may not use this file except in compliance with the License.
+# * You may obtain a copy of the License at
+# *
+# *      http://www.apache.org/licenses/LICENSE-2.0
+# *
+# * Unless required by applicable law or agreed to in writing, software
+# * distributed under the License is distributed on an "AS IS" BASIS,
+# * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# * See the License for the specific language governing permissions and
+# * limitations under the License.
+
+import copy
+import json
+import os
+from typing import Any, Dict, Iterator, List, Optional
+
+from cytomine.models.collection import Collection
+from cytomine.models.model import Model
+
+# Query parameters that do not change the set of objects matched by a collection query
+_PAGING_PARAMETERS = {"max", "offset", "afterThan", "beforeThan"}
+
+
+def query_identifier(collection: Collection) -> str:
+    """Identifier of the set of objects matched by a collection query
+    (its URI and its filtering parameters)."""
+    parameters = {
+        k: v for k, v in collection.parameters.items() if k not in _PAGING_PARAMETERS
+    }
+    return f"{collection.uri()}?{json.dumps(parameters, sort_keys=True)}"
+
+
+def _timestamp(model: Model) -> Optional[int]:
+    """Last modification time (in ms since epoch) of an object, if known."""
+    values = [getattr(model, attr, None) for attr in ("updated", "created")]
+    stamps = [int(v) for v in values if v is not None]
+    return max(stamps) if len(stamps) > 0 else None
+
+
+class SyncReport:
+    """The changes applied to a mirror by a synchronization."""
+
+    def __init__(self, full: bool) -> None:
+        self.full = full
+        self.inserted: List[Model] = []
+        self.updated: List[Model] = []
+        self.deleted: List[Model] = []
+
+    def __len__(self) -> int:
+        return len(self.inserted) + len(self.updated) + len(self.deleted)
+
+    def __str__(self) -> str:
+        return (
+            f"[{'full' if self.full else 'incremental'} sync] "
+            f"{len(self.inserted)} inserted, {len(self.updated)} updated, "
+            f"{len(self.deleted)} deleted"
+        )
+
+
+class CollectionMirror:
+    """A local mirror of the objects matched by a collection query, kept up to date
+    incrementally.
+
+    The mirror remembers a high-water mark (the most recent creation or update time
+    of the mirrored objects). When the collection supports the `afterThan` parameter
+    (e.g. `PositionCollection`, `AnnotationActionCollection`), a synchronization only
+    fetches the objects created or updated after this mark. Otherwise, the whole
+    collection is fetched and compared to the mirror using the object ids and update
+    times. Deletions can only be detected by a full synchronization.
+
+    The server cannot filter annotations by modification time: an `AnnotationCollection`
+    is always fully fetched again, and only the comparison with the mirror (the report
+    of the changes) is incremental.
+
+    Parameters
+    ----------
+    collection: Collection
+        The collection query to mirror (with its filters and parameters). It is used
+        as a template and is not modified.
+    path: str|None
+        Path of a JSON file where the mirror is persisted between runs.
+        None for an in-memory mirror.
+
+    Examples
+    --------
+    >>> mirror = CollectionMirror(AnnotationCollection(project=42), "annotations.json")
+    >>> report = mirror.sync()  # always a full download for annotations
+    >>> print(report, len(mirror))
+    """
+
+    def __init__(self, collection: Collection, path: Optional[str] = None) -> None:
+        self._collection = collection
+        self._path = path
+        self._objects: Dict[int, Model] = {}
+        self._mark: Optional[int] = None
+
+        if path is not None and os.path.isfile(path):
+            self._load(path)
+
+    @property
+    def query(self) -> str:
+        """Identifier of the mirrored collection query."""
+        return query_identifier(self._collection)
+
+    @property
+    def mark(self) -> Optional[int]:
+        """The high-water mark: most recent creation or update time (in ms since epoch)
+        of the mirrored objects."""
+        return self._mark
+
+    @property
+    def incremental(self) -> bool:
+        """Whether the server can filter the collection by modification time."""
+        return hasattr(self._collection, "afterThan")
+
+    def sync(self, full: bool = False) -> SyncReport:
+        """Fetch the objects created or updated since the last synchronization and merge
+        them into the mirror.
+
+        Parameters
+        ----------
+        full: bool
+            True for fetching the whole collection, also detecting deleted objects.
+            Always the case for the first synchronization or if the collection
+            does not support incremental fetching.
+
+        Returns
+        -------
+        report: SyncReport
+            The inserted, updated and deleted objects.
+        """
+        full = full or self._mark is None or not self.incremental
+
+        query = copy.copy(self._collection)
+        if not full:
+            query.afterThan = self._mark  # type: ignore
+        if query.fetch() is False:
+            raise ConnectionError(f"Failed to fetch the collection {self.query}.")
+
+        report = SyncReport(full)
+        seen = set()
+        for model in query:
+            seen.add(model.id)
+            current = self._objects.get(model.id)
+            if current is None:
+                report.inserted.append(model)
+            elif _timestamp(model) != _timestamp(current) or (
+                _timestamp(model) is None and model.to_json() != current.to_json()
+            ):
+                report.updated.append(model)
+            else:
+                continue
+            self._objects[model.id] = model
+
+        if full:
+            for id_ in set(self._objects) - seen:
+                report.deleted.append(self._objects.pop(id_))
+
+        stamps = [s for s in map(_timestamp, self._objects.values()) if s is not None]
+        if len(stamps) > 0:
+            self._mark = max(stamps)
+
+        if self._path is not None and len(report) > 0:
+            self._save(self._path)
+        return report
+
+    def _load(self, path: str) -> None:
+        with open(path, "r", encoding="utf-8") as file:
+            content = json.load(file)
+
+        if content["query"] != self.query:
+            raise ValueError(
+                f"The mirror {path} was built for another query ({content['query']})."
+            )
+
+        collection = copy.copy(self._collection)
+        collection.populate({"collection": content["objects"], "size": 0})
+        self._objects = {model.id: model for model in collection}
+        self._mark = content["mark"]
+
+    def _save(self, path: str) -> None:
+        content = {
+            "query": self.query,
+            "mark": self._mark,
+            "objects": [json.loads(model.to_json()) for model in self._objects.values()],
+        }
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump(content, file)
+        os.replace(tmp_path, path)
+
+    def __len__(self) -> int:
+        return len(self._objects)
+
+    def __iter__(self) -> Iterator[Model]:
+        return iter(self._objects.values())
+
+    def __contains__(self, id_: Any) -> bool:
+        return id_ in self._objects
+
+    def __getitem__(self, id_: int) -> Model:
+        return self._objects[id_]
@@ -0,0 +1,350 @@
+# -*- coding: utf-8 -*-
+
+# * Copyright (c) 2009-2024. Authors: see NOTICE file.
+# *
+# * Licensed under the Apache License, Version 2.0 (the "License");
+# * you may not use this file except in compliance with the License.
+# * You may obtain a copy of the License at
+# *
+# *      http://www.apache.org/licenses/LICENSE-2.0
+# *
+# * Unless required by applicable law or agreed to in writing, software
+# * distributed under the License is distributed on an "AS IS" BASIS,
+# * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# * See the License for the specific language governing permissions and
+# * limitations under the License.
+
+import json
+import sqlite3
+import time
+from threading import Lock
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Type, Union
+
+from cytomine.models.collection import Collection
+from cytomine.models.model import Model
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS objects (
+    kind TEXT NOT NULL,
+    id INTEGER NOT NULL,
+    project INTEGER,
+    image INTEGER,
+    user INTEGER,
+    created INTEGER,
+    fetched REAL NOT NULL,
+    complete INTEGER NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (kind, id)
+);
+CREATE INDEX IF NOT EXISTS objects_project ON objects (kind, project);
+CREATE INDEX IF NOT EXISTS objects_image ON objects (kind, image);
+CREATE INDEX IF NOT EXISTS objects_user ON objects (kind, user);
+CREATE INDEX IF NOT EXISTS objects_created ON objects (kind, created);
+CREATE TABLE IF NOT EXISTS object_terms (
+    kind TEXT NOT NULL,
+    id INTEGER NOT NULL,
+    term INTEGER NOT NULL,
+    PRIMARY KEY (kind, id, term)
+);
+CREATE INDEX IF NOT EXISTS object_terms_term ON object_terms (kind, term);
+CREATE TABLE IF NOT EXISTS queries (
+    query TEXT PRIMARY KEY,
+    fetched REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS query_objects (
+    query TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    id INTEGER NOT NULL,
+    PRIMARY KEY (query, position)
+);
+"""
+
+IdFilter = Optional[Union[int, Iterable[int]]]
+
+
+def _as_int(value: Any) -> Optional[int]:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _kind(collection: Collection) -> str:
+    return collection._model.__name__  # pylint: disable=protected-access
+
+
+def _query_key(collection: Collection) -> str:
+    """Identifier of a collection query (its URI and all its parameters, including the
+    paging ones)."""
+    return f"{collection.uri()}?{json.dumps(collection.parameters, sort_keys=True)}"
+
+
+class LocalStore:
+    """A local SQLite store of the models fetched from the server.
+
+    Fetched collections are persisted with the query that matched them, so that the
+    same query is answered locally as long as its result is not older than `max_age`.
+    Stored objects are indexed by project, image, user, term and creation time, which
+    allows to filter them locally with `query()` without any request to the server.
+
+    The attributes of an object fetched by several queries (e.g. with and without
+    `showWKT`) are merged. As collections may not return all the attributes of their
+    objects, `get()` only serves the objects that were fetched or stored individually.
+
+    Parameters
+    ----------
+    path: str
+        Path of the SQLite database file (created if needed). ":memory:" for a
+        store that is not persisted.
+    max_age: float|None
+        Age (in seconds) after which stored data is stale and fetched again from the
+        server. None for never considering stored data as stale.
+
+    Examples
+    --------
+    >>> with LocalStore("cytomine.db", max_age=3600) as store:
+    >>>     annotations = store.fetch(AnnotationCollection(project=42, showWKT=True))
+    >>>     tumors = store.query(AnnotationCollection(), project=42, term=[5, 6])
+    """
+
+    def __init__(self, path: str = ":memory:", max_age: Optional[float] = None) -> None:
+        self._max_age = max_age
+        self._lock = Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        with self._db:
+            self._db.executescript(_SCHEMA)
+
+    def __enter__(self) -> "LocalStore":
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self._db.close()
+
+    def _is_fresh(self, fetched: float, max_age: Optional[float]) -> bool:
+        max_age = self._max_age if max_age is None else max_age
+        return max_age is None or time.time() - fetched <= max_age
+
+    def _stored_objects(self, kind: str, ids: List[int]) -> Dict[int, Tuple[str, int]]:
+        stored: Dict[int, Tuple[str, int]] = {}
+        for i in range(0, len(ids), 500):
+            chunk = ids[i : i + 500]
+            stored.update(
+                (id_, (data, complete))
+                for id_, data, complete in self._db.execute(
+                    "SELECT id, data, complete FROM objects "
+                    f"WHERE kind=? AND id IN ({','.join('?' * len(chunk))})",
+                    [kind, *chunk],
+                )
+            )
+        return stored
+
+    def _put(
+        self,
+        models: Iterable[Model],
+        fetched: float,
+        complete: bool,
+    ) -> List[Optional[int]]:
+        """Store models, merging their attributes into those already stored (the
+        attributes that are not set do not replace the stored ones)."""
+        models = list(models)
+        stored: Dict[str, Dict[int, Tuple[str, int]]] = {}
+        for model in models:
+            stored.setdefault(model.__class__.__name__, {})
+        for kind in stored:
+            stored[kind] = self._stored_objects(
+                kind,
+                [m.id for m in models if m.__class__.__name__ == kind and m.id is not None],
+            )
+
+        ids: List[Optional[int]] = []
+        rows, terms = [], []
+        for model in models:
+            kind = model.__class__.__name__
+            data = {k: v for k, v in json.loads(model.to_json()).items() if v is not None}
+            was_complete = False
+            if model.id in stored[kind]:
+                previous, was_complete = stored[kind][model.id]  # type: ignore
+                data = {**json.loads(previous), **data}
+            ids.append(model.id)
+            rows.append(
+                (
+                    kind,
+                    model.id,
+                    _as_int(data.get("project")),
+                    _as_int(data.get("image")),
+                    _as_int(data.get("user")),
+                    _as_int(data.get("created")),
+                    fetched,
+                    int(complete or was_complete),
+                    json.dumps(data),
+                )
+            )
+            if isinstance(data.get("term"), list):
+                terms.append((kind, model.id, data["term"]))
+
+        self._db.executemany("INSERT OR REPLACE INTO objects VALUES (?,?,?,?,?,?,?,?,?)", rows)
+        for kind, id_, term in terms:
+            self._db.execute("DELETE FROM object_terms WHERE kind=? AND id=?", (kind, id_))
+            self._db.executemany(
+                "INSERT OR IGNORE INTO object_terms VALUES (?,?,?)",
+                [(kind, id_, t) for t in term],
+            )
+        return ids
+
+    def put(self, models: Iterable[Model]) -> int:
+        """Store (or replace) models.
+
+        Returns
+        -------
+        count: int
+            The number of stored models.
+        """
+        with self._lock, self._db:
+            return len(self._put(models, time.time(), complete=True))
+
+    def get(
+        self,
+        model_cls: Type[Model],
+        id: int,
+        max_age: Optional[float] = None,
+    ) -> Union[bool, Model]:
+        """Get a model from the store, or from the server if it is missing, stale or
+        only stored from collections (which may not include all its attributes).
+
+        Parameters
+        ----------
+        model_cls: type
+            The model class (e.g. `Project`).
+        id: int
+            The model id.
+        max_age: float|None
+            Overrides the store `max_age` for this call.
+        """
+        with self._lock:
+            row = self._db.execute(
+                "SELECT data, fetched FROM objects WHERE kind=? AND id=? AND complete=1",
+                (model_cls.__name__, id),
+            ).fetchone()
+        if row is not None and self._is_fresh(row[1], max_age):
+            return model_cls().populate(json.loads(row[0])).mark_clean()
+
+        model = model_cls().fetch(id)
+        if model is not False:
+            self.put([model])  # type: ignore
+        return model
+
+    def fetch(
+        self,
+        collection: Collection,
+        max_age: Optional[float] = None,
+        refresh: bool = False,
+    ) -> Union[bool, Collection]:
+        """Fetch a collection from the store if the same query (with the same page) was
+        already fetched and is not stale, from the server otherwise (the result is then
+        stored).
+
+        Parameters
+        ----------
+        collection: Collection
+            The collection to fetch, with its filters and parameters.
+        max_age: float|None
+            Overrides the store `max_age` for this call.
+        refresh: bool
+            True for always fetching the collection from the server.
+        """
+        key = _query_key(collection)
+        if not refresh:
+            rows = self._stored_query(key, _kind(collection), max_age)
+            if rows is not None:
+                return collection.populate({"collection": rows, "size": len(rows)})
+
+        if collection.fetch() is False:
+            return False
+
+        with self._lock, self._db:
+            ids = self._put(collection, time.time(), complete=False)
+            self._db.execute("DELETE FROM query_objects WHERE query=?", (key,))
+            self._db.executemany(
+                "INSERT INTO query_objects VALUES (?,?,?)",
+                [(key, position, id_) for position, id_ in enumerate(ids)],
+            )
+            self._db.execute("INSERT OR REPLACE INTO queries VALUES (?,?)", (key, time.time()))
+        return collection
+
+    def _stored_query(
+        self,
+        key: str,
+        kind: str,
+        max_age: Optional[float],
+    ) -> Optional[List[Dict[str, Any]]]:
+        """The stored result of a query, or None if it is missing, stale or incomplete."""
+        with self._lock:
+            row = self._db.execute("SELECT fetched FROM queries WHERE query=?", (key,)).fetchone()
+            if row is None or not self._is_fresh(row[0], max_age):
+                return None
+            rows = self._db.execute(
+                "SELECT o.data FROM query_objects q "
+                "LEFT JOIN objects o ON o.kind=? AND o.id=q.id "
+                "WHERE q.query=? ORDER BY q.position",
+                (kind, key),
+            ).fetchall()
+        if any(data is None for data, in rows):
+            return None
+        return [json.loads(data) for data, in rows]
+
+    def query(
+        self,
+        collection: Collection,
+        project: IdFilter = None,
+        image: IdFilter = None,
+        user: IdFilter = None,
+        term: IdFilter = None,
+        created_after: Optional[int] = None,
+        created_before: Optional[int] = None,
+        limit: Optional[int] = None,
+    ) -> Collection:
+        """Filter the stored objects of the collection type locally (no request is sent
+        to the server). Each filter accepts a single id or several ids.
+
+        Parameters
+        ----------
+        collection: Collection
+            An (empty) collection of the type of objects to query, populated with the
+            result.
+        project, image, user, term: int|iterable|None
+            Id(s) the object attribute must match. None for no filtering.
+        created_after, created_before: int|None
+            Bounds (exclusive, in ms since epoch) on the object creation time.
+        limit: int|None
+            Maximum number of objects to return.
+        """
+        clauses: List[str] = ["o.kind=?"]
+        args: List[Any] = [_kind(collection)]
+        for column, value in (("project", project), ("image", image), ("user", user)):
+            if value is not None:
+                ids = [value] if isinstance(value, int) else list(value)
+                clauses.append(f"o.{column} IN ({','.join('?' * len(ids))})")
+                args.extend(ids)
+        if term is not None:
+            ids = [term] if isinstance(term, int) else list(term)
+            clauses.append(
+                "EXISTS (SELECT 1 FROM object_terms t WHERE t.kind=o.kind AND t.id=o.id "
+                f"AND t.term IN ({','.join('?' * len(ids))}))"
+            )
+            args.extend(ids)
+        for op, bound in ((">", created_after), ("<", created_before)):
+            if bound is not None:
+                clauses.append(f"o.created {op} ?")
+                args.append(bound)
+
+        sql = f"SELECT o.data FROM objects o WHERE {' AND '.join(clauses)} ORDER BY o.id"
+        if limit is not None:
+            sql += f" LIMIT {int(limit)}"
+
+        with self._lock:
+            rows: List[Tuple[str]] = self._db.execute(sql, args).fetchall()
+        data = [json.loads(data) for data, in rows]
+        return collection.populate({"collection": data, "size": len(data)})
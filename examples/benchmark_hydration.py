@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+
+# * Copyright (c) 2009-2024. Authors: see NOTICE file.
+# *
+# * Licensed under the Apache License, Version 2.0 (the "License");
+# * you may not use this file except in compliance with the License.
+# * You may obtain a copy of the License at
+# *
+# *      http://www.apache.org/licenses/LICENSE-2.0
+# *
+# * Unless required by applicable law or agreed to in writing, software
+# * distributed under the License is distributed on an "AS IS" BASIS,
+# * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# * See the License for the specific language governing permissions and
+# * limitations under the License.
+
+# Compare the time needed to build a collection of annotations from a server response
+# as models, as plain dictionaries and as records. No connection to a server is needed.
+
+import sys
+import timeit
+from argparse import ArgumentParser
+
+from cytomine.models import AnnotationCollection
+
+
+def fake_response(n_annotations):
+    return {
+        "collection": [
+            {
+                "id": i,
+                "class": "be.cytomine.domain.ontology.UserAnnotation",
+                "created": "1700000000000",
+                "updated": None,
+                "location": f"POINT ({i} {i})",
+                "image": 1,
+                "slice": 2,
+                "project": 3,
+                "user": 4,
+                "term": [5, 6],
+                "track": [],
+                "area": 0.0,
+                "perimeter": 0.0,
+                "centroid": {"x": i, "y": i},
+                "uri": None,
+                "id_user": 4,
+                "reviewed": False,
+                "cropURL": f"/api/userannotation/{i}/crop.png",
+            }
+            for i in range(n_annotations)
+        ],
+        "size": n_annotations,
+    }
+
+
+if __name__ == '__main__':
+    parser = ArgumentParser(prog="Cytomine Python client example")
+    parser.add_argument('--n_annotations', dest='n_annotations', type=int, default=100000,
+                        help="Number of annotations in the fake response")
+    parser.add_argument('--repeat', dest='repeat', type=int, default=5,
+                        help="Number of measures (the best one is reported)")
+    params, other = parser.parse_known_args(sys.argv[1:])
+
+    response = fake_response(params.n_annotations)
+    for mode in [None, "dict", "record"]:
+        duration = min(timeit.repeat(
+            lambda: AnnotationCollection().as_raw(mode).populate(response),
+            number=1,
+            repeat=params.repeat,
+        ))
+        print(f"{mode or 'model':>6}: {duration:.3f}s "
+              f"({params.n_annotations / duration:,.0f} annotations/s)")
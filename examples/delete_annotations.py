@@ -56,5 +56,6 @@ if __name__ == '__main__':
         annotations.fetch()
         print(annotations)
 
-        for annotation in annotations:
-            annotation.delete()
+        # Delete them in parallel, at most 20 requests per second
+        deleted, failed = annotations.delete_all(rate=20, retries=2, progress=True)
+        logger.info(f"{len(deleted)} annotations deleted, {len(failed)} failed.")
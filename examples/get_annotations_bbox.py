@@ -18,8 +18,6 @@ import logging
 import sys
 from argparse import ArgumentParser
 
-from shapely import wkt
-
 from cytomine import Cytomine
 from cytomine.models import *
 
@@ -66,7 +64,11 @@ if __name__ == '__main__':
         annotations.showTerm = True
         annotations.fetch()  # => Fetch annotations from the server with the given filters.
 
-        for annotation in annotations:
+        # Get the bounding boxes (minx, miny, maxx, maxy) of all the annotations at once.
+        # The WKT locations are parsed in bulk (https://shapely.readthedocs.io/en/stable/)
+        bounds = annotations.bounds()
+
+        for annotation, bbox in zip(annotations, bounds):
             # Find the image instance object related to the current annotation
             annot_image = get_by_id(image_instances, annotation.image)
 
@@ -74,9 +76,6 @@ if __name__ == '__main__':
             # An annotation can have 0, 1 or several terms so list is used
             annot_terms = [get_by_id(terms, t) for t in annotation.term]
 
-            # Get the annotation geometry as a Shapely object (https://shapely.readthedocs.io/en/latest/manual.html)
-            geometry = wkt.loads(annotation.location)
-            bbox = geometry.bounds  # See https://shapely.readthedocs.io/en/latest/manual.html#object.bounds
             print(
                 f"ID: {annotation.id} | "
                 f"Image: {annot_image.originalFilename} | "
@@ -84,5 +83,5 @@ if __name__ == '__main__':
                 f"Terms: {[t.name for t in annot_terms]} | "
                 f"Area: {annotation.area} | "
                 f"Perimeter: {annotation.perimeter} | "
-                f"Bbox: {bbox}"
+                f"Bbox: {tuple(bbox)}"
             )
@@ -45,8 +45,9 @@ setup(
                       'requests>=2.27.1',
                       'urllib3>=1.25.2'],
     setup_requires=['pytest-runner'],
-    extra_requires={
-        "test": ['pytest']
+    extras_require={
+        "test": ['pytest'],
+        "geometry": ['numpy', 'shapely>=2'],
     },
     test_suite='cytomine.tests',
     license='LICENSE',
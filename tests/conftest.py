@@ -14,10 +14,13 @@
 # * See the License for the specific language governing permissions and
 # * limitations under the License.
 
+# pylint: disable=redefined-outer-name,unused-argument
+
 import logging
 import random
 import string
-from typing import Any, Dict
+from threading import Lock
+from typing import Any, Callable, Dict, List, Optional, Union
 
 import pytest
 
@@ -26,8 +29,10 @@ from cytomine.models import (
     AbstractImage,
     AbstractSlice,
     Annotation,
+    Collection,
     ImageInstance,
     ImageServerCollection,
+    Model,
     Ontology,
     Project,
     Storage,
@@ -62,6 +67,94 @@ def connect(request: pytest.FixtureRequest) -> Cytomine:
     return c
 
 
+@pytest.fixture
+def offline_client(monkeypatch: pytest.MonkeyPatch) -> Cytomine:
+    """A client instance that is not connected to any server."""
+    client = Cytomine.__new__(Cytomine)
+    client._logger = logging.getLogger("cytomine.client")  # pylint: disable=protected-access
+    client._in_flight = {}  # pylint: disable=protected-access
+    client._in_flight_lock = Lock()  # pylint: disable=protected-access
+    monkeypatch.setattr(Cytomine, "get_instance", staticmethod(lambda: client))
+    return client
+
+
+class FakeServer:
+    """An in-memory server answering the requests of a client instance.
+
+    The rows of a collection (before pagination) are given by the handler registered for
+    its class (`collections`), called with the collection, and the attributes of a model
+    by the handler registered for its class (`models`), called with its id (None for a
+    model that is not found). Created models get incremental ids, unless `reject`
+    returns True for the models of the request.
+    """
+
+    def __init__(self) -> None:
+        self.collections: Dict[type, Callable[[Any], List[Dict[str, Any]]]] = {}
+        self.models: Dict[type, Callable[[Optional[int]], Optional[Dict[str, Any]]]] = {}
+        self.reject: Callable[[List[Any]], bool] = lambda models: False
+        self.queries: List[Dict[str, Any]] = []  # parameters of the collection requests
+        self.fetched: List[Optional[int]] = []  # ids of the model requests
+        self.posted: List[List[Any]] = []  # models of the creation requests
+        self.next_id = 1
+        self._lock = Lock()
+
+    @staticmethod
+    def _handler(handlers: Dict[type, Any], cls: type) -> Any:
+        for base in cls.__mro__:
+            if base in handlers:
+                return handlers[base]
+        raise KeyError(f"No handler for {cls.__name__}.")
+
+    def get_collection(
+        self,
+        collection: Collection,
+        query_parameters: Optional[Dict[str, Any]] = None,
+        append_mode: bool = False,
+    ) -> Union[bool, Collection]:
+        with self._lock:
+            self.queries.append(dict(query_parameters or {}))
+        rows = self._handler(self.collections, type(collection))(collection)
+        offset = collection.offset or 0
+        page = rows[offset : offset + collection.max] if collection.max else rows[offset:]
+        return collection.populate({"collection": page, "size": len(rows)}, append_mode)
+
+    def get_model(
+        self,
+        model: Model,
+        query_parameters: Optional[Dict[str, Any]] = None,
+    ) -> Union[bool, Model]:
+        with self._lock:
+            self.fetched.append(model.id)
+        attributes = self._handler(self.models, type(model))(model.id)
+        if attributes is None:
+            return False
+        return model.populate(attributes).mark_clean()
+
+    def post_collection(
+        self,
+        collection: Collection,
+        query_parameters: Optional[Dict[str, Any]] = None,
+    ) -> bool:
+        models = list(collection)
+        with self._lock:
+            self.posted.append(models)
+            if self.reject(models):
+                return False
+            ids = range(self.next_id, self.next_id + len(models))
+            self.next_id += len(models)
+        collection.populate_created([{"id": id_} for id_ in ids])
+        return True
+
+
+@pytest.fixture
+def fake_server(monkeypatch: pytest.MonkeyPatch, offline_client: Cytomine) -> FakeServer:
+    """An in-memory server answering the requests of the offline client."""
+    server = FakeServer()
+    for method in ("get_collection", "get_model", "post_collection"):
+        monkeypatch.setattr(offline_client, method, getattr(server, method))
+    return server
+
+
 @pytest.fixture(scope="session")
 def dataset(request: pytest.FixtureRequest) -> Dict[str, Any]:
     data: Dict[str, Any] = {}
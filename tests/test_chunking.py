@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+
+# * Copyright (c) 2009-2024. Authors: see NOTICE file.
+# *
+# * Licensed under the Apache License, Version 2.0 (the "License");
+# * you may not use this file except in compliance with the License.
+# * You may obtain a copy of the License at
+# *
+# *      http://www.apache.org/licenses/LICENSE-2.0
+# *
+# * Unless required by applicable law or agreed to in writing, software
+# * distributed under the License is distributed on an "AS IS" BASIS,
+# * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# * See the License for the specific language governing permissions and
+# * limitations under the License.
+
+from cytomine.models._utilities.chunking import AdaptiveChunker
+
+
+class TestAdaptiveChunker:
+    def test_chunks_by_size(self) -> None:
+        sizes = [10] * 10 + [100] + [10] * 5
+        chunker = AdaptiveChunker(len(sizes), sizes.__getitem__, target_bytes=30, min_bytes=1)
+        assert next(iter(chunker)) == (0, 3)
+        assert chunker.payload_size(0, 3) == 30
+        assert len(chunker._sizes) == 4  # pylint: disable=protected-access
+
+        chunks = list(chunker)
+
+        assert chunks[0] == (0, 3)
+        assert (10, 11) in chunks
+        assert chunks[-1][1] == len(sizes)
+        assert all(start < end for start, end in chunks)
+
+    def test_grow_and_shrink(self) -> None:
+        chunker = AdaptiveChunker(10, lambda _: 1, target_bytes=100, min_bytes=10)
+
+        chunker.record(100, latency=0.1, success=True)
+        assert chunker.target_bytes == 150
+
+        chunker.record(150, latency=4.0, success=True)
+        assert chunker.target_bytes == 75
+
+        chunker.record(75, latency=0.1, success=False)
+        assert chunker.target_bytes == 37
+
+    def test_split(self) -> None:
+        chunker = AdaptiveChunker(4, lambda _: 100, target_bytes=50, min_bytes=250)
+        assert chunker.min_bytes == 50
+
+        assert chunker.should_split(0, 4)
+        assert chunker.should_split(0, 2)
+        assert not chunker.should_split(0, 1)
+        assert not chunker.should_split(0, 4, depth=chunker.max_splits)
+        assert chunker.split(0, 4) == [(0, 2), (2, 4)]
@@ -0,0 +1,315 @@
+# -*- coding: utf-8 -*-
+
+# * Copyright (c) 2009-2024. Authors: see NOTICE file.
+# *
+# * Licensed under the Apache License, Version 2.0 (the "License");
+# * you may not use this file except in compliance with the License.
+# * You may obtain a copy of the License at
+# *
+# *      http://www.apache.org/licenses/LICENSE-2.0
+# *
+# * Unless required by applicable law or agreed to in writing, software
+# * distributed under the License is distributed on an "AS IS" BASIS,
+# * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# * See the License for the specific language governing permissions and
+# * limitations under the License.
+
+# pylint: disable=unused-argument
+
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import pytest
+import requests
+
+from cytomine import Cytomine
+from cytomine.models import (
+    Annotation,
+    AnnotationCollection,
+    Collection,
+    ImageInstance,
+    ImageInstanceCollection,
+    ProjectCollection,
+    Term,
+)
+from cytomine.models._utilities import generic_parallel
+from cytomine.models.collection import CollectionPartialUploadException
+from tests.conftest import FakeServer
+
+
+def user_annotations(collection: Collection) -> List[Dict[str, Any]]:
+    return [
+        {"id": 1000 * i + u, "image": i, "user": u}
+        for i in collection.images  # type: ignore
+        for u in collection.users  # type: ignore
+    ]
+
+
+PROJECTS = {"user": {1: [10, 11], 2: [11, 12]}, "ontology": {5: [11, 12, 13]}}
+
+
+def filtered_projects(collection: Collection) -> List[Dict[str, Any]]:
+    ((key, value),) = collection.filters.items()
+    return [{"id": id_} for id_ in PROJECTS[key][value]]
+
+
+class TestFetchWithFilters:
+    def test_list_parameters(self, fake_server: FakeServer) -> None:
+        fake_server.collections[AnnotationCollection] = user_annotations
+        annotations = AnnotationCollection(project=1).fetch_with_filters(
+            max_values=100,
+            image=list(range(300)),
+            user=[1, 2, 3, 4, 5],
+        )
+
+        assert len(fake_server.queries) == 3
+        assert all(q["project"] == 1 for q in fake_server.queries)
+        assert len(annotations) == 1500  # type: ignore
+
+    def test_filters_intersection(self, fake_server: FakeServer) -> None:
+        fake_server.collections[ProjectCollection] = filtered_projects
+        projects = ProjectCollection().fetch_with_filters(
+            filters={"user": [1, 2], "ontology": 5}
+        )
+
+        assert [p.id for p in projects] == [11, 12]  # type: ignore
+
+    def test_raw_filters(self, fake_server: FakeServer) -> None:
+        fake_server.collections[ProjectCollection] = filtered_projects
+        projects = ProjectCollection().as_raw().fetch_with_filters(
+            filters={"user": (1, 2, 2), "ontology": {5}}
+        )
+        assert list(projects) == [{"id": 11}, {"id": 12}]  # type: ignore
+
+        with pytest.raises(KeyError):
+            ProjectCollection().fetch_with_filters(filters={"user": [1, 3]})
+
+
+class TestRawHydration:
+    def test_raw_modes(self) -> None:
+        response = {
+            "collection": [{"id": 1, "id_project": 2, "class": "a", "uri": "u", "_x": 0}],
+            "size": 1,
+        }
+
+        (row,) = AnnotationCollection().as_raw().populate(response)
+        assert row == {"id": 1, "project": 2, "class_": "a", "uri_": "u"}
+
+        (record,) = AnnotationCollection().as_raw("record").populate(response)
+        assert (record.project, record.class_) == (2, "a")
+
+        (model,) = AnnotationCollection().populate(response)
+        assert (model.project, model.class_, model.uri_) == (2, "a", "u")
+
+
+def paged_annotations(moved: List[int]) -> Any:
+    """Six annotations of a project, without those that have `moved` when fetching
+    their location."""
+
+    def rows(collection: Collection) -> List[Dict[str, Any]]:
+        data = []
+        for i in range(6):
+            if collection.showWKT and i in moved:  # type: ignore
+                continue
+            annotation: Dict[str, Any] = {"id": i, "project": 1}
+            if collection.showWKT:  # type: ignore
+                annotation["location"] = f"POINT ({i} {i})"
+            if collection.showTerm:  # type: ignore
+                annotation["term"] = [i]
+            data.append(annotation)
+        return data
+
+    return rows
+
+
+class TestLazyLoading:
+    def test_lazy_loading(self, fake_server: FakeServer) -> None:
+        fake_server.collections[AnnotationCollection] = paged_annotations([])
+        annotations = AnnotationCollection(project=1, max=2).lazy(eager=["term"])
+        annotations.fetch()
+        annotations.fetch_next_page(append_mode=True)
+
+        assert len(fake_server.queries) == 2
+        assert fake_server.queries[0]["showWKT"] is False
+        assert annotations[3].term == [3]
+        assert "location" not in annotations[3].__dict__
+
+        assert annotations[3].location == "POINT (3 3)"
+        assert annotations[2].location == "POINT (2 2)"
+        assert len(fake_server.queries) == 3
+        assert fake_server.queries[2]["offset"] == 2
+        assert not annotations[2].is_dirty()
+
+        assert annotations[0].location == "POINT (0 0)"
+        assert len(fake_server.queries) == 4
+
+    def test_lazy_loading_with_memory_limit(self, fake_server: FakeServer) -> None:
+        fake_server.collections[AnnotationCollection] = paged_annotations([])
+        annotations = AnnotationCollection(project=1, max=2).lazy()
+        annotations.set_memory_limit(4, page_size=2)
+        for _ in range(3):
+            annotations.fetch_next_page(append_mode=True)
+
+        assert annotations.data().n_spilled == 1  # type: ignore
+        assert [a.location for a in annotations] == [f"POINT ({i} {i})" for i in range(6)]
+        assert len(fake_server.queries) == 6
+
+    def test_moved_annotations(self, fake_server: FakeServer) -> None:
+        fake_server.models[Annotation] = lambda id_: (
+            None if id_ == 3 else {"id": id_, "location": f"POINT ({id_} 0)"}
+        )
+        fake_server.collections[AnnotationCollection] = paged_annotations([1, 3])
+        annotations = AnnotationCollection(project=1, max=4).lazy()
+        annotations.fetch()
+        with pytest.raises(ConnectionError):
+            assert annotations[0].location
+
+        fake_server.collections[AnnotationCollection] = paged_annotations([1])
+        annotations.fetch()
+        assert annotations[0].location == "POINT (0 0)"
+        assert annotations[1].location == "POINT (1 0)"
+
+
+class TestPrefetchRelated:
+    def test_prefetch_related(self, fake_server: FakeServer) -> None:
+        fake_server.models[Term] = lambda id_: None if id_ == 99 else {"id": id_}
+        fake_server.collections[ImageInstanceCollection] = lambda _: [
+            {"id": id_} for id_ in range(100)
+        ]
+
+        annotations = AnnotationCollection()
+        annotations.populate(
+            {
+                "collection": [
+                    {"id": i, "project": 1, "image": i % 12, "term": [i % 3, 99]}
+                    for i in range(30)
+                ],
+                "size": 30,
+            }
+        )
+        annotations.prefetch_related("term", "image", n_workers=2)
+
+        assert sorted(fake_server.fetched, key=str) == [0, 1, 2, 99]
+        annotation = annotations[4]
+        assert annotation.related("image").id == 4
+        assert [t and t.id for t in annotation.related("term")] == [1, None]
+
+
+def slow_terms(delay: float, missing: Optional[int] = None) -> Any:
+    def attributes(id_: Optional[int]) -> Optional[Dict[str, Any]]:
+        time.sleep(delay)
+        return None if id_ == missing else {"id": id_}
+
+    return attributes
+
+
+class TestFetchMany:
+    def test_fetch_many(self, offline_client: Cytomine, fake_server: FakeServer) -> None:
+        fake_server.models[Term] = slow_terms(0.05, missing=3)
+
+        results = offline_client.fetch_many(Term, [5, 3, 1, 5, 2], n_workers=4)
+
+        assert [r and r.id for r in results] == [5, False, 1, 5, 2]  # type: ignore
+        assert sorted(fake_server.fetched) == [1, 2, 3, 5]  # type: ignore
+
+    def test_coalescing(self, offline_client: Cytomine, fake_server: FakeServer) -> None:
+        fake_server.models[Term] = slow_terms(0.2)
+        results = generic_parallel(
+            range(4), lambda _: offline_client.fetch_many(Term, [7]), n_workers=4
+        )
+
+        assert fake_server.fetched == [7]
+        assert all(models[0].id == 7 for _, models in results)  # type: ignore
+
+
+def tiled_annotations(collection: Collection) -> List[Dict[str, Any]]:
+    # Annotations at (x, y) = (150 * k, 50), with a bbox spanning 100 pixels
+    minx, _, maxx, _ = (int(v) for v in collection.bbox.split(","))  # type: ignore
+    return [{"id": k} for k in range(7) if 150 * k < maxx and 150 * k + 100 > minx]
+
+
+class TestTiledFetch:
+    def test_iter_tiles(self, fake_server: FakeServer) -> None:
+        fake_server.collections[AnnotationCollection] = tiled_annotations
+        image = ImageInstance(width=1000, height=300)
+        image.id = 1
+
+        annotations = list(
+            AnnotationCollection(image=1).iter_tiles(256, image=image, n_workers=4)
+        )
+
+        assert sorted(a.id for a in annotations) == list(range(7))
+
+
+def make_uploads(n_annotations: int) -> AnnotationCollection:
+    annotations = AnnotationCollection()
+    annotations.extend(Annotation("POINT (1 1)", i) for i in range(n_annotations))
+    return annotations
+
+
+def posted_images(server: FakeServer) -> List[List[int]]:
+    return [[annotation.image for annotation in models] for models in server.posted]
+
+
+def reject_once(image: int) -> Any:
+    """Reject the first request with an annotation of the given image."""
+    rejected = {image}
+
+    def reject(models: List[Annotation]) -> bool:
+        images = {annotation.image for annotation in models}
+        if rejected & images:
+            rejected.clear()
+            return True
+        return False
+
+    return reject
+
+
+class TestSave:
+    def test_auto_chunks(self, fake_server: FakeServer) -> None:
+        fake_server.reject = lambda models: len(models) > 1
+        annotations = make_uploads(12)
+        size = len(annotations[0].to_json())
+
+        assert annotations.save(chunk="auto", chunk_bytes=3 * size, n_workers=1)
+        assert len(fake_server.posted[0]) == 3  # split after its failure
+        assert posted_images(fake_server)[1:3] == [[0], [1, 2]]
+        assert sorted(a.id for a in annotations) == list(range(1, 13))
+
+    def test_split_failures(self, fake_server: FakeServer) -> None:
+        def reject(models: List[Annotation]) -> bool:
+            if any(annotation.image == 3 for annotation in models):
+                raise requests.ConnectionError("Connection reset")
+            return False
+
+        fake_server.reject = reject
+        annotations = make_uploads(4)
+        size = len(annotations[0].to_json())
+
+        with pytest.raises(CollectionPartialUploadException) as e:
+            annotations.save(chunk="auto", chunk_bytes=4 * size, n_workers=1, retries=1)
+        assert [a.image for a in e.value.failed] == [3]  # type: ignore
+        assert posted_images(fake_server) == [[0, 1, 2, 3], [0, 1], [2, 3], [2], [3], [3]]
+
+    def test_retries(self, fake_server: FakeServer) -> None:
+        fake_server.reject = reject_once(5)
+        annotations = make_uploads(8)
+
+        assert annotations.save(chunk=4, n_workers=1, retries=1)
+        assert posted_images(fake_server) == [[0, 1, 2, 3], [4, 5, 6, 7], [4, 5, 6, 7]]
+        assert all(a.id is not None for a in annotations)
+
+    def test_journal(self, fake_server: FakeServer, tmp_path: Path) -> None:
+        fake_server.reject = reject_once(5)
+        journal = str(tmp_path / "upload.journal")
+
+        with pytest.raises(CollectionPartialUploadException) as e:
+            make_uploads(8).save(chunk=4, n_workers=1, journal=journal)
+        assert [a.image for a in e.value.failed] == [4, 5, 6, 7]  # type: ignore
+
+        fake_server.posted = []
+        annotations = make_uploads(8)
+        assert annotations.save(chunk=4, n_workers=1, journal=journal)
+        assert posted_images(fake_server) == [[4, 5, 6, 7]]
+        assert [a.id for a in annotations] == list(range(1, 9))
@@ -0,0 +1,214 @@
+# -*- coding: utf-8 -*-
+
+# * Copyright (c) 2009-2024. Authors: see NOTICE file.
+# *
+# * Licensed under the Apache License, Version 2.0 (the "License");
+# * you may not use this file except in compliance with the License.
+# * You may obtain a copy of the License at
+# *
+# *      http://www.apache.org/licenses/LICENSE-2.0
+# *
+# * Unless required by applicable law or agreed to in writing, software
+# * distributed under the License is distributed on an "AS IS" BASIS,
+# * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# * See the License for the specific language governing permissions and
+# * limitations under the License.
+
+import math
+
+import pytest
+from shapely.geometry import Point
+
+from cytomine.models import AnnotationCollection, ImageInstance
+
+pytest.importorskip("numpy")
+
+
+def make_annotations() -> AnnotationCollection:
+    annotations = AnnotationCollection()
+    annotations.populate(
+        {
+            "collection": [
+                {"id": 1, "location": "POLYGON ((0 0, 4 0, 4 2, 0 2, 0 0))"},
+                {"id": 2},
+                {"id": 3, "location": "POINT (5 6)"},
+            ],
+            "size": 3,
+        }
+    )
+    return annotations
+
+
+class TestGeometryArrays:
+    def test_geometry_arrays(self) -> None:
+        annotations = make_annotations()
+
+        assert annotations.bounds()[0].tolist() == [0, 0, 4, 2]
+        assert all(math.isnan(v) for v in annotations.bounds()[1])
+        assert annotations.areas()[0] == 8
+        assert annotations.centroids()[0].tolist() == [2, 1]
+        assert annotations.centroids()[2].tolist() == [5, 6]
+
+    def test_cache(self) -> None:
+        annotations = make_annotations()
+
+        geometries = annotations.geometries()
+        assert annotations.geometries() is geometries
+
+        annotations[2].location = "POINT (1 1)"
+        assert annotations.geometries() is not geometries
+        assert annotations.centroids()[2].tolist() == [1, 1]
+
+
+class TestSpatialIndex:
+    def test_queries(self) -> None:
+        annotations = make_annotations()
+
+        assert [a.id for a in annotations.query_bbox(3, 1, 6, 7)] == [1, 3]
+        assert [a.id for a in annotations.query_bbox(3, 1, 6, 7, "contains")] == [3]
+        assert len(annotations.query_bbox(10, 10, 11, 11)) == 0
+        assert [a.id for a in annotations.query_geometry(Point(1, 1))] == [1]
+        assert [a.id for a in annotations.nearest(Point(6, 6))] == [3]
+        assert len(annotations.nearest(Point(10, 10), max_distance=1)) == 0
+
+    def test_join(self) -> None:
+        annotations = make_annotations()
+        annotations[2].location = "POINT (1 1)"
+        others = make_annotations()
+
+        assert [(a.id, b.id) for a, b in annotations.join()] == [(1, 3)]
+        assert [(a.id, b.id) for a, b in annotations.join(others)] == [(1, 1), (3, 1)]
+
+    def test_rebuilt_on_change(self) -> None:
+        annotations = make_annotations()
+
+        index = annotations.spatial_index()
+        assert annotations.spatial_index() is index
+
+        annotations[0].location = "POINT (9 9)"
+        assert annotations.spatial_index() is not index
+        assert [a.id for a in annotations.query_bbox(8, 8, 10, 10)] == [1]
+
+
+class TestPreprocessing:
+    def test_preprocess_geometries(self) -> None:
+        annotations = AnnotationCollection()
+        annotations.populate(
+            {
+                "collection": [
+                    {"id": 1, "location": "LINESTRING (0 0, 1 0.001, 2 0, 3 0.001, 4 0)"},
+                    {"id": 2, "location": "POINT (1.23456 6.54321)"},
+                    {"id": 3, "location": "POLYGON ((0 0, 2 2, 2 0, 0 2, 0 0))"},
+                    {"id": 4},
+                ],
+                "size": 4,
+            }
+        )
+        before = sum(len(a.location) for a in annotations if a.location is not None)
+
+        saved = annotations.preprocess_geometries(tolerance=0.1, decimals=1, repair=True)
+
+        assert annotations[0].location == "LINESTRING (0 0, 4 0)"
+        assert annotations[1].location == "POINT (1.2 6.5)"
+        assert annotations.geometries()[2].is_valid
+        assert annotations[3].location is None
+        after = sum(len(a.location) for a in annotations if a.location is not None)
+        assert saved == before - after > 0
+
+    def test_unchanged_geometries(self) -> None:
+        locations = [
+            "POINT (0.30000000000000004 1)",
+            "LINESTRING (0.0 0.0, 1.0 1.0)",
+            "LINESTRING (0 0.30000000000000004, 1 0.31, 2 0.30000000000000004)",
+        ]
+        annotations = AnnotationCollection()
+        annotations.populate(
+            {
+                "collection": [{"id": i, "location": loc} for i, loc in enumerate(locations)],
+                "size": 3,
+            }
+        )
+
+        saved = annotations.preprocess_geometries(tolerance=0.5)
+
+        assert [a.location for a in annotations][:2] == locations[:2]
+        assert annotations[2].location == (
+            "LINESTRING (0 0.30000000000000004, 2 0.30000000000000004)"
+        )
+        assert saved == len(locations[2]) - len(annotations[2].location)
+
+
+class TestValidation:
+    def test_validate(self) -> None:
+        annotations = AnnotationCollection()
+        annotations.populate(
+            {
+                "collection": [
+                    {"id": 1, "location": "POLYGON ((0 0, 1 0, 1 1, 0 1, 0 0))"},
+                    {"id": 2, "location": "POLYGON ((0 0, 2 2, 2 0, 0 2, 0 0))"},
+                    {"id": 3, "location": "POLYGON ((0 0, 1 1, 2 2, 0 0))"},
+                    {"id": 4},
+                ],
+                "size": 4,
+            }
+        )
+
+        quarantined = annotations.validate()
+
+        assert [a.id for a in annotations] == [1, 2]
+        assert annotations[1].location.startswith("MULTIPOLYGON")
+        assert [a.id for a, _ in quarantined] == [3, 4]
+        assert quarantined[1][1] == "Missing location"
+        assert annotations.quarantined == quarantined
+
+    def test_validate_without_repair(self) -> None:
+        annotations = make_annotations()
+        annotations[0].location = "POLYGON ((0 0, 2 2, 2 0, 0 2, 0 0))"
+
+        assert [a.id for a, _ in annotations.validate(repair=False)] == [1, 2]
+        assert [a.id for a in annotations] == [3]
+
+
+class TestRasterization:
+    def test_rasterize(self) -> None:
+        annotations = AnnotationCollection()
+        annotations.populate(
+            {
+                "collection": [
+                    {
+                        "id": 1,
+                        "term": [5],
+                        "location": "POLYGON ((0 0, 4 0, 4 4, 0 4, 0 0), "
+                        "(1 1, 3 1, 3 3, 1 3, 1 1))",
+                    },
+                    {"id": 2, "term": [6], "location": "POLYGON ((2 2, 6 2, 6 6, 2 6, 2 2))"},
+                    {"id": 3, "term": [], "location": "POLYGON ((6 6, 8 6, 8 8, 6 8, 6 6))"},
+                ],
+                "size": 3,
+            }
+        )
+        image = ImageInstance(width=8, height=8)
+
+        labels = annotations.rasterize(image, mode="label", term_labels={5: 1, 6: 2})
+        assert labels.dtype == "uint8"
+        assert labels.tolist() == [
+            [0, 0, 0, 0, 0, 0, 0, 0],
+            [0, 0, 0, 0, 0, 0, 0, 0],
+            [0, 0, 2, 2, 2, 2, 0, 0],
+            [0, 0, 2, 2, 2, 2, 0, 0],
+            [1, 1, 2, 2, 2, 2, 0, 0],
+            [1, 0, 2, 2, 2, 2, 0, 0],
+            [1, 0, 0, 1, 0, 0, 0, 0],
+            [1, 1, 1, 1, 0, 0, 0, 0],
+        ]
+
+        instances = annotations.rasterize(image, window=(4, 0, 4, 4), mode="instance")
+        assert instances.tolist() == [[0, 0, 3, 3], [0, 0, 3, 3], [2, 2, 0, 0], [2, 2, 0, 0]]
+
+        binary = annotations.rasterize(image, zoom=1)
+        assert binary.tolist() == [
+            [False, False, False, True],
+            [False, True, True, False],
+            [False, True, True, False],
+            [True, True, False, False],
+        ]
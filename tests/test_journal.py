@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+
+# * Copyright (c) 2009-2024. Authors: see NOTICE file.
+# *
+# * Licensed under the Apache License, Version 2.0 (the "License");
+# * you may not use this file except in compliance with the License.
+# * You may obtain a copy of the License at
+# *
+# *      http://www.apache.org/licenses/LICENSE-2.0
+# *
+# * Unless required by applicable law or agreed to in writing, software
+# * distributed under the License is distributed on an "AS IS" BASIS,
+# * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# * See the License for the specific language governing permissions and
+# * limitations under the License.
+
+# pylint: disable=unused-argument
+
+import json
+import logging
+from pathlib import Path
+from typing import Any, List
+
+import pytest
+import requests
+
+from cytomine import Cytomine
+from cytomine.models import Annotation, AnnotationCollection
+from cytomine.models._utilities.journal import UploadJournal
+
+
+class TestUploadJournal:
+    def test_journal(self, tmp_path: Path) -> None:
+        path = str(tmp_path / "upload.journal")
+        annotation = Annotation("POINT (10 10)", 1)
+        key = UploadJournal.key(annotation)
+
+        journal = UploadJournal(path)
+        assert journal.lookup(key) == (False, None)
+        journal.record([(key, 42), (key, 43)])
+
+        journal = UploadJournal(path)
+        assert journal.lookup(UploadJournal.key(Annotation("POINT (10 10)", 1))) == (
+            True,
+            42,
+        )
+        assert journal.lookup(key) == (True, 43)
+        assert journal.lookup(key) == (False, None)
+
+    def test_populate_created(self) -> None:
+        annotations = AnnotationCollection()
+        annotations.extend([Annotation("POINT (1 1)", 1), Annotation("POINT (2 2)", 1)])
+
+        response = {
+            "data": [
+                {"data": {"annotation": {"id": 10, "location": "POINT (1 1)"}}},
+                {"data": {"annotation": {"id": 11, "location": "POINT (2 2)"}}},
+            ]
+        }
+        assert annotations.populate_created(response) == 2
+        assert [a.id for a in annotations] == [10, 11]
+
+        assert annotations.populate_created({"data": []}) == 0
+
+    def test_missing_ids(
+        self,
+        monkeypatch: Any,
+        offline_client: Cytomine,
+        tmp_path: Path,
+        caplog: pytest.LogCaptureFixture,
+    ) -> None:
+        requests_: List[str] = []
+
+        def post(uri: str, data: str, query_parameters: Any = None) -> requests.Response:
+            requests_.append(data)
+            response = requests.Response()
+            response.status_code = 200
+            # pylint: disable=protected-access
+            response._content = json.dumps({"data": [{"id": 1}]}).encode()  # one entry only
+            return response
+
+        monkeypatch.setattr(offline_client, "_post", post)
+        monkeypatch.setattr(offline_client, "_log_response", lambda *args: None)
+        journal = str(tmp_path / "upload.journal")
+        annotations = AnnotationCollection()
+        annotations.extend([Annotation("POINT (1 1)", 1), Annotation("POINT (2 2)", 1)])
+
+        with caplog.at_level(logging.WARNING):
+            assert annotations.save(chunk=2, journal=journal)
+        assert "Could not read the ids of 2 of the 2 created objects." in caplog.text
+        assert [a.id for a in annotations] == [None, None]
+
+        # recorded as created: not uploaded again
+        annotations = AnnotationCollection()
+        annotations.extend([Annotation("POINT (1 1)", 1), Annotation("POINT (2 2)", 1)])
+        assert annotations.save(chunk=2, journal=journal)
+        assert len(requests_) == 1
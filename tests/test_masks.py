@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+
+# * Copyright (c) 2009-2024. Authors: see NOTICE file.
+# *
+# * Licensed under the Apache License, Version 2.0 (the "License");
+# * you may not use this file except in compliance with the License.
+# * You may obtain a copy of the License at
+# *
+# *      http://www.apache.org/licenses/LICENSE-2.0
+# *
+# * Unless required by applicable law or agreed to in writing, software
+# * distributed under the License is distributed on an "AS IS" BASIS,
+# * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# * See the License for the specific language governing permissions and
+# * limitations under the License.
+
+# pylint: disable=unused-argument
+
+from typing import Any, List
+
+import pytest
+from shapely.geometry import box
+
+from cytomine.models import AnnotationCollection, ImageInstance
+from cytomine.utilities.masks import iter_mask_polygons, split_mask, upload_mask_annotations
+
+np = pytest.importorskip("numpy")
+
+
+def make_mask() -> Any:
+    mask = np.zeros((8, 8), dtype=int)
+    mask[2:7, 2:7] = 1  # a square spanning the 4 tiles, with a hole
+    mask[3:5, 3:5] = 0
+    mask[0, 6:8] = 2  # two components of label 2
+    mask[7, 0] = 2
+    mask[1, 1] = 3  # inside a single tile
+    return mask
+
+
+class TestMaskPolygons:
+    def test_seams(self) -> None:
+        tiles = split_mask(make_mask(), 4)
+        polygons = list(iter_mask_polygons(tiles, image_height=8, image_width=8))
+
+        # only the square crosses a seam: the polygons on the image border are not kept
+        assert [label for label, _ in polygons] == [3, 2, 2, 1]
+        assert polygons[0][1].equals(box(1, 6, 2, 7))
+        assert [p.bounds for _, p in polygons[1:3]] == [(6, 7, 8, 8), (0, 0, 1, 1)]
+        square = polygons[3][1]
+        assert square.equals(box(2, 1, 7, 6).difference(box(3, 3, 5, 5)))
+        assert len(square.exterior.coords) == 5  # no vertex left along the seams
+
+    def test_instances_and_zoom(self) -> None:
+        polygons = dict(
+            iter_mask_polygons(split_mask(make_mask(), 4), 32, zoom=2, split=False)
+        )
+
+        assert polygons[2].geom_type == "MultiPolygon"
+        assert polygons[3].equals(box(4, 24, 8, 28))
+
+
+class TestUploadMaskAnnotations:
+    def test_upload(self, monkeypatch: Any) -> None:
+        batches: List[List[Any]] = []
+
+        def save(self: AnnotationCollection, **parameters: Any) -> bool:
+            batches.append(list(self))
+            return True
+
+        monkeypatch.setattr(AnnotationCollection, "save", save)
+        image = ImageInstance(width=8, height=8, project=5)
+        image.id = 7
+
+        count = upload_mask_annotations(
+            split_mask(make_mask(), 4), image, terms={1: 10, 2: 20}, batch_size=2
+        )
+
+        assert count == 3
+        assert [len(batch) for batch in batches] == [2, 1]
+        annotations = [a for batch in batches for a in batch]
+        assert [a.term for a in annotations] == [[20], [20], [10]]
+        assert all(a.image == 7 and a.project == 5 for a in annotations)
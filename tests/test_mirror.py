@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+
+# * Copyright (c) 2009-2024. Authors: see NOTICE file.
+# *
+# * Licensed under the Apache License, Version 2.0 (the "License");
+# * you may not use this file except in compliance with the License.
+# * You may obtain a copy of the License at
+# *
+# *      http://www.apache.org/licenses/LICENSE-2.0
+# *
+# * Unless required by applicable law or agreed to in writing, software
+# * distributed under the License is distributed on an "AS IS" BASIS,
+# * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# * See the License for the specific language governing permissions and
+# * limitations under the License.
+
+# pylint: disable=unused-argument
+
+import os
+from typing import Any, Dict, List
+
+from cytomine.models import AnnotationCollection, Collection, PositionCollection, TermCollection
+from cytomine.utilities.mirror import CollectionMirror
+from tests.conftest import FakeServer
+
+SERVER: List[Dict[str, Any]] = []
+
+
+def serve_updates(server: FakeServer) -> None:
+    def rows(collection: Collection) -> List[Dict[str, Any]]:
+        after = getattr(collection, "afterThan", None)
+        return [o for o in SERVER if after is None or int(o["updated"]) > after]
+
+    server.collections[PositionCollection] = rows
+    server.collections[TermCollection] = rows
+
+
+def update_marks(server: FakeServer) -> List[Any]:
+    return [query.get("afterThan") for query in server.queries]
+
+
+class TestCollectionMirror:
+    def setup_method(self) -> None:
+        SERVER[:] = [{"id": i, "x": i, "updated": str(1000 + i)} for i in range(1, 4)]
+
+    def test_incremental_sync(self, fake_server: FakeServer, tmp_path: Any) -> None:
+        serve_updates(fake_server)
+        path = os.path.join(tmp_path, "mirror.json")
+        mirror = CollectionMirror(PositionCollection(filters={"imageinstance": 1}), path)
+
+        report = mirror.sync()
+        assert (len(report.inserted), len(report.updated), report.full) == (3, 0, True)
+        assert mirror.mark == 1003
+
+        SERVER[0].update(x=10, updated="1010")
+        SERVER.append({"id": 4, "x": 4, "updated": "1004"})
+
+        reloaded = CollectionMirror(PositionCollection(filters={"imageinstance": 1}), path)
+        report = reloaded.sync()
+        assert update_marks(fake_server) == [None, 1003]
+        assert [m.id for m in report.inserted] == [4]
+        assert [m.id for m in report.updated] == [1]
+        assert reloaded[1].x == 10  # type: ignore
+        assert len(reloaded) == 4
+
+    def test_full_sync_detects_deletions(self, fake_server: FakeServer) -> None:
+        serve_updates(fake_server)
+        mirror = CollectionMirror(TermCollection(filters={"ontology": 1}))
+        assert not mirror.incremental
+        assert not CollectionMirror(AnnotationCollection(project=1)).incremental
+        mirror.sync()
+
+        del SERVER[1]
+        report = mirror.sync()
+
+        assert update_marks(fake_server) == [None, None]
+        assert [m.id for m in report.deleted] == [2]
+        assert len(report.inserted) + len(report.updated) == 0
+        assert 2 not in mirror
@@ -0,0 +1,191 @@
+# -*- coding: utf-8 -*-
+
+# * Copyright (c) 2009-2024. Authors: see NOTICE file.
+# *
+# * Licensed under the Apache License, Version 2.0 (the "License");
+# * you may not use this file except in compliance with the License.
+# * You may obtain a copy of the License at
+# *
+# *      http://www.apache.org/licenses/LICENSE-2.0
+# *
+# * Unless required by applicable law or agreed to in writing, software
+# * distributed under the License is distributed on an "AS IS" BASIS,
+# * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# * See the License for the specific language governing permissions and
+# * limitations under the License.
+
+# pylint: disable=unused-argument
+
+import json
+import time
+from typing import Any, Callable, List, Optional, Tuple
+
+import pytest
+
+from cytomine.models import (
+    Annotation,
+    AnnotationCollection,
+    AnnotationTerm,
+    BatchSession,
+    Project,
+    Property,
+)
+from cytomine.models.collection import CollectionPartialUploadException
+from tests.conftest import FakeServer
+
+
+def wait_for(condition: Callable[[], bool], timeout: float = 5) -> bool:
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+class TestBatchSession:
+    def test_batch_session(self) -> None:
+        assert BatchSession.current() is None
+
+        with BatchSession(max_size=10) as session:
+            assert BatchSession.current() is session
+            assert session.accepts(Annotation("POINT (1 1)", 1))
+            assert not session.accepts(Annotation("POINT (1 1)", 1, id=1))
+            assert not session.accepts(AnnotationTerm(1, 2))
+
+            with BatchSession() as nested:
+                assert BatchSession.current() is nested
+            assert BatchSession.current() is session
+
+        assert BatchSession.current() is None
+        assert not session.add(Annotation("POINT (1 1)", 1))
+
+    def test_flush_on_size(self, fake_server: FakeServer) -> None:
+        annotations = [Annotation("POINT (1 1)", i) for i in range(5)]
+        with BatchSession(max_size=3, max_delay=60) as session:
+            for annotation in annotations[:2]:
+                assert annotation.save() is annotation
+            time.sleep(0.05)
+            assert not fake_server.posted  # buffered
+
+            annotations[2].save()
+            assert wait_for(lambda: len(fake_server.posted) == 1)
+            assert annotations[0].id == 1
+            annotations[3].save()
+            annotations[4].save()
+
+        assert [[a.image for a in batch] for batch in fake_server.posted] == [[0, 1, 2], [3, 4]]
+        assert [a.id for a in annotations] == [1, 2, 3, 4, 5]
+        assert not annotations[0].is_dirty()
+        assert session.created == annotations and not session.failed
+
+    def test_flush_on_delay(self, fake_server: FakeServer) -> None:
+        annotation = Annotation("POINT (1 1)", 1)
+        with BatchSession(max_size=100, max_delay=0.05):
+            annotation.save()
+            assert wait_for(lambda: annotation.id is not None)
+            assert len(fake_server.posted) == 1
+
+        assert len(fake_server.posted) == 1
+
+    def test_failed_batch(self, fake_server: FakeServer) -> None:
+        fake_server.reject = lambda models: True
+        annotations = [Annotation("POINT (1 1)", i) for i in range(3)]
+        with pytest.raises(CollectionPartialUploadException) as e:
+            with BatchSession(max_size=2, max_delay=60):
+                for annotation in annotations:
+                    annotation.save()
+
+        assert e.value.failed == annotations
+        assert all(a.id is None for a in annotations)
+
+
+class TestChangeTracking:
+    def test_changes(self) -> None:
+        annotation = Annotation("POINT (1 1)", 1, [1], id=10)
+        assert annotation.is_dirty()
+
+        annotation.mark_clean()
+        assert not annotation.is_dirty()
+        assert annotation.changes() == {}
+
+        annotation.location = "POINT (2 2)"
+        annotation.term.append(2)  # type: ignore
+        assert annotation.changes() == {"location": "POINT (2 2)", "term": [1, 2]}
+
+    def test_changes_from_server(self) -> None:
+        attributes = {"id": 10, "location": "POINT (1 1)", "term": [1], "centroid": {}}
+        annotation = Annotation().populate(attributes, clean=True)
+        assert annotation.changes() == {}
+        assert json.loads(annotation.to_json())["term"] == [1]
+
+        annotation.term.append(2)  # type: ignore
+        assert annotation.changes() == {"term": [1, 2]}
+        assert attributes["term"] == [1]
+
+    def test_mark_clean_from_server(self) -> None:
+        annotation = Annotation().populate({"id": 10, "term": [5, 6]}, clean=True)
+        dump = annotation.to_json()
+
+        annotation.mark_clean()
+        assert annotation.to_json() == dump
+        assert annotation.changes() == {}
+        assert annotation.term == [5, 6]
+
+
+class TestPopulate:
+    def test_populate(self) -> None:
+        attributes = {"id": 1, "id_project": 2, "class": "a", "uri": "u", "_x": 0}
+        annotation = Annotation().populate(attributes)
+
+        assert json.loads(annotation.to_json()) == {
+            "id": 1,
+            "project": 2,
+            "class_": "a",
+            "uri": "u",
+        }
+
+    def test_populate_descriptor(self) -> None:
+        project = Project(id=3).populate({"class_": "project"})
+        prop = Property(Annotation(id=1))
+        prop.populate({"obj": project, "key": "k"})
+
+        assert (prop.domainIdent, prop.domainClassName, prop.key) == (3, "project", "k")
+        assert "obj" not in prop.__dict__
+
+
+class FakeAnnotation(Annotation):
+    """An annotation recording the requests instead of sending them."""
+
+    requests: List[Tuple[str, Optional[int]]] = []
+
+    def delete(self, id: Optional[int] = None) -> bool:
+        self.requests.append(("delete", self.id))
+        return self.id is not None and self.id % 2 == 0
+
+    def update(self, id: Optional[int] = None, **attributes: Any) -> "FakeAnnotation":
+        self.requests.append(("update", self.id))
+        return self
+
+
+class TestBulkOperations:
+    def test_delete_all(self) -> None:
+        annotations = AnnotationCollection()
+        for i in range(1, 6):
+            annotations.append(FakeAnnotation("POINT (1 1)", 1, id=i))
+
+        deleted, failed = annotations.delete_all(n_workers=2)
+
+        assert sorted(a.id for a in deleted) == [2, 4]
+        assert sorted(a.id for a in failed) == [1, 3, 5]
+
+    def test_update_all_skips_unchanged(self) -> None:
+        FakeAnnotation.requests = []
+        annotations = AnnotationCollection()
+        for i in range(1, 4):
+            annotations.append(FakeAnnotation("POINT (1 1)", 1, id=i).mark_clean())
+        annotations[1].location = "POINT (2 2)"
+
+        updated, failed = annotations.update_all(n_workers=2)
+
+        assert FakeAnnotation.requests == [("update", 2)]
+        assert len(updated) == 3
+        assert len(failed) == 0
@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+
+# * Copyright (c) 2009-2024. Authors: see NOTICE file.
+# *
+# * Licensed under the Apache License, Version 2.0 (the "License");
+# * you may not use this file except in compliance with the License.
+# * You may obtain a copy of the License at
+# *
+# *      http://www.apache.org/licenses/LICENSE-2.0
+# *
+# * Unless required by applicable law or agreed to in writing, software
+# * distributed under the License is distributed on an "AS IS" BASIS,
+# * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# * See the License for the specific language governing permissions and
+# * limitations under the License.
+
+import time
+from threading import Event, Thread
+from typing import Optional
+
+import pytest
+
+from cytomine.models._utilities.parallel import (
+    JobInterruptedError,
+    generic_chunk_parallel,
+    generic_parallel,
+    robust_worker,
+)
+from cytomine.models._utilities.progress import Progress
+
+
+class TestParallel:
+    def test_generic_parallel(self) -> None:
+        results = generic_parallel(range(1, 21), lambda x: x * 2, n_workers=4)
+
+        assert len(results) == 20
+        assert all(out == 2 * item for item, out in results)
+
+    def test_generic_parallel_failure(self) -> None:
+        def worker(x: int) -> int:
+            if x == 3:
+                raise ValueError("Failure")
+            return x
+
+        results = dict(generic_parallel(range(1, 6), worker, n_workers=2))
+
+        assert len(results) == 5
+        assert results[3] is False
+
+    def test_generic_chunk_parallel(self) -> None:
+        data = list(range(10))
+        results = generic_chunk_parallel(data, sum, chunk_size=3, n_workers=2)
+
+        assert sum(out for _, out in results) == sum(data)
+
+    def test_deadline(self) -> None:
+        def worker(x: int) -> int:
+            time.sleep(0.5 if x == 0 else 0)
+            return x
+
+        with pytest.raises(JobInterruptedError) as e:
+            generic_parallel(range(50), worker, n_workers=1, timeout=0.2)
+
+        assert e.value.running == [0]
+        assert len(e.value.pending) == 49
+        assert e.value.results == []
+
+    def test_cancel(self) -> None:
+        cancel = Event()
+
+        def worker(x: int) -> Optional[int]:
+            if x == 5:
+                cancel.set()
+            return x
+
+        with pytest.raises(JobInterruptedError) as e:
+            generic_parallel(range(100), worker, n_workers=1, cancel=cancel)
+
+        processed = [item for item, _ in e.value.results]
+        assert len(processed) + len(e.value.unprocessed) == 100
+        assert 5 in processed
+        assert 99 in e.value.pending
+
+
+class TestRobustWorker:
+    def test_retries(self) -> None:
+        attempts = {"n": 0}
+
+        def worker(_: int) -> bool:
+            attempts["n"] += 1
+            return attempts["n"] == 3
+
+        assert robust_worker(worker, retries=2, backoff=0)(0) is True
+        assert attempts["n"] == 3
+        assert robust_worker(worker, retries=1, backoff=0)(0) is False
+
+    def test_rate(self) -> None:
+        worker = robust_worker(lambda x: x, rate=50)
+
+        start = time.monotonic()
+        results = generic_parallel(range(11), worker, n_workers=4)
+
+        assert len(results) == 11
+        assert time.monotonic() - start >= 0.19
+
+
+class TestProgress:
+    def test_progress(self) -> None:
+        reports = []
+        progress = Progress(callback=lambda p: reports.append(p.processed))
+
+        generic_parallel(
+            range(10),
+            lambda x: x % 3 != 0 and x,
+            n_workers=2,
+            progress=progress,
+            size_fn=lambda x, _: 100,
+        )
+
+        assert progress.total == 10
+        assert progress.done == 6
+        assert progress.failed == 4
+        assert progress.bytes == 600
+        assert progress.is_finished
+        assert sorted(reports) == list(range(1, 11))
+
+    def test_callback_outside_lock(self) -> None:
+        running, release = Event(), Event()
+
+        def callback(snapshot: Progress) -> None:
+            if snapshot.processed == 1:
+                running.set()
+                release.wait(5)
+
+        progress = Progress(callback=callback)
+        thread = Thread(target=progress.update)
+        thread.start()
+        assert running.wait(5)
+
+        progress.update()  # not blocked by the running callback
+        assert progress.processed == 2
+        release.set()
+        thread.join()
+
+    def test_chunk_progress(self) -> None:
+        progress = Progress()
+        generic_chunk_parallel(list(range(10)), len, chunk_size=4, progress=progress)
+
+        assert progress.total == 10
+        assert progress.done == 10
+
+    def test_eta(self) -> None:
+        progress = Progress(total=4)
+        assert progress.eta is None
+
+        time.sleep(0.01)
+        progress.update(2)
+        eta = progress.eta
+        assert eta is not None and eta > 0
+        assert "2/4 items processed" in str(progress)
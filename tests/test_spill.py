@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+
+# * Copyright (c) 2009-2024. Authors: see NOTICE file.
+# *
+# * Licensed under the Apache License, Version 2.0 (the "License");
+# * you may not use this file except in compliance with the License.
+# * You may obtain a copy of the License at
+# *
+# *      http://www.apache.org/licenses/LICENSE-2.0
+# *
+# * Unless required by applicable law or agreed to in writing, software
+# * distributed under the License is distributed on an "AS IS" BASIS,
+# * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# * See the License for the specific language governing permissions and
+# * limitations under the License.
+
+import pytest
+
+from cytomine.models import AnnotationCollection
+from cytomine.models._utilities import SpillList
+
+
+class TestSpillList:
+    def test_list_operations(self) -> None:
+        items = SpillList(range(100), max_items=20, page_size=10)
+        expected = list(range(100))
+        assert items.n_spilled == 8
+
+        for seq in (items, expected):
+            seq[5] = -5
+            del seq[50:60]
+            seq.insert(0, -1)
+            seq.insert(-3, -2)
+            seq.append(1000)
+            seq.pop(42)
+
+        assert list(items) == expected
+        assert [items[i] for i in (0, 11, -1, -4)] == [expected[i] for i in (0, 11, -1, -4)]
+        assert items[10:20] == expected[10:20]
+        assert len(items) == len(expected)
+
+    def test_changes_in_place_are_kept(self) -> None:
+        items = SpillList(([i] for i in range(50)), max_items=10, page_size=5)
+        assert items.n_spilled == 8
+
+        for item in items:
+            item.append(-item[0])  # changed while its page is loaded
+        items[0].append(0)
+        items[49]  # pylint: disable=pointless-statement
+
+        assert items.n_spilled == 8
+        assert [item[1] for item in items] == [-i for i in range(50)]
+        assert items[0] == [0, 0, 0]
+
+    def test_file_reuse(self) -> None:
+        items = SpillList(([i] for i in range(50)), max_items=10, page_size=5)
+        for _ in items:
+            pass
+        size = items._file.seek(0, 2)  # pylint: disable=protected-access
+
+        for _ in range(5):
+            assert sum(item[0] for item in items) == sum(range(50))
+        assert items._file.seek(0, 2) == size  # pylint: disable=protected-access
+
+        for _ in range(5):
+            for item in items:
+                item[0] += 1
+        assert [item[0] for item in items] == [i + 5 for i in range(50)]
+        assert items._file.seek(0, 2) <= 2 * size  # pylint: disable=protected-access
+
+
+class TestCollectionMemoryLimit:
+    def test_memory_limit(self) -> None:
+        annotations = AnnotationCollection().set_memory_limit(100, page_size=50)
+        for offset in range(0, 1000, 200):
+            page = [
+                {"id": i, "location": f"POINT ({i} {i})"} for i in range(offset, offset + 200)
+            ]
+            annotations.populate({"collection": page, "size": 1000}, append_mode=True)
+
+        assert isinstance(annotations.data(), SpillList)
+        assert annotations.data().n_spilled == 18  # type: ignore
+        assert len(annotations) == 1000
+        assert annotations[567].location == "POINT (567 567)"
+        assert [a.id for a in annotations] == list(range(1000))
+
+        even = annotations.filter(lambda a: a.id % 2 == 0)  # type: ignore
+        assert isinstance(even.data(), SpillList)
+        assert len(even) == 500
+
+    def test_spilled_models_changes(self) -> None:
+        pytest.importorskip("numpy")
+        annotations = AnnotationCollection()
+        annotations.set_memory_limit(10, page_size=5)
+        annotations.populate(
+            {
+                "collection": [
+                    {"location": "POINT (0.123456 1.987654)"},
+                    {"location": "POLYGON ((0 0, 2 2, 2 0, 0 2, 0 0))"},
+                ]
+                + [{"location": f"POINT ({i} {i})"} for i in range(48)],
+                "size": 50,
+            }
+        )
+
+        assert annotations.preprocess_geometries(decimals=1) > 0
+        annotations.populate_created([{"id": i} for i in range(50)])
+        annotations.validate()
+
+        assert annotations.data().n_spilled > 0  # type: ignore
+        assert annotations[0].location == "POINT (0.1 2)"
+        assert annotations[1].location.startswith("MULTIPOLYGON")
+        assert [a.id for a in annotations] == list(range(50))
@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+
+# * Copyright (c) 2009-2024. Authors: see NOTICE file.
+# *
+# * Licensed under the Apache License, Version 2.0 (the "License");
+# * you may not use this file except in compliance with the License.
+# * You may obtain a copy of the License at
+# *
+# *      http://www.apache.org/licenses/LICENSE-2.0
+# *
+# * Unless required by applicable law or agreed to in writing, software
+# * distributed under the License is distributed on an "AS IS" BASIS,
+# * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# * See the License for the specific language governing permissions and
+# * limitations under the License.
+
+# pylint: disable=unused-argument
+
+import os
+from typing import Any, Dict, List
+
+from cytomine.models import Annotation, AnnotationCollection
+from cytomine.utilities.store import LocalStore
+from tests.conftest import FakeServer
+
+SERVER: List[Dict[str, Any]] = [
+    {
+        "id": i,
+        "project": 1 + i % 2,
+        "image": 10 + i % 3,
+        "user": 100,
+        "term": [i % 4],
+        "created": str(1000 + i),
+    }
+    for i in range(12)
+]
+
+
+def serve_annotations(server: FakeServer) -> None:
+    def rows(collection: AnnotationCollection) -> List[Dict[str, Any]]:
+        # the location is only returned with showWKT
+        return [
+            {**a, "location": f"POINT ({a['id']} 0)"} if collection.showWKT else a
+            for a in SERVER
+            if a["project"] == collection.project
+        ]
+
+    server.collections[AnnotationCollection] = rows
+    server.models[Annotation] = lambda id_: {
+        **SERVER[id_],  # type: ignore
+        "location": f"POINT ({id_} 0)",
+    }
+
+
+class TestLocalStore:
+    def test_fetch_from_store(self, fake_server: FakeServer, tmp_path: Any) -> None:
+        serve_annotations(fake_server)
+        path = os.path.join(tmp_path, "store.db")
+        with LocalStore(path) as store:
+            fetched = store.fetch(AnnotationCollection(project=1))
+
+        with LocalStore(path) as store:
+            cached = store.fetch(AnnotationCollection(project=1))
+            assert len(fake_server.queries) == 1
+            assert [a.id for a in cached] == [a.id for a in fetched]  # type: ignore
+
+            store.fetch(AnnotationCollection(project=2))
+            store.fetch(AnnotationCollection(project=1), max_age=-1)
+            assert len(fake_server.queries) == 3
+
+    def test_query(self, fake_server: FakeServer) -> None:
+        serve_annotations(fake_server)
+        with LocalStore() as store:
+            store.fetch(AnnotationCollection(project=1))
+            store.fetch(AnnotationCollection(project=2))
+
+            found = store.query(AnnotationCollection(), project=2, image=[10, 11], term=3)
+            assert [a.id for a in found] == [3, 7]
+            assert found[0].term == [3]
+
+            recent = store.query(AnnotationCollection(), created_after=1009, limit=1)
+            assert [a.id for a in recent] == [10]
+
+    def test_paged_queries(self, fake_server: FakeServer) -> None:
+        serve_annotations(fake_server)
+        with LocalStore() as store:
+            page = store.fetch(AnnotationCollection(project=1, max=2, offset=2))
+            assert [a.id for a in page] == [4, 6]  # type: ignore
+
+            annotations = store.fetch(AnnotationCollection(project=1))
+            assert [a.id for a in annotations] == [0, 2, 4, 6, 8, 10]  # type: ignore
+            assert len(fake_server.queries) == 2
+
+    def test_merged_projections(self, fake_server: FakeServer) -> None:
+        serve_annotations(fake_server)
+        with LocalStore() as store:
+            store.fetch(AnnotationCollection(project=1, showWKT=True))
+            store.fetch(AnnotationCollection(project=1, showWKT=False))
+
+            cached = store.fetch(AnnotationCollection(project=1, showWKT=True))
+            assert len(fake_server.queries) == 2
+            assert cached[1].location == "POINT (2 0)"  # type: ignore
+
+            annotation = store.get(Annotation, 2)
+            assert annotation.location == "POINT (2 0)"  # type: ignore
+            assert fake_server.fetched == [2]  # only stored from collections
+            store.get(Annotation, 2)
+            assert fake_server.fetched == [2]
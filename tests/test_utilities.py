@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+
+# * Copyright (c) 2009-2024. Authors: see NOTICE file.
+# *
+# * Licensed under the Apache License, Version 2.0 (the "License");
+# * you may not use this file except in compliance with the License.
+# * You may obtain a copy of the License at
+# *
+# *      http://www.apache.org/licenses/LICENSE-2.0
+# *
+# * Unless required by applicable law or agreed to in writing, software
+# * distributed under the License is distributed on an "AS IS" BASIS,
+# * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# * See the License for the specific language governing permissions and
+# * limitations under the License.
+
+# pylint: disable=unused-argument
+
+from typing import Any, Dict, List
+
+import pytest
+
+from cytomine.models import AnnotationCollection
+from cytomine.utilities.annotations import (  # type: ignore
+    REVIEWED_INCLUDE,
+    get_annotations,
+    get_included_annotations,
+)
+from tests.conftest import FakeServer
+
+
+def project_annotations(collection: AnnotationCollection) -> List[Dict[str, Any]]:
+    # 10 annotations per project, the last 5 of which are also returned as reviewed
+    first = 5 if collection.reviewed else 0
+    return [{"id": 100 * collection.project + i} for i in range(first, 10)]  # type: ignore
+
+
+class TestGetAnnotations:
+    def test_get_annotations(self, fake_server: FakeServer) -> None:
+        fake_server.collections[AnnotationCollection] = project_annotations
+        pages: List[int] = []
+
+        annotations = get_annotations(
+            [1, 2, 3],
+            reviewed=REVIEWED_INCLUDE,
+            n_workers=4,
+            page_size=3,
+            callback=lambda page: pages.append(len(page)),
+        )
+
+        assert sorted(a.id for a in annotations) == [
+            100 * p + i for p in (1, 2, 3) for i in range(10)
+        ]
+        assert sum(pages) == 30
+        assert max(pages) <= 3
+
+
+def image_annotations(collection: AnnotationCollection) -> List[Dict[str, Any]]:
+    # A row of unit squares per image, from x=0 to x=9
+    return [
+        {
+            "id": 100 * collection.image + x,  # type: ignore
+            "image": collection.image,
+            "location": f"POLYGON (({x} 0, {x + 1} 0, {x + 1} 1, {x} 1, {x} 0))",
+        }
+        for x in range(10)
+    ]
+
+
+class TestGetIncludedAnnotations:
+    def test_get_included_annotations(self, fake_server: FakeServer) -> None:
+        pytest.importorskip("numpy")
+        fake_server.collections[AnnotationCollection] = image_annotations
+        references = AnnotationCollection()
+        references.populate(
+            {
+                "collection": [
+                    {"id": 1, "image": 1, "location": "POLYGON ((0 0, 3 0, 3 1, 0 1, 0 0))"},
+                    {"id": 2, "image": 1, "location": "POLYGON ((2.5 0, 4 0, 4 1, 2.5 1, 2.5 0))"},
+                    {"id": 3, "image": 2, "location": "POLYGON ((8 0, 20 0, 20 1, 8 1, 8 0))"},
+                    {"id": 205, "image": 2, "location": "POLYGON ((5 0, 6 0, 6 1, 5 1, 5 0))"},
+                ],
+                "size": 4,
+            }
+        )
+
+        included = get_included_annotations(references, n_workers=2)
+        assert {k: [a.id for a in v] for k, v in included.items()} == {
+            1: [100, 101, 102],
+            2: [103],
+            3: [208, 209],
+            205: [],
+        }
+
+        overlapping = get_included_annotations(references, predicate="intersects")
+        assert [a.id for a in overlapping[2]] == [102, 103, 104]
+
+        get_included_annotations(references, terms=[5, 6])
+        assert fake_server.queries[-1]["terms"] == "5,6"
+        assert "term" not in fake_server.queries[-1]